@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+bench_import.py
+Benchmarks import_data.run() on synthetic exports from gen_clinic_data.py and
+writes the results (wall time, rows/sec per table, peak RSS) as JSON, so a
+later run can be compared against a saved baseline.
+Run: python3 bench_import.py --rows 10000,100000 --modes bulk,stream --out bench_baseline.json
+     python3 bench_import.py --rows 100000 --compare bench_baseline.json
+"""
+
+import os, sys, json, time, argparse, platform, subprocess, tempfile
+from pathlib import Path
+
+import gen_clinic_data
+
+# mode name -> import_data.run() keyword arguments
+MODES = {
+    'rows':        {},
+    'bulk':        {'bulk': True},
+    'stream':      {'stream': True},
+    'parallel':    {'workers': os.cpu_count()},
+    'elt':         {'elt': True},
+    'bulk+swap':   {'bulk': True, 'swap': True},
+}
+
+def run_child(mode, csv_dir, db_path):
+    """One import in a fresh interpreter, so peak RSS belongs to that run alone."""
+    if db_path.exists():
+        db_path.unlink()
+    code = ("import json, sys, contextlib, io, import_data\n"
+            "with contextlib.redirect_stdout(io.StringIO()):\n"
+            f"    r = import_data.run(csv_dir={str(csv_dir)!r}, db_path={str(db_path)!r}, **{MODES[mode]!r})\n"
+            "print(json.dumps(r))\n")
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).parent,
+                         capture_output=True, text=True, check=True)
+    report = json.loads(out.stdout.strip().splitlines()[-1])
+    report['process_secs'] = round(time.perf_counter() - t0, 4)
+    report['db_mb'] = round(db_path.stat().st_size / (1 << 20), 1)
+    return report
+
+def compare(results, baseline):
+    """Print wall-time / rows-per-second ratios against a saved baseline."""
+    base = {(r['scale'], r['mode']): r for r in baseline['results']}
+    print("\n" + "─"*50)
+    print("📈 VS BASELINE")
+    print("─"*50)
+    for r in results:
+        b = base.get((r['scale'], r['mode']))
+        if not b:
+            continue
+        print(f"   {r['mode']:<10} @ {r['scale']:>9,}  wall {r['wall_secs']:>8.2f}s "
+              f"({b['wall_secs'] / max(r['wall_secs'], 1e-9):>5.2f}× baseline)")
+        for table, t in r['tables'].items():
+            bt = b['tables'].get(table)
+            if bt:
+                print(f"      {table:<18} {t['rows_per_sec']:>10,} rows/s "
+                      f"({t['rows_per_sec'] / max(bt['rows_per_sec'], 1):>5.2f}×)")
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark import_data.py on synthetic exports")
+    ap.add_argument('--rows', default='10000,100000',
+                    help="comma-separated scales (visits per export), e.g. 10000,1000000,10000000")
+    ap.add_argument('--modes', default='bulk,stream,parallel,elt',
+                    help=f"comma-separated, from: {', '.join(MODES)}")
+    ap.add_argument('--data-dir', default=str(Path(tempfile.gettempdir()) / 'pawsclaws-bench'),
+                    help="where generated exports and scratch databases live (reused across runs)")
+    ap.add_argument('--out', default='bench_results.json')
+    ap.add_argument('--compare', help="baseline JSON from an earlier run")
+    args = ap.parse_args()
+
+    scales = [int(s) for s in args.rows.split(',')]
+    modes = args.modes.split(',')
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        ap.error(f"unknown mode(s): {', '.join(sorted(unknown))}")
+
+    data = Path(args.data_dir)
+    results = []
+    for scale in scales:
+        csv_dir = data / f"csv_{scale}"
+        if not (csv_dir / 'Invoices.csv').exists():
+            print(f"🧪 Generating {scale:,}-visit export…")
+            gen_clinic_data.generate(csv_dir, scale)
+        for mode in modes:
+            print(f"⏱  {mode:<10} @ {scale:>9,} …", end=' ', flush=True)
+            report = run_child(mode, csv_dir, data / f"bench_{scale}_{mode.replace('+', '_')}.db")
+            report.update(scale=scale, mode=mode)
+            results.append(report)
+            print(f"{report['wall_secs']:.2f}s, peak RSS {report['peak_rss_mb']} MB")
+
+    doc = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+    Path(args.out).write_text(json.dumps(doc, indent=2))
+    print(f"\n✓ Results written to {args.out}")
+    if args.compare:
+        compare(results, json.loads(Path(args.compare).read_text()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+check_import_modes.py
+Loads one synthetic export from gen_clinic_data.py (fixed seed) with every
+import_data.run() mode and checks that each leaves the same tables behind as
+the row-by-row path, row for row, that merging the same branches twice
+leaves every row (and its rowid) where the first merge put it, and that an
+--upsert of an export in which a pet parent's phone changed matches a fresh
+load of it, and that keys filled in below the highest rowid by a later run
+reach every derived table, and that re-importing an export into a database
+that archived part of it leaves both files as they were. Exits 1 if any check fails.
+Run: python3 check_import_modes.py
+     python3 check_import_modes.py --rows 5000 --modes bulk,elt,upsert-twice,remerge
+"""
+
+import csv, sys, json, time, shutil, sqlite3, argparse, subprocess, tempfile
+from pathlib import Path
+
+import gen_clinic_data
+from import_data import archive_path
+
+REFERENCE = 'rows'
+
+# mode name -> import_data.run() keyword arguments, one dict per run into the
+# same database (the later runs must leave it unchanged); 'cpus' is not one:
+# it sets os.cpu_count() for that run, so the parallel path runs on any machine
+MODES = {
+    'rows':              [{}],
+    'bulk':              [{'bulk': True}],
+    'stream':            [{'stream': True, 'chunksize': 997}],   # odd size: chunk edges mid-file
+    'parallel':          [{'workers': 2}],           # clamped to the machine's CPUs
+    'parallel-forced':   [{'workers': 2, 'cpus': 4}],   # a pool whatever the machine has
+    'elt':               [{'elt': True}],
+    'bulk+swap':         [{'bulk': True, 'swap': True}],
+    'incremental':       [{'incremental': True}],
+    'upsert':            [{'upsert': True}],
+    'bulk+incremental':  [{'bulk': True}, {'incremental': True}],
+    'upsert-twice':      [{'upsert': True}, {'upsert': True}],
+}
+
+# pseudo-mode: the same two branches merged once, then twice into one database
+REMERGE = 'remerge'
+
+# pseudo-mode: an --upsert of the export, then one of a copy in which a pet
+# parent's mobile_no changed, against a row-by-row load of that copy (the
+# owner's phone is copied into patients and invoices, whose files are the same)
+EDITED = 'upsert-edit'
+
+# pseudo-mode: a load of the export with a few keys missing from the middle
+# of the files, then one of the whole export, against a single load of it —
+# row by row, and by --upsert with a pet parent missing too (the re-added
+# keys sit below each table's highest rowid)
+BACKFILL = 'backfill'
+GAP_FILES = ['records.csv', 'objective.csv', 'subjective.csv', 'prescription.csv', 'vaccinations.csv']
+GAP_KEYS = {'100', '101', '102', '250'}
+
+# pseudo-mode: a bulk load that archives everything before ARCHIVE_CUTOFF,
+# then a row-by-row and an --elt re-import of the same export into it,
+# against the bulk load alone — hot database and archive alike
+ARCHIVED = 'archive-reimport'
+ARCHIVE_CUTOFF = '2021-01-01'
+
+# tables whose ids (and rowids) a re-merge may renumber: a branch's
+# invoice_items are replaced, as they have no natural key to upsert on
+REMERGE_VOLATILE = {'invoice_items': 'id'}
+
+# bookkeeping that legitimately differs between runs and modes
+SKIP_TABLES = {'branches', 'import_progress', 'import_state', 'row_hashes', 'upserted_rows',
+               'inserted_rows', 'checkins'}
+
+def load(runs, csv_dir, db_path):
+    """Run each import in a fresh interpreter (import_data keeps module state)."""
+    for p in db_path.parent.glob(db_path.stem + '.*'):        # -wal, .import.json, .archive.db
+        p.unlink()
+    for kw in runs:
+        kw = {'csv_dir': str(csv_dir), **kw}
+        cpus = kw.pop('cpus', None)
+        code = ("import contextlib, io, os, import_data\n"
+                + (f"os.cpu_count = lambda: {cpus}\n" if cpus else "")
+                + "with contextlib.redirect_stdout(io.StringIO()):\n"
+                f"    import_data.run(db_path={str(db_path)!r}, **{kw!r})\n")
+        subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).parent,
+                       capture_output=True, text=True, check=True)
+
+def edit_phone(csv_dir, out):
+    """Copy the export to `out` with a new mobile_no for the pet parent of the
+    first patient that has invoices."""
+    shutil.rmtree(out, ignore_errors=True)
+    shutil.copytree(csv_dir, out)
+    with open(out / 'Invoices.csv', newline='') as f:
+        billed = {r['patient_id'] for r in csv.DictReader(f)}
+    with open(out / 'patients.csv', newline='') as f:
+        parent = next(r['pet_parent_id'] for r in csv.DictReader(f)
+                      if r['patient_id'] in billed and r['pet_parent_id'].isdigit())
+    with open(out / 'pet_parents.csv', newline='') as f:
+        rows = list(csv.reader(f))
+    col = rows[0].index('mobile_no')
+    for r in rows[1:]:
+        if r[0] == parent:
+            r[col] = '9000012345'
+    with open(out / 'pet_parents.csv', 'w', newline='') as f:
+        csv.writer(f).writerows(rows)
+
+def drop_keys(csv_dir, out, files):
+    """Copy the export to `out` without the GAP_KEYS rows of `files`."""
+    shutil.rmtree(out, ignore_errors=True)
+    shutil.copytree(csv_dir, out)
+    for name in files:
+        with open(out / name, newline='') as f:
+            rows = list(csv.reader(f))
+        with open(out / name, 'w', newline='') as f:
+            csv.writer(f).writerows(rows[:1] + [r for r in rows[1:] if r[0] not in GAP_KEYS])
+
+def tables(conn):
+    """Data tables to compare: everything but SQLite's own, FTS shadows and SKIP_TABLES."""
+    return sorted(name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'")
+        if not name.startswith('sqlite_') and '_fts' not in name and name not in SKIP_TABLES)
+
+def contents(conn, table, rowids=False):
+    """Every row of `table`, ordered by all of its columns. With `rowids`, the
+    rowid is compared too, except in the REMERGE_VOLATILE tables."""
+    cols = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+    if rowids and table in REMERGE_VOLATILE:
+        cols.remove(REMERGE_VOLATILE[table])
+    elif rowids:
+        try:
+            conn.execute(f"SELECT rowid FROM {table} LIMIT 0")
+            cols = ['rowid'] + cols
+        except sqlite3.OperationalError:        # WITHOUT ROWID
+            pass
+    order = ', '.join(str(i) for i in range(1, len(cols) + 1))
+    return cols, conn.execute(f"SELECT {', '.join(cols)} FROM {table} ORDER BY {order}").fetchall()
+
+def diff(ref_db, db, rowids=False):
+    """Human-readable differences between two databases (empty list when equal)."""
+    a, b = sqlite3.connect(ref_db), sqlite3.connect(db)
+    try:
+        problems = []
+        ta, tb = tables(a), tables(b)
+        for t in sorted(set(ta) ^ set(tb)):
+            problems.append(f"{t}: only in {'reference' if t in ta else 'this mode'}")
+        for t in sorted(set(ta) & set(tb)):
+            (ca, ra), (cb, rb) = contents(a, t, rowids), contents(b, t, rowids)
+            if ca != cb:
+                problems.append(f"{t}: columns differ")
+            elif ra != rb:
+                first = next((x, y) for x, y in zip(ra + [None], rb + [None]) if x != y)
+                problems.append(f"{t}: {len(ra):,} vs {len(rb):,} rows, first difference\n"
+                                f"         {first[0]}\n         {first[1]}")
+        return problems
+    finally:
+        a.close()
+        b.close()
+
+def main():
+    ap = argparse.ArgumentParser(description="Check that every import mode builds the same database")
+    ap.add_argument('--rows', type=int, default=2000, help="visits in the generated export")
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--modes', default=','.join([m for m in MODES if m != REFERENCE]
+                                                + [REMERGE, EDITED, BACKFILL, ARCHIVED]),
+                    help=f"comma-separated, from: {', '.join(MODES)}, {REMERGE}, {EDITED}, "
+                         f"{BACKFILL}, {ARCHIVED}")
+    ap.add_argument('--data-dir', default=str(Path(tempfile.gettempdir()) / 'pawsclaws-check'))
+    args = ap.parse_args()
+
+    modes = args.modes.split(',')
+    unknown = set(modes) - set(MODES) - {REMERGE, EDITED, BACKFILL, ARCHIVED}
+    if unknown:
+        ap.error(f"unknown mode(s): {', '.join(sorted(unknown))}")
+
+    data = Path(args.data_dir)
+    csv_dir = data / f"csv_{args.rows}_{args.seed}"
+    if not (csv_dir / 'Invoices.csv').exists():
+        print(f"🧪 Generating {args.rows:,}-visit export (seed {args.seed})…")
+        gen_clinic_data.generate(csv_dir, args.rows, seed=args.seed)
+
+    def db_for(mode):
+        return data / f"check_{args.rows}_{args.seed}_{mode.replace('+', '_')}.db"
+
+    print(f"📥 {REFERENCE:<18} (reference) …", end=' ', flush=True)
+    t0 = time.perf_counter()
+    load(MODES[REFERENCE], csv_dir, db_for(REFERENCE))
+    print(f"{time.perf_counter() - t0:.2f}s")
+
+    branches = {'north': str(csv_dir), 'south': str(csv_dir)}
+    failed = []
+    for mode in modes:
+        print(f"🔍 {mode:<18} …", end=' ', flush=True)
+        t0 = time.perf_counter()
+        if mode == REMERGE:
+            load([{'bulk': True, 'branches': branches}], csv_dir, db_for('merged-once'))
+            load([{'bulk': True, 'branches': branches}] * 2, csv_dir, db_for(mode))
+            problems = diff(db_for('merged-once'), db_for(mode), rowids=True)
+        elif mode == BACKFILL:
+            gap = data / f"csv_{args.rows}_{args.seed}_gap"
+            drop_keys(csv_dir, gap, GAP_FILES)
+            load([{'csv_dir': str(gap)}, {}], csv_dir, db_for(mode))
+            problems = diff(db_for(REFERENCE), db_for(mode))
+            drop_keys(csv_dir, gap, GAP_FILES + ['pet_parents.csv'])
+            load([{'upsert': True, 'csv_dir': str(gap)}, {'upsert': True}], csv_dir,
+                 db_for(mode + '-upsert'))
+            problems += diff(db_for(REFERENCE), db_for(mode + '-upsert'))
+        elif mode == ARCHIVED:
+            archived = {'bulk': True, 'archive_before': ARCHIVE_CUTOFF}
+            load([archived], csv_dir, db_for('archived'))
+            problems = []
+            for again in ({}, {'elt': True}):
+                db = db_for(f"{mode}-{next(iter(again), 'rows')}")
+                load([archived, again], csv_dir, db)
+                problems += diff(db_for('archived'), db) + [
+                    f"archive: {p}" for p in diff(archive_path(db_for('archived')), archive_path(db))]
+        elif mode == EDITED:
+            edited = data / f"csv_{args.rows}_{args.seed}_edited"
+            edit_phone(csv_dir, edited)
+            load(MODES[REFERENCE], edited, db_for('edited'))
+            load([{'upsert': True}, {'upsert': True, 'csv_dir': str(edited)}], csv_dir, db_for(mode))
+            problems = diff(db_for('edited'), db_for(mode))
+        else:
+            load(MODES[mode], csv_dir, db_for(mode))
+            problems = diff(db_for(REFERENCE), db_for(mode))
+            report = json.loads(db_for(mode).with_suffix('.import.json').read_text())
+            if any(kw.get('cpus', 1) > 1 for kw in MODES[mode]) and 'parallel' not in report['mode']:
+                problems.append(f"ran as {report['mode']!r}, not in the parse pool")
+        print(f"{time.perf_counter() - t0:.2f}s  " + ("✓ same" if not problems else "❌ differs"))
+        for p in problems:
+            print(f"      {p}")
+        if problems:
+            failed.append(mode)
+
+    if failed:
+        print(f"\n❌ {len(failed)} check(s) failed: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"\n✅ All {len(modes)} check(s) passed")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+gen_clinic_data.py
+Writes a synthetic Paws & Claws CSV export (the ten files import_data.py reads)
+at any scale, with the same quirks as the real exports: 'NULL' / 'nan' / 'NA' /
+empty cells, duplicated ids from overlapping exports, the duplicated prescription_id
+header, " Dec 20th, 2025" invoice dates and vitals typed in with units.
+Run: python3 gen_clinic_data.py --rows 100000 --out /tmp/csvdata
+"""
+
+import csv, argparse, time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+CHUNK = 200_000            # rows generated / written per step
+START = np.datetime64('2019-01-01T00:00:00')
+SPAN  = 7 * 365 * 86400    # seconds of history covered by timestamps
+
+FIRST_NAMES = ['sarah', 'safifullah', 'Arun', 'Priya', 'Karthik', 'Divya', 'Rahul', 'Meena',
+               'Vijay', 'Anitha', 'Suresh', 'Lakshmi', 'Ganesh', 'Revathi', 'Manoj', 'Kavya']
+PET_NAMES = ['STEFFI', 'Daisy', 'jasmin', 'BILLU', 'Bruno', 'Simba', 'Coco', 'Max', 'Luna',
+             'Rocky', 'Milo', 'Tiger', 'Leo', 'Bella', 'Charlie', 'Snowy']
+SPECIES = ['Canine', 'Canine', 'Canine', 'Feline', 'Feline', 'Others', '0']
+BREEDS = ['Labrador', 'Golden Retriever', 'Pug', 'Shih Tzu', 'Indie', 'Beagle', 'Persian',
+          'Siamese', 'Rottweiler', 'German Shepherd']
+COMPLAINTS = ['vomiting', 'diarrhoea', 'limping', 'itching', 'not eating', 'cough',
+              'ear infection', 'skin rash', 'lethargy', 'vaccination visit', 'tick infestation']
+DIAGNOSES = ['Gastroenteritis', 'Otitis externa', 'Dermatitis', 'Tick fever', 'Parvo viral enteritis',
+             'Arthritis', 'Healthy', 'Upper respiratory infection', 'Pyoderma', 'Fracture']
+PLANS = ['Fluids + antiemetic, review in 2 days', 'Ear cleaning + drops BID x 7 days',
+         'Medicated bath weekly', 'Doxycycline 10 mg/kg x 21 days', 'Rest, NSAIDs x 5 days',
+         'Booster due in 1 year']
+MEDS = ['Amoxicillin', 'Meloxicam', 'Doxycycline', 'Ondansetron', 'Metronidazole', 'Ivermectin',
+        'Cefpodoxime', 'Prednisolone']
+VACCINES = ['DHPPi+L', 'Anti-Rabies', 'Tricat', 'Deworming', 'Kennel Cough']
+PAYMENT_TYPES = ['Cash', 'GooglePay', 'Paytm', 'UPI', 'Debit Card', 'Credit Card', 'NEFT',
+                 'IMPS', 'Cheque', 'Credits', '']
+STATUSES = ['Paid', 'Paid', 'Paid', 'Draft', 'Outstanding']
+# 'na' / 'N/a' / 'Na' are text to read_csv() but '#NA' / '-nan' / '1.#IND' are missing
+DIRTY = np.array(['NULL', 'nan', '', 'None', 'na', 'N/a', 'Na', '#NA', '-nan', '1.#IND'],
+                 dtype=object)
+
+def pick(rng, choices, n):
+    return np.asarray(choices, dtype=object)[rng.integers(0, len(choices), n)]
+
+def dirty(rng, values, rate):
+    """Replace `rate` of the values with the junk the clinic exports contain."""
+    values = np.asarray(values, dtype=object)
+    mask = rng.random(len(values)) < rate
+    values[mask] = DIRTY[rng.integers(0, len(DIRTY), mask.sum())]
+    return values
+
+def dup_ids(rng, ids, rate):
+    """Repeat the previous id on `rate` of rows, like overlapping cumulative exports."""
+    ids = np.array(ids)
+    mask = rng.random(len(ids)) < rate
+    mask[0] = False
+    ids[mask] = ids[np.flatnonzero(mask) - 1]
+    return ids
+
+def stamps(lo, hi, total):
+    """Monotonic 'YYYY-MM-DD HH:MM:SS' timestamps for rows lo..hi of `total`."""
+    secs = (np.arange(lo, hi, dtype=np.int64) * SPAN) // max(total, 1)
+    return pd.Series(START + secs.astype('timedelta64[s]')).dt.strftime('%Y-%m-%d %H:%M:%S').values
+
+def report_dates(ts):
+    """' Dec 20th, 2025' — the format the billing system exports dates in."""
+    dt = pd.to_datetime(pd.Series(ts))
+    day = dt.dt.day
+    suffix = np.where(day.isin([11, 12, 13]), 'th',
+                      pd.Series(day % 10).map({1: 'st', 2: 'nd', 3: 'rd'}).fillna('th'))
+    return (' ' + dt.dt.strftime('%b') + ' ' + day.astype(str) + suffix
+            + ', ' + dt.dt.year.astype(str)).values
+
+def write_csv(path, header, total, make):
+    """Write `total` rows in CHUNK-sized slices from make(lo, hi) -> list of columns."""
+    with open(path, 'w', newline='') as f:
+        csv.writer(f).writerow(header)
+        for lo in range(0, total, CHUNK):
+            hi = min(lo + CHUNK, total)
+            cols = make(lo, hi)
+            pd.DataFrame(dict(enumerate(cols))).to_csv(f, header=False, index=False)
+
+def generate(out, rows, seed=42, dirty_rate=0.03, dup_rate=0.002):
+    """Write all ten CSVs into `out`, sized from `rows` (visits / SOAP rows per
+    table). Returns {file name: rows written}."""
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    n_parents  = max(rows // 8, 10)
+    n_patients = max(rows // 4, 20)
+    n_rx       = rows * 3 // 2
+    n_vacc     = max(rows // 2, 1)
+    first_patient = 10001
+    counts = {}
+
+    def patient_ids(n):
+        return rng.integers(first_patient, first_patient + n_patients, n)
+
+    def parents(lo, hi):
+        n = hi - lo
+        ids = dup_ids(rng, np.arange(lo + 1, hi + 1), dup_rate)
+        return [ids,
+                dirty(rng, pick(rng, FIRST_NAMES, n) + ' ' + (ids % 997).astype(str), dirty_rate),
+                dirty(rng, (9000000000 + rng.integers(0, 999999999, n)).astype(str), dirty_rate),
+                dirty(rng, pick(rng, FIRST_NAMES, n) + ids.astype(str) + '@mail.com', dirty_rate * 3),
+                stamps(lo, hi, n_parents)]
+    write_csv(out / 'pet_parents.csv', ['pet_parent_id', 'name', 'mobile_no', 'email_id', 'timestamp'],
+              n_parents, parents)
+    counts['pet_parents.csv'] = n_parents
+
+    def patients(lo, hi):
+        n = hi - lo
+        ids = dup_ids(rng, np.arange(first_patient + lo, first_patient + hi), dup_rate)
+        ppid = rng.integers(1, n_parents + 1, n).astype(object)
+        ppid[rng.random(n) < dirty_rate] = ''
+        return [ids, dirty(rng, pick(rng, PET_NAMES, n), dirty_rate / 3),
+                dirty(rng, pick(rng, ['Male', 'Female'], n), dirty_rate),
+                dirty(rng, pick(rng, SPECIES, n), dirty_rate),
+                dirty(rng, pick(rng, BREEDS, n), dirty_rate),
+                dirty(rng, rng.integers(1, 15, n).astype(str) + ' yrs', dirty_rate),
+                dirty(rng, pick(rng, ['Black', 'Brown', 'White', 'Golden', 'Tan'], n), dirty_rate),
+                np.where(rng.random(n) < .7, '', (985000000000000 + rng.integers(0, 10**9, n)).astype(str)),
+                dirty(rng, pick(rng, ['white patch', 'black spot', 'none'], n), dirty_rate * 5),
+                ppid, dirty(rng, pick(rng, ['Active', 'Active', 'Inactive'], n), dirty_rate),
+                stamps(lo, hi, n_patients)]
+    write_csv(out / 'patients.csv',
+              ['patient_id', 'name', 'sex', 'species', 'breed', 'age_dob', 'color', 'microchip_no',
+               'identify_mark', 'pet_parent_id', 'status', 'timestamp'], n_patients, patients)
+    counts['patients.csv'] = n_patients
+
+    def subjective(lo, hi):
+        n = hi - lo
+        yn = lambda: dirty(rng, pick(rng, ['Normal', 'Reduced', 'Increased'], n), dirty_rate)
+        return [dup_ids(rng, np.arange(lo + 1, hi + 1), dup_rate), patient_ids(n),
+                dirty(rng, pick(rng, ['', 'owner reports improvement', 'second visit'], n), dirty_rate),
+                yn(), dirty(rng, pick(rng, ['Bright', 'Dull', 'QAR'], n), dirty_rate), yn(),
+                dirty(rng, pick(rng, ['none', 'swelling', 'discharge'], n), dirty_rate), yn(), yn(),
+                dirty(rng, pick(rng, COMPLAINTS, n), dirty_rate),
+                dirty(rng, rng.integers(1, 10, n).astype(str) + ' days', dirty_rate),
+                stamps(lo, hi, rows)]
+    write_csv(out / 'subjective.csv',
+              ['subject_id', 'patient_id', 'addnotes', 'appetite', 'attid', 'drinking', 'notice',
+               'poopng', 'urnatng', 'cheifcom', 'duration', 'timestamp'], rows, subjective)
+
+    def objective(lo, hi):
+        n = hi - lo
+        temp = np.round(rng.normal(38.8, .6, n), 1).astype(str)
+        temp = np.where(rng.random(n) < .1, temp + ' °C', temp)
+        weight = np.round(rng.gamma(2.5, 6, n), 1).astype(str)
+        weight = np.where(rng.random(n) < .3, weight + ' kg', weight)
+        return [dup_ids(rng, np.arange(lo + 1, hi + 1), dup_rate), patient_ids(n),
+                dirty(rng, temp, dirty_rate),
+                dirty(rng, rng.integers(60, 180, n).astype(str), dirty_rate),
+                dirty(rng, rng.integers(12, 40, n).astype(str), dirty_rate),
+                dirty(rng, weight, dirty_rate),
+                dirty(rng, pick(rng, ['Pink', 'Pale', 'Congested'], n), dirty_rate),
+                dirty(rng, pick(rng, ['NAD', 'Enlarged'], n), dirty_rate),
+                dirty(rng, pick(rng, ['Normal', '5%', '8%'], n), dirty_rate),
+                dirty(rng, pick(rng, ['<2', '2', '<2 sec', '3'], n), dirty_rate),
+                dirty(rng, rng.integers(1, 10, n).astype(str) + pick(rng, ['', '/9'], n), dirty_rate),
+                dirty(rng, pick(rng, ['NAD', 'Matted coat', 'Wound on limb'], n), dirty_rate),
+                stamps(lo, hi, rows)]
+    write_csv(out / 'objective.csv',
+              ['objective_id', 'patient_id', 'temp', 'pulse', 'resprate', 'weight', 'mucmemb',
+               'lymnodes', 'hydration', 'crt', 'bcs', 'visual_exam', 'timestamp'], rows, objective)
+
+    for name, key, col, choices in (('assessment.csv', 'assess_id', 'diagnosis', DIAGNOSES),
+                                    ('plan.csv', 'plan_id', 'plan', PLANS)):
+        def simple(lo, hi, choices=choices):
+            n = hi - lo
+            return [dup_ids(rng, np.arange(lo + 1, hi + 1), dup_rate), patient_ids(n),
+                    dirty(rng, pick(rng, choices, n), dirty_rate), stamps(lo, hi, rows)]
+        write_csv(out / name, [key, 'patient_id', col, 'timestamp'], rows, simple)
+
+    def records(lo, hi):
+        n = hi - lo
+        ids = np.arange(lo + 1, hi + 1)
+        opt = lambda: np.where(rng.random(n) < .05, '', ids.astype(str))
+        return [dup_ids(rng, ids, dup_rate), patient_ids(n), opt(), opt(), opt(), opt(),
+                np.where(rng.random(n) < .4, '', ((ids * 2) // 3 + 1).astype(str)),
+                rng.integers(1, 6, n), stamps(lo, hi, rows)]
+    write_csv(out / 'records.csv',
+              ['record_id', 'patient_id', 'subject_id', 'objective_id', 'assess_id', 'plan_id',
+               'prescription_id', 'user_id', 'timestamp'], rows, records)
+
+    def prescriptions(lo, hi):
+        n = hi - lo
+        ids = np.arange(lo + 1, hi + 1)
+        rx = ids // 2 + 1
+        return [dup_ids(rng, ids, dup_rate), rx, patient_ids(n),
+                dirty(rng, pick(rng, MEDS, n), dirty_rate), pick(rng, ['Tab', 'Syp', 'Inj'], n),
+                rng.integers(1, 3, n), pick(rng, ['tab', 'ml'], n), rng.integers(3, 15, n),
+                pick(rng, ['days', 'weeks'], n), np.where(rng.random(n) < .02, '', rx.astype(str)),
+                pick(rng, ['OD', 'BID', 'TID'], n),
+                dirty(rng, pick(rng, ['after food', 'before food', 'with water'], n), dirty_rate * 3),
+                stamps(lo, hi, n_rx)]
+    # the real export carries prescription_id twice; import_data.py reads the second one
+    write_csv(out / 'prescription.csv',
+              ['presmeds_id', 'prescription_id', 'patient_id', 'med_name', 'prefix', 'quan',
+               'quan_type', 'dur', 'dur_type', 'prescription_id', 'freq', 'instruction', 'timestamp'],
+              n_rx, prescriptions)
+    counts['prescription.csv'] = n_rx
+
+    def vaccinations(lo, hi):
+        n = hi - lo
+        ts = stamps(lo, hi, n_vacc)
+        return [dup_ids(rng, np.arange(lo + 1, hi + 1), dup_rate), np.arange(lo + 1, hi + 1),
+                patient_ids(n), pd.Series(ts).str[:10].values,
+                dirty(rng, rng.integers(1, 15, n).astype(str) + ' yrs', dirty_rate),
+                pick(rng, ['Dr. Ravi', 'Dr. Sneha', 'Dr. Kumar'], n),
+                pick(rng, ['Vaccination', 'Vaccination', 'Deworming', 'Tick & Flea'], n),
+                pick(rng, VACCINES, n), ts]
+    write_csv(out / 'vaccinations.csv',
+              ['pchistory_id', 'preventive_id', 'patient_id', 'date', 'age', 'veterinarian',
+               'type_care', 'treatment', 'timestamp'], n_vacc, vaccinations)
+    counts['vaccinations.csv'] = n_vacc
+
+    def invoices(lo, hi):
+        n = hi - lo
+        ids = dup_ids(rng, np.arange(lo + 1, hi + 1), dup_rate)
+        ts = stamps(lo, hi, rows)
+        ts_s = pd.Series(ts)
+        ref = ('IN:01-' + ts_s.str[2:4] + ts_s.str[5:7] + '-' + pd.Series(ids).map('{:04d}'.format)).values
+        total = (rng.integers(3, 120, n) * 50).astype(object)
+        total[rng.random(n) < dirty_rate / 3] = 'NULL'
+        pid = patient_ids(n).astype(object)
+        pid[rng.random(n) < .01] = ''
+        return [ids, dirty(rng, ref, dirty_rate / 10), report_dates(ts), pid,
+                rng.integers(1, n_parents + 1, n), pick(rng, PAYMENT_TYPES, n), total,
+                np.where(rng.random(n) < .8, 0, rng.integers(1, 10, n) * 10),
+                dirty(rng, pick(rng, STATUSES, n), dirty_rate / 3),
+                np.where(rng.random(n) < .5, '', ids.astype(str)),
+                np.where(rng.random(n) < .8, '', ids.astype(str)), ts]
+    write_csv(out / 'Invoices.csv',
+              ['invoice_id', 'ref', 'date', 'patient_id', 'pet_parent_id', 'payment_type', 'total',
+               'final_discount', 'status', 'plan_id', 'preventive_id', 'timestamp'], rows, invoices)
+
+    for name in ('subjective.csv', 'objective.csv', 'assessment.csv', 'plan.csv',
+                 'records.csv', 'Invoices.csv'):
+        counts[name] = rows
+    return counts
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description="Generate a synthetic clinic CSV export")
+    ap.add_argument('--rows', type=int, default=10_000,
+                    help="visits (SOAP / records / invoices rows); other files scale from it")
+    ap.add_argument('--out', default=str(Path(__file__).parent / "csvdata"))
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--dirty', type=float, default=0.03, help="share of junk cells (default 0.03)")
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    counts = generate(args.out, args.rows, seed=args.seed, dirty_rate=args.dirty)
+    print(f"✓ {sum(counts.values()):,} rows in {len(counts)} files → {args.out} "
+          f"({time.perf_counter() - t0:.1f}s)")
@@ -2,18 +2,57 @@
 """
 import_data.py
 Imports all Paws & Claws clinic CSV exports into clinic.db (SQLite)
-Run: python3 import_data.py
+Run: python3 import_data.py            (row-by-row, original path)
+     python3 import_data.py --bulk     (vectorised columns + batched executemany)
+     python3 import_data.py --incremental   (bulk, only changed files / new rows)
+     python3 import_data.py --upsert        (bulk, changed files; new rows + changed rows)
+     python3 import_data.py --stream        (bulk, fixed-size chunks, bounded memory)
+     python3 import_data.py --parallel [N]  (bulk, N parser processes + one writer)
+     python3 import_data.py --elt           (raw_* staging tables + set-based SQL)
+     python3 import_data.py --watch         (catch up, then import new rows as exports land)
+     add --swap to any of these to build in a scratch file and swap it in atomically
+     add --profile [FILE] to run under cProfile; every run writes clinic.import.json
+     add --branch NAME=DIR per branch to import branches concurrently and merge them
+     add --snapshot [FILE] to write a compacted VACUUM INTO copy (clinic.snapshot.db) after the load
+     add --archive-before YYYY-MM-DD to move older visits / invoices into clinic.archive.db
+     Revenue_Report_*.csv in the CSV dir (or --revenue-reports PATH…) are reconciled against invoices
+     bulk modes commit every --commit-rows rows; re-run after a crash / Ctrl-C to resume
 """
 
 import sqlite3
+import numpy as np
 import pandas as pd
-import os, sys, re
+from pandas._libs.parsers import STR_NA_VALUES     # read_csv()'s default na_values
+import os, sys, re, io, csv, json, time, argparse, hashlib, multiprocessing, unicodedata
+from collections import Counter
+from itertools import chain
+from contextlib import contextmanager, redirect_stdout
+from datetime import date
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from queue import Empty, Full
+
+try:
+    import resource                      # peak RSS; not available on Windows
+except ImportError:
+    resource = None
 
 # ─── CONFIG ───────────────────────────────────────────────────────────────────
 CSV_DIR = Path(__file__).parent / "csvdata"
 DB_PATH = Path(__file__).parent / "clinic.db"
 
+NULL_STRINGS = ('null', 'none', 'nan', '')
+CHUNK_ROWS   = 50_000      # rows per chunk in --stream mode
+COMMIT_ROWS  = 50_000      # rows per checkpointed commit in the bulk modes
+
+# Normalize payment method
+METHOD_MAP = {
+    'cash': 'Cash', 'debit card': 'Card', 'credit card': 'Card',
+    'googlepay': 'UPI', 'paytm': 'UPI', 'upi': 'UPI',
+    'neft': 'Bank Transfer', 'imps': 'Bank Transfer', 'rtgs': 'Bank Transfer',
+    'cheque': 'Cheque', 'credits': 'Credits'
+}
+
 def clean(val):
     """Return None for NULL strings and NaN."""
     if val is None: return None
@@ -21,212 +60,1487 @@ def clean(val):
         import math
         if math.isnan(val): return None
     s = str(val).strip()
-    if s.lower() in ('null', 'none', 'nan', ''): return None
+    if s.lower() in NULL_STRINGS: return None
     return s
 
-def run():
-    print(f"\n🐾 Paws & Claws — CSV Import Tool")
-    print(f"   Database : {DB_PATH}")
-    print(f"   CSV Dir  : {CSV_DIR}\n")
+# ─── SCHEMA ───────────────────────────────────────────────────────────────────
+SCHEMA_SQL = """
+    -- Pet parents / owners
+    CREATE TABLE IF NOT EXISTS pet_parents (
+        pet_parent_id   INTEGER PRIMARY KEY,
+        name            TEXT NOT NULL,
+        mobile_no       TEXT,
+        email_id        TEXT,
+        created_at      TEXT
+    );
 
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("PRAGMA foreign_keys = OFF")   # disable during bulk import
-    conn.execute("PRAGMA journal_mode = WAL")
-    cur = conn.cursor()
+    -- Patients (full schema)
+    CREATE TABLE IF NOT EXISTS patients (
+        id              TEXT PRIMARY KEY,
+        patient_id      INTEGER UNIQUE,
+        name            TEXT NOT NULL,
+        sex             TEXT,
+        type            TEXT,          -- Canine/Feline/Others
+        breed           TEXT,
+        age             TEXT,          -- age_dob
+        colour          TEXT,
+        microchip_no    TEXT,
+        identify_mark   TEXT,
+        owner_name      TEXT,
+        phone           TEXT,
+        email           TEXT,
+        address         TEXT,
+        pet_parent_id   INTEGER REFERENCES pet_parents(pet_parent_id),
+        status          TEXT,
+        created_at      TEXT
+    );
 
-    # ── 1. EXTEND / CREATE TABLES ────────────────────────────────────────────
+    -- SOAP: Subjective
+    CREATE TABLE IF NOT EXISTS soap_subjective (
+        subject_id      INTEGER PRIMARY KEY,
+        patient_id      INTEGER,
+        addnotes        TEXT,
+        appetite        TEXT,
+        attitude        TEXT,
+        drinking        TEXT,
+        notice          TEXT,
+        pooping         TEXT,
+        urinating       TEXT,
+        chief_complaint TEXT,
+        duration        TEXT,
+        created_at      TEXT
+    );
+
+    -- SOAP: Objective (vitals)
+    CREATE TABLE IF NOT EXISTS soap_objective (
+        objective_id    INTEGER PRIMARY KEY,
+        patient_id      INTEGER,
+        temp            TEXT,
+        pulse           TEXT,
+        resprate        TEXT,
+        weight          TEXT,
+        mucmemb         TEXT,
+        lymnodes        TEXT,
+        hydration       TEXT,
+        crt             TEXT,
+        bcs             TEXT,
+        visual_exam     TEXT,
+        created_at      TEXT
+    );
+
+    -- SOAP: Assessment
+    CREATE TABLE IF NOT EXISTS soap_assessment (
+        assess_id       INTEGER PRIMARY KEY,
+        patient_id      INTEGER,
+        diagnosis       TEXT,
+        created_at      TEXT
+    );
+
+    -- SOAP: Plan
+    CREATE TABLE IF NOT EXISTS soap_plan (
+        plan_id         INTEGER PRIMARY KEY,
+        patient_id      INTEGER,
+        plan            TEXT,
+        created_at      TEXT
+    );
+
+    -- Visit records (links all SOAP parts)
+    CREATE TABLE IF NOT EXISTS records (
+        record_id       INTEGER PRIMARY KEY,
+        patient_id      INTEGER,
+        subject_id      INTEGER REFERENCES soap_subjective(subject_id),
+        objective_id    INTEGER REFERENCES soap_objective(objective_id),
+        assess_id       INTEGER REFERENCES soap_assessment(assess_id),
+        plan_id         INTEGER REFERENCES soap_plan(plan_id),
+        prescription_id INTEGER,
+        user_id         INTEGER,
+        created_at      TEXT
+    );
+
+    -- Prescriptions / medications
+    CREATE TABLE IF NOT EXISTS prescriptions (
+        presmeds_id     INTEGER PRIMARY KEY,
+        patient_id      INTEGER,
+        prescription_id INTEGER,
+        med_name        TEXT,
+        prefix          TEXT,
+        quantity        TEXT,
+        quantity_type   TEXT,
+        duration        TEXT,
+        duration_type   TEXT,
+        frequency       TEXT,
+        instruction     TEXT,
+        created_at      TEXT
+    );
+
+    -- Vaccinations / preventive care
+    CREATE TABLE IF NOT EXISTS vaccinations (
+        pchistory_id    INTEGER PRIMARY KEY,
+        preventive_id   INTEGER,
+        patient_id      INTEGER,
+        date            TEXT,
+        age             TEXT,
+        veterinarian    TEXT,
+        type_care       TEXT,
+        treatment       TEXT,
+        created_at      TEXT
+    );
+
+    -- Invoices (full)
+    CREATE TABLE IF NOT EXISTS invoices (
+        ref             TEXT PRIMARY KEY,
+        invoice_id      INTEGER UNIQUE,
+        date            TEXT,
+        patient_id      INTEGER,
+        patient_name    TEXT,
+        patient_type    TEXT,
+        owner_name      TEXT,
+        phone           TEXT,
+        pet_parent_id   INTEGER,
+        payment_type    TEXT,
+        method          TEXT,   -- normalised
+        discount        REAL DEFAULT 0,
+        total           REAL DEFAULT 0,
+        paid_amount     REAL DEFAULT 0,
+        balance         REAL DEFAULT 0,
+        status          TEXT DEFAULT 'Draft',
+        plan_id         INTEGER,
+        preventive_id   INTEGER,
+        subtotal        REAL DEFAULT 0,
+        created_at      TEXT
+    );
+
+    -- Invoice line items
+    CREATE TABLE IF NOT EXISTS invoice_items (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        invoice_ref     TEXT REFERENCES invoices(ref) ON DELETE CASCADE,
+        name            TEXT NOT NULL,
+        quantity        REAL DEFAULT 1,
+        unit_price      REAL DEFAULT 0,
+        discount        REAL DEFAULT 0,
+        total           REAL DEFAULT 0
+    );
+
+    -- Counters (keep existing)
+    CREATE TABLE IF NOT EXISTS counters (
+        key   TEXT PRIMARY KEY,
+        value INTEGER DEFAULT 1
+    );
+    INSERT OR IGNORE INTO counters(key,value) VALUES('invoice',1),('patient',10000);
+
+    -- Keep checkins table from original schema
+    CREATE TABLE IF NOT EXISTS checkins (
+        id           TEXT PRIMARY KEY,
+        patient_id   TEXT,
+        patient_name TEXT,
+        owner_name   TEXT,
+        doctor       TEXT,
+        date         TEXT,
+        complaint    TEXT,
+        subjective   TEXT,
+        objective    TEXT,
+        assessment   TEXT,
+        plan         TEXT,
+        procedures   TEXT,
+        medications  TEXT,
+        followup     TEXT,
+        status       TEXT DEFAULT 'open',
+        created_at   TEXT DEFAULT (datetime('now','localtime'))
+    );
+
+    -- Incremental import: per-file content fingerprint + highest key imported
+    CREATE TABLE IF NOT EXISTS import_state (
+        file         TEXT PRIMARY KEY,
+        fingerprint  TEXT,
+        key_col      TEXT,
+        high_water   INTEGER,
+        rows         INTEGER,
+        imported_at  TEXT DEFAULT (datetime('now','localtime'))
+    );
+
+    -- Accounting-system Revenue_Report_*.csv rows, latest report per ref (see REVENUE RECONCILIATION)
+    CREATE TABLE IF NOT EXISTS revenue_report (
+        ref          TEXT PRIMARY KEY,
+        date_iso     TEXT,
+        client       TEXT,
+        patient      TEXT,
+        total        REAL,
+        balance      REAL,
+        status       TEXT,
+        report       TEXT                 -- file the row came from
+    );
+
+    -- Differences found by the last reconciliation of revenue_report against invoices
+    CREATE TABLE IF NOT EXISTS revenue_reconciliation (
+        ref           TEXT,
+        issue         TEXT,               -- missing_invoice / missing_from_report / total / balance / status
+        report_value  TEXT,
+        invoice_value TEXT,
+        report        TEXT,
+        PRIMARY KEY (ref, issue)
+    ) WITHOUT ROWID;
+
+    -- Checkpoints of an unfinished bulk import (see CHECKPOINTS); emptied when a run completes
+    CREATE TABLE IF NOT EXISTS import_progress (
+        file         TEXT PRIMARY KEY,
+        stamp        TEXT,                -- size:mtime of the file the checkpoint belongs to
+        start_rowid  INTEGER,             -- table's MAX(rowid) when the interrupted run began
+        rows_done    INTEGER DEFAULT 0,   -- CSV data rows covered by committed batches
+        last_key     INTEGER,             -- highest key read so far
+        batches      INTEGER DEFAULT 0,
+        done         INTEGER DEFAULT 0,
+        updated_at   TEXT
+    );
+
+    -- Branches merged into this database (see MULTI-BRANCH)
+    CREATE TABLE IF NOT EXISTS branches (
+        name         TEXT PRIMARY KEY,
+        number       INTEGER UNIQUE,      -- ids shifted by (number - 1) * BRANCH_STRIDE
+        csv_dir      TEXT,
+        shard        TEXT,
+        merged_at    TEXT
+    );
+
+    -- Upsert mode: 64-bit hash of each imported source row, by table + key (see UPSERT)
+    CREATE TABLE IF NOT EXISTS row_hashes (
+        tbl          TEXT,
+        key          INTEGER,
+        hash         INTEGER,
+        PRIMARY KEY (tbl, key)
+    ) WITHOUT ROWID;
+
+    -- rowids rewritten by an upsert run, for the derived stages; emptied with the checkpoints
+    CREATE TABLE IF NOT EXISTS upserted_rows (
+        tbl          TEXT,
+        rid          INTEGER,
+        PRIMARY KEY (tbl, rid)
+    ) WITHOUT ROWID;
+
+    -- rowids a run inserted at or below its rowid marks (see CHECKPOINTS); emptied with them
+    CREATE TABLE IF NOT EXISTS inserted_rows (
+        tbl          TEXT,
+        rid          INTEGER,
+        PRIMARY KEY (tbl, rid)
+    ) WITHOUT ROWID;
+
+    -- Numeric vitals per patient over time (see TYPED VITALS)
+    CREATE TABLE IF NOT EXISTS vitals_series (
+        patient_id    INTEGER NOT NULL,
+        taken_at      INTEGER NOT NULL,        -- soap_objective.created_epoch
+        objective_id  INTEGER NOT NULL,
+        temp_c        REAL,
+        pulse_bpm     INTEGER,
+        resprate_bpm  INTEGER,
+        weight_kg     REAL,
+        crt_secs      REAL,
+        bcs_score     REAL,
+        PRIMARY KEY (patient_id, taken_at, objective_id)
+    ) WITHOUT ROWID;
+
+    -- Type-ahead keys for patients / pet parents (see SEARCH KEYS)
+    CREATE TABLE IF NOT EXISTS search_keys (
+        kind           TEXT NOT NULL,          -- name / owner / breed / phone / tri
+        key            TEXT NOT NULL,          -- normalised word, digits, or trigram
+        src            TEXT NOT NULL,          -- patients / pet_parents
+        src_rowid      INTEGER NOT NULL,
+        patient_id     INTEGER,
+        pet_parent_id  INTEGER,
+        PRIMARY KEY (kind, key, src, src_rowid)
+    ) WITHOUT ROWID;
+
+    -- Rows whose searched columns were edited since their keys were built
+    CREATE TABLE IF NOT EXISTS search_keys_todo (
+        src            TEXT NOT NULL,
+        src_rowid      INTEGER NOT NULL,
+        PRIMARY KEY (src, src_rowid)
+    ) WITHOUT ROWID;
+
+    -- One row per visit with its SOAP text, vitals, prescriptions and invoice
+    -- (see VISIT TIMELINE), clustered for the patient profile's range read
+    CREATE TABLE IF NOT EXISTS visit_timeline (
+        patient_id       INTEGER NOT NULL,
+        created_epoch    INTEGER NOT NULL,     -- records.created_epoch, 0 if missing / unparseable
+        created_at       TEXT NOT NULL,        -- records.created_at, '' if missing
+        record_id        INTEGER NOT NULL UNIQUE,
+        chief_complaint  TEXT,
+        diagnosis        TEXT,
+        plan             TEXT,
+        weight           TEXT,
+        temp             TEXT,
+        weight_kg        REAL,
+        temp_c           REAL,
+        prescription     TEXT,                 -- med names, in prescription order
+        prescription_items INTEGER,
+        invoice_ref      TEXT,
+        invoice_total    REAL,
+        PRIMARY KEY (patient_id, created_epoch, record_id)
+    ) WITHOUT ROWID;
+
+    -- Per-patient rollups (see PATIENT SUMMARY)
+    CREATE TABLE IF NOT EXISTS patient_summary (
+        patient_id          INTEGER PRIMARY KEY,
+        visit_count         INTEGER DEFAULT 0,
+        last_visit          TEXT,              -- MAX(records.created_epoch), 'YYYY-MM-DD HH:MM:SS'
+        invoice_count       INTEGER DEFAULT 0,
+        last_invoice        TEXT,              -- invoices.date_iso
+        lifetime_spend      REAL DEFAULT 0,    -- paid_amount of Paid invoices
+        outstanding_balance REAL DEFAULT 0,    -- balance of Outstanding invoices
+        last_vaccination    TEXT               -- vaccinations.date_iso
+    );
+
+    -- Latest vaccination / preventive care per patient and type_care
+    CREATE TABLE IF NOT EXISTS patient_care_last (
+        patient_id  INTEGER NOT NULL,
+        type_care   TEXT NOT NULL,
+        last_date   TEXT,                      -- vaccinations.date_iso
+        treatment   TEXT,
+        PRIMARY KEY (patient_id, type_care)
+    ) WITHOUT ROWID;
+
+    -- Revenue aggregates (see REVENUE AGGREGATES): invoice totals per day /
+    -- month, status and payment method; '' stands in for a missing key part
+    CREATE TABLE IF NOT EXISTS revenue_daily (
+        day          TEXT NOT NULL,            -- YYYY-MM-DD
+        status       TEXT NOT NULL,
+        method       TEXT NOT NULL,
+        invoices     INTEGER DEFAULT 0,
+        subtotal     REAL DEFAULT 0,
+        discount     REAL DEFAULT 0,
+        total        REAL DEFAULT 0,
+        paid_amount  REAL DEFAULT 0,
+        balance      REAL DEFAULT 0,
+        PRIMARY KEY (day, status, method)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS revenue_monthly (
+        month        TEXT NOT NULL,            -- YYYY-MM
+        status       TEXT NOT NULL,
+        method       TEXT NOT NULL,
+        invoices     INTEGER DEFAULT 0,
+        subtotal     REAL DEFAULT 0,
+        discount     REAL DEFAULT 0,
+        total        REAL DEFAULT 0,
+        paid_amount  REAL DEFAULT 0,
+        balance      REAL DEFAULT 0,
+        PRIMARY KEY (month, status, method)
+    ) WITHOUT ROWID;
+
+    -- Outstanding balance per day and running total up to that day; Draft
+    -- balances are not owed yet (as in server.js). Re-created every run, so
+    -- databases that kept an older definition pick this one up.
+    DROP VIEW IF EXISTS revenue_outstanding;
+    CREATE VIEW revenue_outstanding AS
+        SELECT day, SUM(balance) AS balance,
+               SUM(SUM(balance)) OVER (ORDER BY day) AS running_balance
+        FROM revenue_daily WHERE status = 'Outstanding'
+        GROUP BY day;
+"""
+
+# ─── INDEXES ──────────────────────────────────────────────────────────────────
+# Secondary indexes for the lookups the Express layer runs against imported
+# tables. Bulk loads drop them first and rebuild them in one pass at the end,
+# which is much cheaper than maintaining every b-tree row by row.
+
+# (index name, table, columns); full loads build the ones on DERIVED_INDEXED
+# tables after the stage that fills them, like the catalogue ones after the load
+INDEXES = [
+    ('idx_vaccinations_patient',  'vaccinations',  'patient_id, created_at'),
+    ('idx_prescriptions_patient', 'prescriptions', 'patient_id, created_at'),
+    ('idx_records_patient',       'records',       'patient_id, created_at'),
+    ('idx_invoices_patient',      'invoices',      'patient_id, date'),
+    ('idx_invoices_date',         'invoices',      'date'),
+    ('idx_invoices_status_date',  'invoices',      'status, date'),
+    ('idx_invoice_items_ref',     'invoice_items', 'invoice_ref'),
+    ('idx_invoices_date_iso',     'invoices',      'date_iso'),
+    ('idx_vaccinations_date_iso', 'vaccinations',  'date_iso'),
+    # record_id for full-text hits on SOAP notes / prescriptions
+    ('idx_records_subject',       'records',       'subject_id'),
+    ('idx_records_assess',        'records',       'assess_id'),
+    ('idx_records_plan',          'records',       'plan_id'),
+    ('idx_records_prescription',  'records',       'prescription_id'),
+    ('idx_search_keys_src',       'search_keys',   'src, src_rowid'),
+    # visit_timeline: prescription summary / linked invoice per record
+    ('idx_prescriptions_group',   'prescriptions', 'prescription_id'),
+    ('idx_invoices_plan',         'invoices',      'plan_id'),
+    # reminder-due scans: WHERE type_care = ? AND last_date < ?
+    ('idx_patient_care_due',      'patient_care_last', 'type_care, last_date'),
+]
 
-    cur.executescript("""
-        -- Pet parents / owners
-        CREATE TABLE IF NOT EXISTS pet_parents (
-            pet_parent_id   INTEGER PRIMARY KEY,
-            name            TEXT NOT NULL,
-            mobile_no       TEXT,
-            email_id        TEXT,
-            created_at      TEXT
-        );
-
-        -- Patients (full schema)
-        CREATE TABLE IF NOT EXISTS patients (
-            id              TEXT PRIMARY KEY,
-            patient_id      INTEGER UNIQUE,
-            name            TEXT NOT NULL,
-            sex             TEXT,
-            type            TEXT,          -- Canine/Feline/Others
-            breed           TEXT,
-            age             TEXT,          -- age_dob
-            colour          TEXT,
-            microchip_no    TEXT,
-            identify_mark   TEXT,
-            owner_name      TEXT,
-            phone           TEXT,
-            email           TEXT,
-            address         TEXT,
-            pet_parent_id   INTEGER REFERENCES pet_parents(pet_parent_id),
-            status          TEXT,
-            created_at      TEXT
-        );
-
-        -- SOAP: Subjective
-        CREATE TABLE IF NOT EXISTS soap_subjective (
-            subject_id      INTEGER PRIMARY KEY,
-            patient_id      INTEGER,
-            addnotes        TEXT,
-            appetite        TEXT,
-            attitude        TEXT,
-            drinking        TEXT,
-            notice          TEXT,
-            pooping         TEXT,
-            urinating       TEXT,
-            chief_complaint TEXT,
-            duration        TEXT,
-            created_at      TEXT
-        );
-
-        -- SOAP: Objective (vitals)
-        CREATE TABLE IF NOT EXISTS soap_objective (
-            objective_id    INTEGER PRIMARY KEY,
-            patient_id      INTEGER,
-            temp            TEXT,
-            pulse           TEXT,
-            resprate        TEXT,
-            weight          TEXT,
-            mucmemb         TEXT,
-            lymnodes        TEXT,
-            hydration       TEXT,
-            crt             TEXT,
-            bcs             TEXT,
-            visual_exam     TEXT,
-            created_at      TEXT
-        );
-
-        -- SOAP: Assessment
-        CREATE TABLE IF NOT EXISTS soap_assessment (
-            assess_id       INTEGER PRIMARY KEY,
-            patient_id      INTEGER,
-            diagnosis       TEXT,
-            created_at      TEXT
-        );
-
-        -- SOAP: Plan
-        CREATE TABLE IF NOT EXISTS soap_plan (
-            plan_id         INTEGER PRIMARY KEY,
-            patient_id      INTEGER,
-            plan            TEXT,
-            created_at      TEXT
-        );
-
-        -- Visit records (links all SOAP parts)
-        CREATE TABLE IF NOT EXISTS records (
-            record_id       INTEGER PRIMARY KEY,
-            patient_id      INTEGER,
-            subject_id      INTEGER REFERENCES soap_subjective(subject_id),
-            objective_id    INTEGER REFERENCES soap_objective(objective_id),
-            assess_id       INTEGER REFERENCES soap_assessment(assess_id),
-            plan_id         INTEGER REFERENCES soap_plan(plan_id),
-            prescription_id INTEGER,
-            user_id         INTEGER,
-            created_at      TEXT
-        );
-
-        -- Prescriptions / medications
-        CREATE TABLE IF NOT EXISTS prescriptions (
-            presmeds_id     INTEGER PRIMARY KEY,
-            patient_id      INTEGER,
-            prescription_id INTEGER,
-            med_name        TEXT,
-            prefix          TEXT,
-            quantity        TEXT,
-            quantity_type   TEXT,
-            duration        TEXT,
-            duration_type   TEXT,
-            frequency       TEXT,
-            instruction     TEXT,
-            created_at      TEXT
-        );
-
-        -- Vaccinations / preventive care
-        CREATE TABLE IF NOT EXISTS vaccinations (
-            pchistory_id    INTEGER PRIMARY KEY,
-            preventive_id   INTEGER,
-            patient_id      INTEGER,
-            date            TEXT,
-            age             TEXT,
-            veterinarian    TEXT,
-            type_care       TEXT,
-            treatment       TEXT,
-            created_at      TEXT
-        );
-
-        -- Invoices (full)
-        CREATE TABLE IF NOT EXISTS invoices (
-            ref             TEXT PRIMARY KEY,
-            invoice_id      INTEGER UNIQUE,
-            date            TEXT,
-            patient_id      INTEGER,
-            patient_name    TEXT,
-            patient_type    TEXT,
-            owner_name      TEXT,
-            phone           TEXT,
-            pet_parent_id   INTEGER,
-            payment_type    TEXT,
-            method          TEXT,   -- normalised
-            discount        REAL DEFAULT 0,
-            total           REAL DEFAULT 0,
-            paid_amount     REAL DEFAULT 0,
-            balance         REAL DEFAULT 0,
-            status          TEXT DEFAULT 'Draft',
-            plan_id         INTEGER,
-            preventive_id   INTEGER,
-            subtotal        REAL DEFAULT 0,
-            created_at      TEXT
-        );
-
-        -- Invoice line items
-        CREATE TABLE IF NOT EXISTS invoice_items (
-            id              INTEGER PRIMARY KEY AUTOINCREMENT,
-            invoice_ref     TEXT REFERENCES invoices(ref) ON DELETE CASCADE,
-            name            TEXT NOT NULL,
-            quantity        REAL DEFAULT 1,
-            unit_price      REAL DEFAULT 0,
-            discount        REAL DEFAULT 0,
-            total           REAL DEFAULT 0
-        );
-
-        -- Counters (keep existing)
-        CREATE TABLE IF NOT EXISTS counters (
-            key   TEXT PRIMARY KEY,
-            value INTEGER DEFAULT 1
-        );
-        INSERT OR IGNORE INTO counters(key,value) VALUES('invoice',1),('patient',10000);
-
-        -- Keep checkins table from original schema
-        CREATE TABLE IF NOT EXISTS checkins (
-            id           TEXT PRIMARY KEY,
-            patient_id   TEXT,
-            patient_name TEXT,
-            owner_name   TEXT,
-            doctor       TEXT,
-            date         TEXT,
-            complaint    TEXT,
-            subjective   TEXT,
-            objective    TEXT,
-            assessment   TEXT,
-            plan         TEXT,
-            procedures   TEXT,
-            medications  TEXT,
-            followup     TEXT,
-            status       TEXT DEFAULT 'open',
-            created_at   TEXT DEFAULT (datetime('now','localtime'))
-        );
+DERIVED_INDEXED = ('search_keys', 'patient_care_last')
+
+def drop_indexes(conn):
+    for name, table, cols in INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
+
+def drop_triggers(conn, triggers):
+    """Drop (name, event, body) triggers before a full load; the derived
+    tables they maintain are rebuilt in one pass afterwards."""
+    for name, event, body in triggers:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.commit()
+
+def create_triggers(conn, triggers):
+    for name, event, body in triggers:
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+    conn.commit()
+
+def build_indexes(conn, analyze=True, derived=None):
+    """Create any missing catalogue index — with `derived` True / False, only
+    those on / not on DERIVED_INDEXED tables — then refresh planner statistics
+    unless `analyze` is off (run() leaves them to the optimize stage, which
+    runs once the derived tables are built too)."""
+    t0 = time.perf_counter()
+    indexes = [(name, table, cols) for name, table, cols in INDEXES
+               if derived is None or (table in DERIVED_INDEXED) == derived]
+    for name, table, cols in indexes:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({cols})")
+    conn.commit()
+    t1 = time.perf_counter()
+    if not analyze:
+        print(f"✓ {len(indexes)} indexes built in {t1 - t0:.2f}s")
+        return
+    conn.execute("ANALYZE")
+    conn.commit()
+    print(f"✓ {len(indexes)} indexes built in {t1 - t0:.2f}s, ANALYZE in {time.perf_counter() - t1:.2f}s")
+
+# ─── DATE NORMALISATION ──────────────────────────────────────────────────────
+# `date`, `created_at` and the exports' `timestamp` columns are kept verbatim,
+# and the billing export writes dates like " Dec 20th, 2025", so comparing
+# them as strings gives wrong ranges. Each one gets a typed companion
+# column: date_iso (YYYY-MM-DD) or created_epoch (seconds, local time read as
+# UTC). Formats are detected from a sample once per column and then applied
+# to the whole column in one to_datetime() call. The bulk paths fill the
+# companions while parsing; normalise_dates() backfills anything left NULL
+# (row path, --elt, older databases) and counts the values no format fits.
+
+# (table, source column, companion column, 'date' -> ISO text / 'epoch' -> integer)
+DATE_COLUMNS = [
+    ('invoices',     'date', 'date_iso', 'date'),
+    ('vaccinations', 'date', 'date_iso', 'date'),
+] + [(table, 'created_at', 'created_epoch', 'epoch')
+     for table in ('pet_parents', 'patients', 'soap_subjective', 'soap_objective',
+                   'soap_assessment', 'soap_plan', 'records', 'prescriptions',
+                   'vaccinations', 'invoices')]
+
+# Candidate formats, tried in order (day-first before month-first)
+DATE_FORMATS = [
+    '%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M',
+    '%d-%m-%Y %H:%M:%S', '%d-%m-%Y', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y', '%d/%m/%Y %H:%M',
+    '%b %d, %Y', '%B %d, %Y', '%d %b %Y', '%d %B %Y', '%m/%d/%Y',
+]
+ORDINAL_RE = r'(?<=\d)(?:st|nd|rd|th)\b'      # "20th" -> "20"
+DATE_SAMPLE = 200
+
+def _date_text(s, ordinal):
+    txt = s.astype(str).str.strip()
+    return txt.str.replace(ORDINAL_RE, '', regex=True) if ordinal else txt
+
+def detect_format(s):
+    """Best (format, strip_ordinals) for a column of date strings, judged on a
+    sample of distinct values; None if no candidate parses any of them."""
+    sample = pd.Series(s.dropna().unique()[:DATE_SAMPLE])
+    if sample.empty:
+        return None
+    best, hits = None, 0
+    for ordinal in (False, True):
+        txt = _date_text(sample, ordinal)
+        for fmt in DATE_FORMATS:
+            n = pd.to_datetime(txt, format=fmt, errors='coerce').notna().sum()
+            if n > hits:
+                best, hits = (fmt, ordinal), n
+        if hits == len(sample):
+            break
+    return best
+
+def parse_dates(s, formats):
+    """Parse a column of date strings into datetimes (NaT when unparseable).
+    `formats` is the column's list of detected formats; it is extended in
+    place when values are left over, so later chunks of the same file reuse
+    it. A column normally settles on one format after the first chunk."""
+    out = pd.Series(pd.NaT, index=s.index, dtype='datetime64[s]')
+    todo = s.notna()
+    for spec in formats + [None] * 3:
+        if not todo.any():
+            break
+        if spec is None:
+            spec = detect_format(s[todo])
+            if spec is None or spec in formats:
+                break
+            formats.append(spec)
+        fmt, ordinal = spec
+        got = pd.to_datetime(_date_text(s[todo], ordinal), format=fmt, errors='coerce')
+        got = got[got.notna()]
+        out[got.index] = got
+        todo[got.index] = False
+    return out
+
+def date_values(dt, kind):
+    """Companion values for parsed datetimes: ISO date text or epoch seconds."""
+    raw = dt.values.astype('datetime64[D]' if kind == 'date' else 'datetime64[s]')
+    vals = pd.Series(raw.astype(str) if kind == 'date' else raw.astype('int64'),
+                     index=dt.index, dtype=object)
+    return vals.where(dt.notna(), None)
+
+def add_date_columns(frame, table, formats):
+    """Fill `table`'s companion columns in a prepared bulk frame. `formats`
+    persists per file (see parse_dates())."""
+    for t, src, dst, kind in DATE_COLUMNS:
+        if t == table and src in frame.columns:
+            frame[dst] = date_values(parse_dates(frame[src], formats.setdefault(dst, [])), kind)
+    return frame
+
+def ensure_columns(conn, columns):
+    """Add missing (table, column, type) columns and return the added ones as
+    (table, column) pairs — CREATE TABLE IF NOT EXISTS can't extend a table."""
+    added = set()
+    for table, column, sqltype in columns:
+        have = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in have:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {sqltype}")
+            added.add((table, column))
+    conn.commit()
+    return added
+
+def normalise_dates(conn, since=None):
+    """Backfill NULL companions from their source column; returns
+    {'table.column': {'formats', 'filled', 'unparsed', 'secs'}}.
+
+    date_iso columns are indexed, so every NULL is revisited cheaply each run
+    (that also picks up invoices written by the Express layer). created_epoch
+    columns only look at the rows this run inserted — rowids above
+    `since[table]` or in inserted_rows — unless the column is new."""
+    since = since or {}
+    result = {}
+    for table, src, dst, kind in DATE_COLUMNS:
+        t0 = time.perf_counter()
+        mark = 0 if kind == 'date' else since.get(table, 0)
+        df = pd.read_sql_query(
+            f"SELECT rowid AS rid, {src} FROM {table} "
+            f"WHERE {dst} IS NULL AND {src} IS NOT NULL "
+            f"AND (rowid > ? OR rowid IN {inserted(table)}) ORDER BY rowid",
+            conn, params=(mark,))
+        if df.empty:
+            continue
+        formats = []
+        vals = date_values(parse_dates(df[src], formats), kind)
+        ok = vals.notna()
+        conn.executemany(f"UPDATE {table} SET {dst}=? WHERE rowid=?",
+                         zip(vals[ok].tolist(), df['rid'][ok].tolist()))
+        conn.commit()
+        result[f"{table}.{dst}"] = {
+            'formats': [f + (' (ordinals stripped)' if o else '') for f, o in formats],
+            'filled': int(ok.sum()), 'unparsed': int((~ok).sum()),
+            'secs': round(time.perf_counter() - t0, 4),
+        }
+    return result
+
+# ─── TYPED VITALS ────────────────────────────────────────────────────────────
+# soap_objective keeps the vitals as typed in ("24.5 kg", "38.6 °C", "<2 sec",
+# "5/9"). Each gets a numeric companion column: the first number in the
+# text, converted to one unit and kept only when it is physiologically
+# plausible. Anything else counts as junk. vitals_series repeats them per
+# patient, clustered by (patient_id, taken_at), so weight curves are a
+# range read and population stats never touch the TEXT columns.
+
+# (source column, companion column, SQL type, plausible range in that unit)
+VITALS = [
+    ('temp',     'temp_c',       'REAL',    (30, 45)),
+    ('pulse',    'pulse_bpm',    'INTEGER', (20, 400)),
+    ('resprate', 'resprate_bpm', 'INTEGER', (4, 200)),
+    ('weight',   'weight_kg',    'REAL',    (0.01, 150)),
+    ('crt',      'crt_secs',     'REAL',    (0, 10)),
+    ('bcs',      'bcs_score',    'REAL',    (1, 9)),
+]
+NUMBER_RE = r'(\d+(?:\.\d+)?)'
+
+def parse_vital(s, src):
+    """Numeric value of one vitals column; returns (values, junk) where `junk`
+    marks text that gave no plausible number."""
+    dst, sqltype, (lo, hi) = next(v[1:] for v in VITALS if v[0] == src)
+    txt = s.astype(str).str.lower()
+    num = pd.to_numeric(txt.str.extract(NUMBER_RE, expand=False), errors='coerce')
+    if src == 'weight':
+        grams = txt.str.contains(r'\d\s*(?:g|gm|gms|grams?)\b', regex=True, na=False)
+        lbs = txt.str.contains(r'\d\s*(?:lbs?|pounds?)\b', regex=True, na=False)
+        num = num.mask(grams, num / 1000).mask(lbs, num * 0.45359237)
+    elif src == 'temp':
+        num = num.mask(num.between(86, 113), (num - 32) * 5 / 9)     # °F
+    ok = num.between(lo, hi)
+    if sqltype == 'INTEGER':
+        vals = num.round().astype('Int64').astype(object)
+    else:
+        vals = num.round(2).astype(object)
+    return vals.where(ok, None), s.notna() & ~ok
+
+def add_vitals_columns(frame, table):
+    """Fill the numeric companions in a prepared soap_objective frame."""
+    if table == 'soap_objective':
+        for src, dst, sqltype, rng in VITALS:
+            frame[dst] = parse_vital(frame[src], src)[0]
+    return frame
+
+def normalise_vitals(conn, since=0):
+    """Fill the companions for soap_objective rows above rowid `since` or in
+    inserted_rows (the bulk paths already have, so this only rewrites rows
+    for the row path and --elt), then return {column: {'filled', 'junk'}}
+    over those rows."""
+    dsts = [dst for src, dst, *_ in VITALS]
+    new = f"(rowid > ? OR rowid IN {inserted('soap_objective')})"
+    df = pd.read_sql_query(
+        f"SELECT rowid AS rid, {', '.join(src for src, *_ in VITALS)} FROM soap_objective "
+        f"WHERE {new} AND COALESCE({', '.join(dsts)}) IS NULL ORDER BY rowid",
+        conn, params=(since,))
+    if not df.empty:
+        out = pd.DataFrame({'rid': df['rid']})
+        for src, dst, *_ in VITALS:
+            out[dst], _ = parse_vital(df[src], src)
+        out = out[out[dsts].notna().any(axis=1)]
+        conn.executemany(
+            f"UPDATE soap_objective SET {', '.join(f'{d}=?' for d in dsts)} WHERE rowid=?",
+            zip(*(out[d].tolist() for d in dsts), out['rid'].tolist()))
+        conn.commit()
+    counts = conn.execute(
+        f"SELECT {', '.join(f'COUNT({dst}), SUM({src} IS NOT NULL AND {dst} IS NULL)' for src, dst, *_ in VITALS)} "
+        f"FROM soap_objective WHERE {new}", (since,)).fetchone()
+    return {dst: {'filled': counts[2 * i], 'junk': counts[2 * i + 1] or 0}
+            for i, dst in enumerate(dsts)}
+
+def build_vitals_series(conn, since=0):
+    """Copy soap_objective rows above rowid `since` (or inserted below it, or
+    rewritten by an upsert) that have a timestamp and at least one numeric
+    vital into vitals_series; returns rows written. A fresh (empty) series is
+    built from the whole table."""
+    if not conn.execute("SELECT EXISTS (SELECT 1 FROM vitals_series)").fetchone()[0]:
+        since = 0
+    conn.execute(f"""
+        DELETE FROM vitals_series WHERE objective_id IN
+            (SELECT objective_id FROM soap_objective WHERE rowid IN {upserted('soap_objective')})
     """)
+    before = conn.total_changes
+    conn.execute(f"INSERT OR REPLACE INTO vitals_series{vitals_select()} "
+                 f"AND (rowid > ? OR rowid IN {inserted('soap_objective')} "
+                 f"OR rowid IN {upserted('soap_objective')})", (since,))
     conn.commit()
-    print("✓ Schema created / verified")
+    return conn.total_changes - before
+
+def vitals_select():
+    """(columns) SELECT … for the vitals_series rows of soap_objective; callers
+    append `AND <which rows>`."""
+    dsts = ', '.join(dst for src, dst, *_ in VITALS)
+    return f"""(patient_id, taken_at, objective_id, {dsts})
+        SELECT patient_id, created_epoch, objective_id, {dsts}
+        FROM main.soap_objective
+        WHERE patient_id IS NOT NULL AND created_epoch IS NOT NULL
+          AND COALESCE({dsts}) IS NOT NULL"""
+
+# ─── REVENUE AGGREGATES ───────────────────────────────────────────────────────
+# revenue_daily / revenue_monthly hold invoice totals per period, status and
+# method, so dashboard and revenue-report queries read a few hundred rows
+# instead of every invoice. Triggers on invoices keep them current for every
+# writer (this importer and the Express layer alike). Full loads drop the
+# triggers and rebuild both tables with one GROUP BY at the end, the same way
+# indexes are handled.
+
+REVENUE_MEASURES = ('subtotal', 'discount', 'total', 'paid_amount', 'balance')
+
+def sql_invoice_day(col):
+    """SQL expression for an invoice date as YYYY-MM-DD, for rows whose
+    date_iso isn't filled in (yet). Handles ISO dates (Express layer) and the
+    billing export's ' Dec 20th, 2025'; '' otherwise."""
+    t = f"trim({col})"
+    mon = f"instr('JanFebMarAprMayJunJulAugSepOctNovDec', substr({t}, 1, 3))"
+    return f"""COALESCE(date({t}),
+        CASE WHEN {mon} % 3 = 1 AND instr({t}, ',') > 0 THEN
+            printf('%04d-%02d-%02d', CAST(trim(substr({t}, instr({t}, ',') + 1)) AS INTEGER),
+                   ({mon} + 2) / 3, CAST(substr({t}, 5) AS INTEGER)) END, '')"""
+
+def _revenue_upserts(row, sign):
+    """Trigger body statements adding (sign '+') or removing ('-') one
+    invoice row (NEW / OLD) from both aggregate tables."""
+    day = f"COALESCE({row}.date_iso, {sql_invoice_day(f'{row}.date')})"
+    vals = ', '.join(f"{sign}COALESCE({row}.{m}, 0)" for m in REVENUE_MEASURES)
+    sets = ', '.join(f"{m} = {m} + excluded.{m}" for m in REVENUE_MEASURES)
+    stmts = []
+    for table, period, key in (('revenue_daily', 'day', day),
+                               ('revenue_monthly', 'month', f"substr({day}, 1, 7)")):
+        where = (f"{period} = {key} AND status = COALESCE({row}.status, '') "
+                 f"AND method = COALESCE({row}.method, '')")
+        stmts.append(f"""
+            INSERT INTO {table}({period}, status, method, invoices, {', '.join(REVENUE_MEASURES)})
+            VALUES ({key}, COALESCE({row}.status, ''), COALESCE({row}.method, ''), {sign}1, {vals})
+            ON CONFLICT({period}, status, method) DO UPDATE SET
+                invoices = invoices + excluded.invoices, {sets};""")
+        if sign == '-':
+            stmts.append(f"DELETE FROM {table} WHERE {where} AND invoices = 0;")
+    return ''.join(stmts)
+
+# (trigger name, event, body)
+REVENUE_TRIGGERS = [
+    ('trg_revenue_insert', 'AFTER INSERT ON invoices', _revenue_upserts('NEW', '+')),
+    ('trg_revenue_delete', 'AFTER DELETE ON invoices', _revenue_upserts('OLD', '-')),
+    ('trg_revenue_update',
+     f"AFTER UPDATE OF date, date_iso, status, method, {', '.join(REVENUE_MEASURES)} ON invoices",
+     _revenue_upserts('OLD', '-') + _revenue_upserts('NEW', '+')),
+]
+
+def build_revenue(conn, full=False):
+    """Create any missing trigger; with `full` (or when the aggregates are
+    empty but invoices aren't, e.g. first run on an existing db) rebuild both
+    tables from invoices, archived ones included, in one pass."""
+    t0 = time.perf_counter()
+    empty = conn.execute("SELECT NOT EXISTS (SELECT 1 FROM revenue_daily)").fetchone()[0]
+    if full or (empty and conn.execute("SELECT EXISTS (SELECT 1 FROM invoices)").fetchone()[0]):
+        sums = ', '.join(f"SUM({m})" for m in REVENUE_MEASURES)
+        conn.executescript(f"""
+            DELETE FROM revenue_daily;
+            DELETE FROM revenue_monthly;
+            INSERT INTO revenue_daily(day, status, method, invoices, {', '.join(REVENUE_MEASURES)})
+                SELECT day, status, method, COUNT(*), {sums}
+                FROM (SELECT COALESCE(date_iso, {sql_invoice_day('date')}) AS day, COALESCE(status, '') AS status,
+                             COALESCE(method, '') AS method,
+                             {', '.join(f'COALESCE({m}, 0) AS {m}' for m in REVENUE_MEASURES)}
+                      FROM {history(conn, 'invoices')})
+                GROUP BY day, status, method;
+            INSERT INTO revenue_monthly(month, status, method, invoices, {', '.join(REVENUE_MEASURES)})
+                SELECT substr(day, 1, 7), status, method, SUM(invoices), {sums}
+                FROM revenue_daily GROUP BY 1, 2, 3;
+        """)
+        rows = conn.execute("SELECT COUNT(*) FROM revenue_daily").fetchone()[0]
+        print(f"✓ Revenue aggregates rebuilt ({rows:,} daily rows) in {time.perf_counter() - t0:.2f}s")
+    create_triggers(conn, REVENUE_TRIGGERS)
+
+# ─── REVENUE RECONCILIATION ──────────────────────────────────────────────────
+# The accounting system exports Revenue_Report_<from>__<to>.csv files (DATE,
+# REF, CLIENT, PATIENT, TOTAL, BALANCE, STATUS). All reports of a run are
+# read and their " Dec 20th, 2025" dates parsed in one vectorised pass, kept
+# in revenue_report (the latest report wins per ref), and hash-joined on ref
+# (pandas merge) against the invoices they name or whose date falls in a
+# report's period. Every difference lands in revenue_reconciliation.
+
+REPORT_GLOB = 'Revenue_Report_*.csv'
+REPORT_PERIOD_RE = re.compile(r'(\d{4}-\d{2}-\d{2})__(\d{4}-\d{2}-\d{2})')
+REPORT_COLUMNS = ['DATE', 'REF', 'CLIENT', 'PATIENT', 'TOTAL', 'BALANCE', 'STATUS']
+
+def find_reports(paths):
+    """Report files under / matching each path (a file, a directory or a glob)."""
+    found = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            found += path.glob(REPORT_GLOB)
+        elif path.exists():
+            found.append(path)
+        else:
+            found += Path(path.parent).glob(path.name)
+    return sorted(set(found), key=lambda p: p.name)
+
+def load_reports(files):
+    """All report rows in one frame (file order, so later reports come last),
+    with date_iso parsed and amounts as floats."""
+    frames = []
+    for f in files:
+        df = pd.read_csv(f, dtype=str, encoding='utf-8-sig', skipinitialspace=True)
+        df.columns = df.columns.str.strip().str.upper()
+        if not set(REPORT_COLUMNS) <= set(df.columns):
+            print(f"   ⚠ {f.name}: expected columns {', '.join(REPORT_COLUMNS)} — skipped")
+            continue
+        frames.append(df[REPORT_COLUMNS].assign(report=f.name))
+    if not frames:
+        return None
+    df = pd.concat(frames, ignore_index=True)
+    out = pd.DataFrame({'ref': clean_col(df, 'REF')})
+    out['date_iso'] = date_values(parse_dates(clean_col(df, 'DATE'), []), 'date')
+    out['client'] = clean_col(df, 'CLIENT')
+    out['patient'] = clean_col(df, 'PATIENT')
+    for c in ('TOTAL', 'BALANCE'):
+        out[c.lower()] = pd.to_numeric(df[c].str.replace(',', '', regex=False), errors='coerce')
+    out['status'] = clean_col(df, 'STATUS')
+    out['report'] = df['report']
+    return out[out['ref'].notna()]
+
+def report_periods(files, rows):
+    """(from, to) ISO dates per report: from the file name, else its DATE range."""
+    periods = []
+    for f in files:
+        m = REPORT_PERIOD_RE.search(f.name)
+        if m:
+            periods.append(m.groups())
+        else:
+            dates = rows.loc[rows['report'] == f.name, 'date_iso'].dropna()
+            if len(dates):
+                periods.append((dates.min(), dates.max()))
+    return periods
+
+def reconcile_revenue(conn, files):
+    """Load `files` into revenue_report and rewrite revenue_reconciliation;
+    returns the counts per issue."""
+    t0 = time.perf_counter()
+    rows = load_reports(files)
+    if rows is None:
+        return None
+    rows = rows.drop_duplicates('ref', keep='last')
+    insert_frame(conn, 'revenue_report', rows, verb='INSERT OR REPLACE')
+
+    periods = report_periods(files, rows)
+    conn.execute("DROP TABLE IF EXISTS temp.report_refs")
+    conn.execute("CREATE TEMP TABLE report_refs (ref TEXT PRIMARY KEY)")
+    conn.executemany("INSERT OR IGNORE INTO report_refs VALUES(?)", zip(rows['ref'].tolist()))
+    lo = min((p[0] for p in periods), default='')
+    hi = max((p[1] for p in periods), default='')
+    inv = pd.read_sql_query(
+        "SELECT ref, date_iso, total, balance, status FROM invoices "
+        "WHERE ref IN (SELECT ref FROM report_refs) OR date_iso BETWEEN ? AND ?",
+        conn, params=(lo, hi))
+    conn.execute("DROP TABLE temp.report_refs")
+    in_period = pd.Series(False, index=inv.index)
+    for start, end in periods:
+        in_period |= inv['date_iso'].between(start, end)
+    inv = inv[inv['ref'].isin(rows['ref']) | in_period]
+
+    both = rows.merge(inv, on='ref', how='outer', suffixes=('', '_inv'), indicator=True)
+    issues = []
+    def add(mask, issue, rep_col, inv_col):
+        hit = both[mask]
+        issues.append(pd.DataFrame({
+            'ref': hit['ref'], 'issue': issue,
+            'report_value': hit[rep_col].astype(object).where(hit[rep_col].notna(), None)
+                            if rep_col else None,
+            'invoice_value': hit[inv_col].astype(object).where(hit[inv_col].notna(), None)
+                             if inv_col else None,
+            'report': hit['report']}))
+    matched = both['_merge'] == 'both'
+    add(both['_merge'] == 'left_only', 'missing_invoice', 'total', None)
+    add(both['_merge'] == 'right_only', 'missing_from_report', None, 'total_inv')
+    for col in ('total', 'balance'):
+        off = (both[col].fillna(0) - both[f'{col}_inv'].fillna(0)).abs() > 0.005
+        add(matched & off, col, col, f'{col}_inv')
+    status = both['status'].fillna('').str.lower() != both['status_inv'].fillna('').str.lower()
+    add(matched & status, 'status', 'status', 'status_inv')
+    found = pd.concat(issues, ignore_index=True)
+
+    conn.execute("DELETE FROM revenue_reconciliation")
+    insert_frame(conn, 'revenue_reconciliation', found, verb='INSERT OR REPLACE')
+    conn.commit()
+    counts = found['issue'].value_counts()
+    return {'files': len(files), 'rows': len(rows), 'matched': int(matched.sum()),
+            **{issue: int(counts.get(issue, 0)) for issue in
+               ('missing_invoice', 'missing_from_report', 'total', 'balance', 'status')},
+            'secs': round(time.perf_counter() - t0, 4)}
+
+# ─── FULL-TEXT SEARCH ────────────────────────────────────────────────────────
+# FTS5 indexes over the free text the clinic searches. They are external-
+# content tables: the text stays in the source table and each FTS rowid is
+# the source row's key, so a hit costs one primary-key lookup and nothing is
+# stored twice. patient_id / created_at come back as UNINDEXED columns
+# (created_at is the raw export text, so filter dates on the source row's
+# created_epoch); join records on the matching *_id column for record_id, e.g.
+#
+#   SELECT DISTINCT f.patient_id FROM prescriptions_fts f
+#   JOIN prescriptions p ON p.presmeds_id = f.rowid
+#   WHERE prescriptions_fts MATCH 'amoxicillin'
+#     AND p.created_epoch >= unixepoch('2025-01-01');
+#
+# Triggers keep them in step with every insert / update / delete, as with the
+# revenue aggregates; full loads drop the triggers and 'rebuild' instead.
+
+# (fts table, source table, key column, indexed text columns)
+FTS_INDEXES = [
+    ('soap_subjective_fts', 'soap_subjective', 'subject_id',  ('chief_complaint', 'addnotes')),
+    ('soap_assessment_fts', 'soap_assessment', 'assess_id',   ('diagnosis',)),
+    ('soap_plan_fts',       'soap_plan',       'plan_id',     ('plan',)),
+    ('prescriptions_fts',   'prescriptions',   'presmeds_id', ('med_name', 'instruction')),
+]
+FTS_TOKENIZE = 'porter unicode61 remove_diacritics 2'
+FTS_EXTRA = ('patient_id', 'created_at')          # UNINDEXED, read from the source row
+
+def _fts_triggers():
+    triggers = []
+    for fts, src, key, cols in FTS_INDEXES:
+        names = ', '.join(cols + FTS_EXTRA)
+        new = ', '.join(f"NEW.{c}" for c in (key,) + cols + FTS_EXTRA)
+        old = ', '.join(f"OLD.{c}" for c in (key,) + cols + FTS_EXTRA)
+        add = f"INSERT INTO {fts}(rowid, {names}) VALUES ({new});"
+        remove = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', {old});"
+        triggers += [
+            (f"trg_{fts}_insert", f"AFTER INSERT ON {src}", add),
+            (f"trg_{fts}_delete", f"AFTER DELETE ON {src}", remove),
+            (f"trg_{fts}_update", f"AFTER UPDATE OF {', '.join(cols)} ON {src}", remove + ' ' + add),
+        ]
+    return triggers
+
+FTS_TRIGGERS = _fts_triggers()
+
+def build_fts(conn, full=False):
+    """Create missing FTS tables and triggers; rebuild an index from its source
+    table after a full load or when it is new. Returns the rebuilt tables."""
+    rebuilt = []
+    for fts, src, key, cols in FTS_INDEXES:
+        new = not conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (fts,)).fetchone()
+        extra = ', '.join(f"{c} UNINDEXED" for c in FTS_EXTRA)
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {', '.join(cols)}, {extra},
+                content='{src}', content_rowid='{key}', tokenize='{FTS_TOKENIZE}')""")
+        if full or new:
+            conn.execute(f"INSERT INTO {fts}({fts}) VALUES('rebuild')")
+            rebuilt.append(fts)
+    create_triggers(conn, FTS_TRIGGERS)
+    return rebuilt
+
+# ─── SEARCH KEYS ─────────────────────────────────────────────────────────────
+# Front-desk search matches lower(name) / owner / breed / mobile_no with
+# LIKE '%q%', a full scan every keystroke. search_keys holds every patient
+# and pet parent under normalised words (lower case, accents and punctuation
+# dropped), digits-only phone numbers and trigrams of names and phones,
+# clustered by (kind, key), so a type-ahead prefix is one index range per
+# kind and never wades through trigrams:
+#
+#   SELECT DISTINCT patient_id FROM search_keys
+#   WHERE kind IN ('name', 'owner', 'breed') AND key GLOB 'bru*' AND src = 'patients';
+#
+# Infix search: look up the query's trigrams (kind 'tri'), intersect the
+# src_rowid sets, then confirm against the source row. Keys are added for
+# source rows above the highest src_rowid already indexed, so each run
+# (and rows the Express layer added in between) only costs the delta. An
+# AFTER DELETE trigger drops a row's keys with it, so a deleted (or, on a
+# branch re-merge, replaced) row never leaves keys behind that a reused
+# rowid could resolve to. An AFTER UPDATE trigger on the searched columns
+# (the app edits patients in place) drops the row's keys too and queues it
+# in search_keys_todo, and the next run re-keys it, just as it keys rows
+# the app inserted. Full loads drop the triggers and rebuild.
+
+# (source table, key kind, column, also index trigrams)
+SEARCH_FIELDS = {
+    'patients':    [('name', 'name', True), ('owner', 'owner_name', False),
+                    ('breed', 'breed', False), ('phone', 'phone', True)],
+    'pet_parents': [('name', 'name', True), ('phone', 'mobile_no', True)],
+}
+
+SEARCH_KEY_BATCH = 5_000   # source rows keyed per read / executemany / commit
+SEARCH_KEY_COLUMNS = ['kind', 'key', 'src', 'src_rowid', 'patient_id', 'pet_parent_id']
+
+def normalise_text(s):
+    """lower case, accents stripped, runs of non-word characters -> one space."""
+    txt = re.sub(r'[\u0300-\u036f]', '', unicodedata.normalize('NFKD', str(s)))
+    return re.sub(r'[\W_]+', ' ', txt.lower()).strip()
+
+def phone_digits(s):
+    """Digits only; '9000000001.0' (a number read as float) keeps its 10 digits."""
+    return re.sub(r'\D', '', re.sub(r'\.0$', '', str(s)))
+
+def trigrams(s):
+    """Every 3-character slice of `s`, spaces removed."""
+    compact = s.replace(' ', '')
+    return (compact[i:i + 3] for i in range(len(compact) - 2))
+
+def search_keys_of(src, row):
+    """Distinct (kind, key) pairs for one `src` row's SEARCH_FIELDS values."""
+    keys = set()
+    for (kind, col, tri), value in zip(SEARCH_FIELDS[src], row):
+        if value is None:
+            continue
+        if kind == 'phone':
+            val = phone_digits(value)
+            words = [val, val[-10:]]                 # +91… -> local number
+        else:
+            val = normalise_text(value)
+            words = val.split()
+        keys.update((kind, w) for w in words if w)
+        if tri:
+            keys.update(('tri', t) for t in trigrams(val))
+    return keys
+
+def search_key_rows(src, rows):
+    """search_keys rows (SEARCH_KEY_COLUMNS order) for source rows of
+    (rowid, patient_id, pet_parent_id, *SEARCH_FIELDS values)."""
+    return chain.from_iterable(
+        ((kind, key, src, rid, pid, ppid) for kind, key in search_keys_of(src, vals))
+        for rid, pid, ppid, *vals in rows)
+
+def _search_key_triggers():
+    triggers = []
+    for src, fields in SEARCH_FIELDS.items():
+        cols = ', '.join(dict.fromkeys(col for kind, col, tri in fields))
+        drop = f"DELETE FROM search_keys WHERE src = '{src}' AND src_rowid = OLD.rowid;"
+        queue = f"INSERT OR IGNORE INTO search_keys_todo VALUES ('{src}', NEW.rowid);"
+        triggers += [
+            (f"trg_search_keys_{src}_delete", f"AFTER DELETE ON {src}", drop),
+            (f"trg_search_keys_{src}_update", f"AFTER UPDATE OF {cols} ON {src}", drop + ' ' + queue),
+        ]
+    return triggers
+
+SEARCH_KEY_TRIGGERS = _search_key_triggers()
+
+def build_search_keys(conn, full=False):
+    """Add keys for patients / pet_parents rows not indexed yet — above the
+    highest keyed rowid, or inserted below it (inserted_rows) — and re-key
+    rows an upsert rewrote or the app edited (search_keys_todo); with `full`,
+    rebuild them all. A source whose triggers are missing (older databases)
+    is rebuilt too, as edits and deletes may have left stale keys. Source
+    rows are read and keyed SEARCH_KEY_BATCH at a time, so memory stays flat
+    however large the tables grow. Returns rows added."""
+    added = 0
+    for src, fields in SEARCH_FIELDS.items():
+        names = [name for name, event, body in SEARCH_KEY_TRIGGERS if event.endswith(f" ON {src}")]
+        live = conn.execute(f"SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' "
+                            f"AND name IN ({','.join('?' * len(names))})", names).fetchone()[0]
+        if full or live < len(names):
+            conn.execute("DELETE FROM search_keys WHERE src=?", (src,))
+        mark = conn.execute("SELECT COALESCE(MAX(src_rowid), 0) FROM search_keys WHERE src=?",
+                            (src,)).fetchone()[0]
+        # rows an upsert rewrote, the app edited, or this run inserted below the mark
+        rekey = (f"(SELECT rid FROM upserted_rows WHERE tbl = '{src}' "
+                 f"UNION SELECT rid FROM inserted_rows WHERE tbl = '{src}' "
+                 f"UNION SELECT src_rowid FROM search_keys_todo WHERE src = '{src}')")
+        conn.execute(f"DELETE FROM search_keys WHERE src=? AND src_rowid IN {rekey}", (src,))
+        pid = 'patient_id' if src == 'patients' else 'NULL'
+        select = (f"SELECT rowid, {pid}, pet_parent_id, {', '.join(col for kind, col, tri in fields)} "
+                  f"FROM {src} WHERE rowid > ?")
+        # re-keyed rows first, then everything above the mark, SEARCH_KEY_BATCH rows at a time
+        for where, last in ((f"rowid <= {mark} AND rowid IN {rekey}", 0), ('true', mark)):
+            while rows := conn.execute(f"{select} AND {where} ORDER BY rowid LIMIT ?",
+                                       (last, SEARCH_KEY_BATCH)).fetchall():
+                # sorted, the batch lands in key order in the clustered table
+                added += insert_rows(conn, 'search_keys', SEARCH_KEY_COLUMNS,
+                                     sorted(search_key_rows(src, rows)))
+                conn.commit()
+                last = rows[-1][0]
+        conn.execute("DELETE FROM search_keys_todo WHERE src=?", (src,))
+        conn.commit()
+    create_triggers(conn, SEARCH_KEY_TRIGGERS)
+    return added
+
+# ─── VISIT TIMELINE ──────────────────────────────────────────────────────────
+# The patient profile joins records to the four soap_* tables, prescriptions
+# and invoices on every request. visit_timeline stores that join flattened,
+# one row per records row, clustered by (patient_id, created_epoch) — the
+# typed timestamp, as exports may write created_at day-first:
+#
+#   SELECT * FROM visit_timeline WHERE patient_id = ? ORDER BY created_epoch DESC LIMIT 10;
+#
+# Full loads rebuild it in one INSERT … SELECT. Otherwise only the records
+# touched by this run are rewritten: new records, plus records whose SOAP
+# part, prescription group (records.prescription_id) or invoice (by plan_id)
+# arrived after them.
+
+TIMELINE_SELECT = """
+    SELECT r.patient_id, COALESCE(r.created_epoch, 0), COALESCE(r.created_at, ''), r.record_id,
+           s.chief_complaint, a.diagnosis, p.plan, o.weight, o.temp, o.weight_kg, o.temp_c,
+           (SELECT group_concat(med_name, ', ') FROM
+                (SELECT med_name FROM {prescriptions}
+                 WHERE prescription_id = r.prescription_id ORDER BY presmeds_id)),
+           (SELECT COUNT(*) FROM {prescriptions} WHERE prescription_id = r.prescription_id),
+           (SELECT ref FROM {invoices} WHERE plan_id = r.plan_id ORDER BY rowid LIMIT 1),
+           (SELECT SUM(total) FROM {invoices} WHERE plan_id = r.plan_id)
+    FROM records r
+    LEFT JOIN {soap_subjective} s ON s.subject_id = r.subject_id
+    LEFT JOIN {soap_objective} o ON o.objective_id = r.objective_id
+    LEFT JOIN {soap_assessment} a ON a.assess_id = r.assess_id
+    LEFT JOIN {soap_plan} p ON p.plan_id = r.plan_id
+    WHERE r.patient_id IS NOT NULL"""
+
+TIMELINE_COLUMNS = ('patient_id, created_epoch, created_at, record_id, chief_complaint, diagnosis, '
+                    'plan, weight, temp, weight_kg, temp_c, prescription, prescription_items, '
+                    'invoice_ref, invoice_total')
+
+def timeline_select(conn):
+    """TIMELINE_SELECT for hot records, joining archived visit parts too."""
+    return TIMELINE_SELECT.format_map({t: history(conn, t) for t in HISTORY_TABLES})
+
+# (table whose new rows can change a visit, records column, that table's column)
+TIMELINE_LINKS = [
+    ('records',         'record_id',       'record_id'),
+    ('soap_subjective', 'subject_id',      'subject_id'),
+    ('soap_objective',  'objective_id',    'objective_id'),
+    ('soap_assessment', 'assess_id',       'assess_id'),
+    ('soap_plan',       'plan_id',         'plan_id'),
+    ('prescriptions',   'prescription_id', 'prescription_id'),
+    ('invoices',        'plan_id',         'plan_id'),
+]
+
+def upgrade_timeline(conn, schema='main'):
+    """Re-key a visit_timeline from before created_epoch ordered it (older
+    databases / archives). The main one is dropped, for the schema stage to
+    re-create and build_timeline() to rebuild; an archive's is copied into
+    main's layout, taking each epoch from its archived records row."""
+    cols = _columns(conn, schema, 'visit_timeline')
+    if not cols or 'created_epoch' in cols:
+        return
+    if schema == 'main':
+        conn.execute("DROP TABLE main.visit_timeline")
+        return
+    sql = conn.execute("SELECT sql FROM main.sqlite_master WHERE type='table' "
+                       "AND name='visit_timeline'").fetchone()[0]
+    new = _columns(conn, 'main', 'visit_timeline')
+    conn.execute(f"ALTER TABLE {schema}.visit_timeline RENAME TO visit_timeline_old")
+    conn.execute(re.sub(r'^CREATE TABLE (IF NOT EXISTS )?', f'CREATE TABLE {schema}.', sql))
+    conn.execute(f"""
+        INSERT INTO {schema}.visit_timeline({', '.join(new)})
+        SELECT {', '.join('COALESCE(r.created_epoch, 0)' if c == 'created_epoch' else f't.{c}'
+                          for c in new)}
+        FROM {schema}.visit_timeline_old t
+        LEFT JOIN {schema}.records r ON r.record_id = t.record_id""")
+    conn.execute(f"DROP TABLE {schema}.visit_timeline_old")
+    conn.commit()
+
+def build_timeline(conn, marks, full=False):
+    """Rebuild visit_timeline (full load, or a new table on a populated db) or
+    rewrite the rows for records affected by this run's rows: those above
+    `marks[table]`, inserted below it or rewritten by an upsert.
+    Returns rows written."""
+    cols = TIMELINE_COLUMNS
+    before = conn.total_changes
+    if full or not conn.execute("SELECT EXISTS (SELECT 1 FROM visit_timeline)").fetchone()[0]:
+        conn.execute("DELETE FROM visit_timeline")
+        conn.execute(f"INSERT INTO visit_timeline({cols}) {timeline_select(conn)} "
+                     f"ORDER BY r.patient_id, r.created_epoch, r.record_id")
+    else:
+        conn.execute("DROP TABLE IF EXISTS temp.timeline_todo")
+        conn.execute("CREATE TEMP TABLE timeline_todo (record_id INTEGER PRIMARY KEY)")
+        for table, rec_col, col in TIMELINE_LINKS:
+            conn.execute(f"""
+                INSERT OR IGNORE INTO timeline_todo
+                SELECT record_id FROM records WHERE {rec_col} IN
+                    (SELECT {col} FROM {table}
+                     WHERE (rowid > ? OR rowid IN {inserted(table)} OR rowid IN {upserted(table)})
+                       AND {col} IS NOT NULL)
+            """, (marks.get(table, 0),))
+        before = conn.total_changes
+        conn.execute(f"INSERT OR REPLACE INTO visit_timeline({cols}) {timeline_select(conn)} "
+                     f"AND r.record_id IN (SELECT record_id FROM timeline_todo)")
+        conn.execute("DROP TABLE temp.timeline_todo")
+    conn.commit()
+    return conn.total_changes - before
+
+# ─── PATIENT SUMMARY ─────────────────────────────────────────────────────────
+# Per-patient rollups that lists and reminder screens otherwise aggregate
+# across records, invoices and vaccinations on every request. They are
+# computed inside SQLite with one GROUP BY patient_id per source table —
+# whole tables on a full load, only the patients touched by this run's rows
+# otherwise — and written over the affected patients' rows. Dates are
+# compared typed: the latest visit is the highest created_epoch, written
+# back as ISO text like last_invoice / last_vaccination.
+
+# tables whose new rows change a patient's rollups
+SUMMARY_SOURCES = ('patients', 'records', 'invoices', 'vaccinations')
+
+# {where} narrows every source to the patients being rewritten
+SUMMARY_SELECT = """
+    SELECT p.patient_id, COALESCE(v.visits, 0), v.last_visit, COALESCE(i.invoices, 0),
+           i.last_invoice, COALESCE(i.spend, 0.0), COALESCE(i.owed, 0.0), x.last_vaccination
+    FROM (SELECT patient_id FROM patients WHERE patient_id IS NOT NULL {where}
+          UNION SELECT patient_id FROM {records} WHERE patient_id IS NOT NULL {where}
+          UNION SELECT patient_id FROM {invoices}
+                WHERE patient_id IS NOT NULL AND status IS NOT 'Deleted' {where}
+          UNION SELECT patient_id FROM {vaccinations} WHERE patient_id IS NOT NULL {where}) p
+    LEFT JOIN (SELECT patient_id, COUNT(*) AS visits,
+                      datetime(MAX(created_epoch), 'unixepoch') AS last_visit
+               FROM {records} WHERE patient_id IS NOT NULL {where}
+               GROUP BY patient_id) v USING (patient_id)
+    LEFT JOIN (SELECT patient_id, COUNT(*) AS invoices, MAX(date_iso) AS last_invoice,
+                      SUM(CASE WHEN status = 'Paid' THEN paid_amount ELSE 0.0 END) AS spend,
+                      SUM(CASE WHEN status = 'Outstanding' THEN balance ELSE 0.0 END) AS owed
+               FROM {invoices} WHERE patient_id IS NOT NULL AND status IS NOT 'Deleted' {where}
+               GROUP BY patient_id) i USING (patient_id)
+    LEFT JOIN (SELECT patient_id, MAX(date_iso) AS last_vaccination
+               FROM {vaccinations} WHERE patient_id IS NOT NULL {where}
+               GROUP BY patient_id) x USING (patient_id)
+    ORDER BY p.patient_id"""
+
+# latest vaccination per patient and type_care; ties go to the later row
+CARE_SELECT = """
+    SELECT patient_id, type_care, date_iso, treatment FROM (
+        SELECT patient_id, COALESCE(type_care, '') AS type_care, date_iso, treatment,
+               row_number() OVER (PARTITION BY patient_id, COALESCE(type_care, '')
+                                  ORDER BY date_iso DESC, rowid DESC) AS n
+        FROM {vaccinations} WHERE patient_id IS NOT NULL {where})
+    WHERE n = 1 ORDER BY patient_id, type_care"""
+
+def build_patient_summary(conn, marks, full=False):
+    """Recompute rollups for every patient (full load / new table / rollups
+    from before last_visit was typed) or only for patients with rows above
+    `marks`, inserted below them or rewritten by an upsert; returns patients
+    written."""
+    if full or not conn.execute("SELECT EXISTS (SELECT 1 FROM patient_summary)").fetchone()[0] \
+            or conn.execute("SELECT EXISTS (SELECT 1 FROM patient_summary WHERE last_visit "
+                            "NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] *')").fetchone()[0]:
+        where = ''
+        conn.execute("DELETE FROM patient_summary")
+        conn.execute("DELETE FROM patient_care_last")
+    else:
+        conn.execute("DROP TABLE IF EXISTS temp.summary_todo")
+        conn.execute("CREATE TEMP TABLE summary_todo (patient_id INTEGER PRIMARY KEY)")
+        for table in SUMMARY_SOURCES:
+            conn.execute(f"INSERT OR IGNORE INTO summary_todo SELECT patient_id FROM {table} "
+                         f"WHERE (rowid > ? OR rowid IN {inserted(table)} OR rowid IN {upserted(table)}) "
+                         f"AND patient_id IS NOT NULL",
+                         (marks.get(table, 0),))
+        if not conn.execute("SELECT EXISTS (SELECT 1 FROM summary_todo)").fetchone()[0]:
+            return 0
+        where = "AND patient_id IN (SELECT patient_id FROM temp.summary_todo)"
+        conn.execute(f"DELETE FROM patient_summary WHERE 1 {where}")
+        conn.execute(f"DELETE FROM patient_care_last WHERE 1 {where}")
+    sources = {t: history(conn, t) for t in ('records', 'invoices', 'vaccinations')}
+    written = conn.execute(f"""
+        INSERT INTO patient_summary(patient_id, visit_count, last_visit, invoice_count, last_invoice,
+                                    lifetime_spend, outstanding_balance, last_vaccination)
+        {SUMMARY_SELECT.format(where=where, **sources)}""").rowcount
+    conn.execute(f"INSERT INTO patient_care_last(patient_id, type_care, last_date, treatment) "
+                 f"{CARE_SELECT.format(where=where, **sources)}")
+    conn.execute("DROP TABLE IF EXISTS temp.summary_todo")
+    conn.commit()
+    return written
+
+# ─── ARCHIVE ─────────────────────────────────────────────────────────────────
+# Visits, prescriptions, vaccinations and settled invoices older than a
+# cutoff move, in rowid-ordered batches, into clinic.archive.db: same tables,
+# same columns, ATTACHed as `archive`. Their visit_timeline, vitals_series and
+# invoice_items rows move with them. The cutoff is kept in the archive and
+# re-applied on every later run, and a re-import never leaves a row in both
+# files: a key this run brought back that is already archived keeps its
+# archived copy (the hot one and its followers go again, as INSERT OR IGNORE
+# keeps an existing row), unless an --upsert changed it, in which case it
+# replaces that copy (and the copy's followers) before it moves again.
+# Rollups stay hot and complete:
+# the revenue triggers are off while rows move, and patient_summary /
+# revenue rebuilds read the hot rows plus the archive through TEMP views
+#
+#   SELECT * FROM history_invoices WHERE patient_id = ? ORDER BY date_iso;
+#
+# which attach_archive() defines for any connection that wants history.
+# Moves copy before they delete, so an interrupted batch is simply redone.
+
+# (table, key, rows that are "old"); :epoch / :day are the cutoff
+ARCHIVE_TABLES = [
+    ('records',         'record_id',    "created_epoch < :epoch"),
+    ('soap_subjective', 'subject_id',   "created_epoch < :epoch"),
+    ('soap_objective',  'objective_id', "created_epoch < :epoch"),
+    ('soap_assessment', 'assess_id',    "created_epoch < :epoch"),
+    ('soap_plan',       'plan_id',      "created_epoch < :epoch"),
+    ('prescriptions',   'presmeds_id',  "created_epoch < :epoch"),
+    ('vaccinations',    'pchistory_id', "created_epoch < :epoch"),
+    ('invoices',        'ref',          "date_iso < :day AND COALESCE(status, '') != 'Outstanding'"),
+]
+# tables that move with their parent's batch: (table, parent, match on the batch)
+ARCHIVE_FOLLOWERS = [
+    ('visit_timeline', 'records',
+     "record_id IN (SELECT record_id FROM main.records WHERE rowid IN {batch})"),
+    ('vitals_series', 'soap_objective',
+     "(patient_id, taken_at, objective_id) IN (SELECT patient_id, created_epoch, objective_id "
+     "FROM main.soap_objective WHERE rowid IN {batch})"),
+    ('invoice_items', 'invoices',
+     "invoice_ref IN (SELECT ref FROM main.invoices WHERE rowid IN {batch})"),
+]
+HISTORY_TABLES = [t for t, *_ in ARCHIVE_TABLES] + [t for t, *_ in ARCHIVE_FOLLOWERS]
+
+def archive_path(db_path):
+    return db_path.with_name(f"{db_path.stem}.archive{db_path.suffix}")
+
+def _columns(conn, schema, table):
+    return [r[1] for r in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+def attach_archive(conn, path):
+    """ATTACH `path` as `archive`, creating / widening its tables to match the
+    hot ones, and define TEMP views history_<table> over both."""
+    conn.execute("ATTACH DATABASE ? AS archive", (str(path),))
+    conn.execute("CREATE TABLE IF NOT EXISTS archive.archive_state (key TEXT PRIMARY KEY, value TEXT)")
+    upgrade_timeline(conn, 'archive')
+    for table in HISTORY_TABLES:
+        sql = conn.execute("SELECT sql FROM main.sqlite_master WHERE type='table' AND name=?",
+                           (table,)).fetchone()[0]
+        conn.execute(re.sub(r'^CREATE TABLE (IF NOT EXISTS )?', 'CREATE TABLE IF NOT EXISTS archive.', sql))
+        have = set(_columns(conn, 'archive', table))
+        for cid, col, sqltype, *_ in conn.execute(f"PRAGMA main.table_info({table})"):
+            if col not in have:
+                conn.execute(f"ALTER TABLE archive.{table} ADD COLUMN {col} {sqltype}")
+        cols = ', '.join(_columns(conn, 'main', table))
+        hot_id, old_id = ('rowid AS rowid, ', f"rowid - {1 << 62}, ")
+        if 'WITHOUT ROWID' in sql.upper():             # visit_timeline, vitals_series
+            hot_id = old_id = ''
+        conn.execute(f"DROP VIEW IF EXISTS temp.history_{table}")
+        conn.execute(f"CREATE TEMP VIEW history_{table} AS "
+                     f"SELECT {hot_id}{cols} FROM main.{table} UNION ALL "
+                     f"SELECT {old_id}{cols} FROM archive.{table}")
+    for name, table, cols in INDEXES:
+        if table in HISTORY_TABLES:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS archive.{name} ON {table}({cols})")
+    conn.commit()
+
+def history(conn, table):
+    """`table`, or its hot + archive view when an archive is attached."""
+    attached = any(r[1] == 'archive' for r in conn.execute("PRAGMA database_list"))
+    return f"history_{table}" if attached and table in HISTORY_TABLES else table
+
+def _move(conn, table, where, params=()):
+    """Copy matching hot rows into the archive, then delete them from main."""
+    cols = ', '.join(_columns(conn, 'main', table))
+    conn.execute(f"INSERT OR REPLACE INTO archive.{table}({cols}) "
+                 f"SELECT {cols} FROM main.{table} WHERE {where}", params)
+    return conn.execute(f"DELETE FROM main.{table} WHERE {where}", params).rowcount
+
+def archive_old_rows(conn, cutoff, batch_rows=COMMIT_ROWS, marks=None, upsert=False):
+    """Move rows older than `cutoff` (ISO date, or the archive's stored one)
+    into the attached archive. Archived keys this run re-imported (above
+    `marks` or in inserted_rows) are dropped from main again, or with
+    `upsert` replace their archived copies. Returns ({table: rows moved},
+    {table: archived rows re-imported})."""
+    marks = marks or {}
+    stored = conn.execute("SELECT value FROM archive.archive_state WHERE key='cutoff'").fetchone()
+    cutoff = max(filter(None, (cutoff, stored and stored[0])), default=None)
+    if cutoff is None:
+        return {}, {}
+    conn.execute("INSERT OR REPLACE INTO archive.archive_state VALUES('cutoff', ?)", (cutoff,))
+    params = {'day': cutoff, 'epoch': int(pd.Timestamp(cutoff).timestamp())}
+    drop_triggers(conn, REVENUE_TRIGGERS)           # archived invoices stay in the aggregates
+    conn.execute("DROP TABLE IF EXISTS temp.archive_batch")
+    conn.execute("CREATE TEMP TABLE archive_batch (rid INTEGER PRIMARY KEY)")
+    batch = "(SELECT rid FROM temp.archive_batch)"
+    replaced = Counter()
+    side = 'archive' if upsert else 'main'           # where the stale copy is
+    for table, key, old in ARCHIVE_TABLES:
+        conn.execute("DELETE FROM temp.archive_batch")
+        replaced[table] = conn.execute(f"""
+            INSERT INTO temp.archive_batch SELECT rowid FROM main.{table}
+            WHERE (rowid > ? OR rowid IN {inserted(table)})
+              AND {key} IN (SELECT {key} FROM archive.{table})
+        """, (marks.get(table, 0),)).rowcount
+        if not replaced[table]:
+            continue
+        for follower, parent, match in ARCHIVE_FOLLOWERS:
+            if parent == table:
+                conn.execute(f"DELETE FROM {side}.{follower} WHERE {match.format(batch=batch)}")
+        conn.execute(f"DELETE FROM {side}.{table} WHERE {key} IN "
+                     f"(SELECT {key} FROM main.{table} WHERE rowid IN {batch})")
+        conn.commit()
+    moved = Counter()
+    for table, key, old in ARCHIVE_TABLES:
+        last = 0
+        while True:
+            conn.execute("DELETE FROM temp.archive_batch")
+            n = conn.execute(f"""
+                INSERT INTO temp.archive_batch SELECT rowid FROM main.{table}
+                WHERE rowid > :last AND {old} ORDER BY rowid LIMIT :n
+            """, {**params, 'last': last, 'n': batch_rows}).rowcount
+            if not n:
+                break
+            last = conn.execute("SELECT MAX(rid) FROM temp.archive_batch").fetchone()[0]
+            for follower, parent, match in ARCHIVE_FOLLOWERS:
+                if parent == table:
+                    moved[follower] += _move(conn, follower, match.format(batch=batch))
+            if table == 'records':                 # this run's rows: derived rows not built yet
+                conn.execute(f"INSERT OR REPLACE INTO archive.visit_timeline({TIMELINE_COLUMNS}) "
+                             f"{timeline_select(conn)} AND r.rowid IN {batch}")
+            elif table == 'soap_objective':
+                conn.execute(f"INSERT OR REPLACE INTO archive.vitals_series{vitals_select()} "
+                             f"AND rowid IN {batch}")
+            moved[table] += _move(conn, table, f"rowid IN {batch}")
+            conn.commit()
+    conn.execute("DROP TABLE temp.archive_batch")
+    conn.commit()
+    return {t: n for t, n in moved.items() if n}, {t: n for t, n in replaced.items() if n}
+
+# ─── RUN REPORT ───────────────────────────────────────────────────────────────
+
+def record_table(report, table, read, inserted, secs, parse_secs=None, transform_secs=None,
+                 insert_secs=None, rejected=None, skipped=0, considered=None, updated=None,
+                 unchanged=None):
+    """Per-table figures for the dict run() returns (benchmarks read these).
+
+    `considered` is how many of the `read` rows were candidates for insert
+    (an --incremental import ignores rows at or below the high-water mark).
+    Of those, rows not inserted, rejected or `skipped` (invoices without a
+    ref) were ignored by INSERT OR IGNORE as duplicates; --upsert also
+    reports rows `updated` in place and rows left alone as `unchanged`
+    (same row hash). `rejected` maps an
+    exception class name to a row count; None means the path can't tell
+    rejects from duplicates (--elt), so only `not_inserted` is known.
+    Timings the path can't separate are left as None — the row path
+    transforms and inserts in the same loop."""
+    considered = read if considered is None else considered
+    not_inserted = int(considered) - int(inserted) - int(skipped) - int(updated or 0) \
+        - int(unchanged or 0)
+    entry = {
+        'stage': next(n for n, spec in enumerate(BULK_TABLES, 2) if spec[1] == table),
+        'rows': int(read), 'considered': int(considered), 'inserted': int(inserted),
+        'skipped': int(skipped), 'not_inserted': not_inserted,
+        'rejected': None, 'duplicates': None,
+        'parse_secs': None, 'transform_secs': None, 'insert_secs': None,
+        'secs': round(secs, 4), 'rows_per_sec': round(read / max(secs, 1e-9)),
+    }
+    if updated is not None:
+        entry.update(updated=int(updated), unchanged=int(unchanged or 0))
+    if rejected is not None:
+        entry['rejected'] = {k: int(v) for k, v in sorted(rejected.items()) if v}
+        entry['duplicates'] = not_inserted - sum(entry['rejected'].values())
+    for k, v in (('parse_secs', parse_secs), ('transform_secs', transform_secs),
+                 ('insert_secs', insert_secs)):
+        if v is not None:
+            entry[k] = round(v, 4)
+    report.setdefault('tables', {})[table] = entry
+    report.setdefault('stages', []).append({'stage': entry['stage'], 'name': table,
+                                            'secs': entry['secs']})
+
+@contextmanager
+def stage(report, n, name):
+    """Time one numbered run() stage into report['stages']."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        report.setdefault('stages', []).append(
+            {'stage': n, 'name': name, 'secs': round(time.perf_counter() - t0, 4)})
+
+def report_path(db_path):
+    """JSON run report lives next to the database: clinic.db -> clinic.import.json."""
+    return Path(db_path).with_suffix('.import.json')
+
+def write_report(report, db_path):
+    path = report_path(db_path)
+    report['stages'].sort(key=lambda s: s['stage'])
+    path.write_text(json.dumps(report, indent=2, default=str))
+    return path
+
+def print_rejects(report):
+    """Rows the import dropped, per table: rejects by exception class, invoices
+    without a ref, and INSERT OR IGNORE duplicates."""
+    lines = []
+    for table, t in report['tables'].items():
+        parts = [f"{n:,} {cls}" for cls, n in (t['rejected'] or {}).items()]
+        if t['skipped']:
+            parts.append(f"{t['skipped']:,} without ref")
+        if t['duplicates']:
+            parts.append(f"{t['duplicates']:,} duplicates")
+        elif t['rejected'] is None and t['not_inserted']:
+            parts.append(f"{t['not_inserted']:,} rejected or duplicate")
+        if parts:
+            lines.append(f"   {table:<22} {', '.join(parts)}")
+    if lines:
+        print("\n⚠  Rows not imported")
+        print("\n".join(lines))
+
+def profiled(path, fn, *args, **kwargs):
+    """Run fn under cProfile, dump stats to `path` and print the top entries."""
+    import cProfile, pstats
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(fn, *args, **kwargs)
+    finally:
+        prof.dump_stats(path)
+        print(f"📈 Profile written to {path} — top 15 by cumulative time:")
+        pstats.Stats(prof).sort_stats('cumulative').print_stats(15)
+
+# ─── ROW-BY-ROW IMPORT (original path) ────────────────────────────────────────
+
+def import_rows(conn, report):
+    """Sections 2–11, one cur.execute per CSV row."""
+    cur = conn.cursor()
 
     # ── 2. PET PARENTS ───────────────────────────────────────────────────────
     print("\n📥 Importing pet_parents…")
-    df = pd.read_csv(CSV_DIR / "pet_parents.csv", on_bad_lines='skip', engine='python')
-    inserted = 0
+    t0 = time.perf_counter()
+    df = pd.read_csv(CSV_DIR / "pet_parents.csv", on_bad_lines='skip', engine='python',
+                     dtype=text_dtypes("pet_parents.csv"))
+    inserted, rejected, t1 = 0, Counter(), time.perf_counter()
     for _, row in df.iterrows():
         try:
             cur.execute("""
@@ -241,15 +1555,21 @@ def run():
             ))
             inserted += cur.rowcount
         except Exception as e:
-            pass
+            rejected[type(e).__name__] += 1
     conn.commit()
     print(f"   ✓ {inserted:,} pet parents imported")
+    record_table(report, 'pet_parents', len(df), inserted, time.perf_counter() - t0,
+                 parse_secs=t1 - t0, rejected=rejected)
 
     # ── 3. PATIENTS ──────────────────────────────────────────────────────────
     print("\n📥 Importing patients…")
-    df = pd.read_csv(CSV_DIR / "patients.csv", on_bad_lines='skip', engine='python')
-    parents_map = {r['pet_parent_id']: r for _, r in pd.read_csv(CSV_DIR / "pet_parents.csv", on_bad_lines='skip', engine='python').iterrows()}
-    inserted = 0
+    t0 = time.perf_counter()
+    df = pd.read_csv(CSV_DIR / "patients.csv", on_bad_lines='skip', engine='python',
+                     dtype=text_dtypes("patients.csv"))
+    parents_map = {r['pet_parent_id']: r for _, r in pd.read_csv(
+        CSV_DIR / "pet_parents.csv", on_bad_lines='skip', engine='python',
+        dtype=text_dtypes("pet_parents.csv")).iterrows()}
+    inserted, rejected, t1 = 0, Counter(), time.perf_counter()
     for _, row in df.iterrows():
         pid = int(row['patient_id'])
         uid = f"PaCPC-{pid:05d}"
@@ -284,14 +1604,18 @@ def run():
             ))
             inserted += cur.rowcount
         except Exception as e:
-            pass
+            rejected[type(e).__name__] += 1
     conn.commit()
     print(f"   ✓ {inserted:,} patients imported")
+    record_table(report, 'patients', len(df), inserted, time.perf_counter() - t0,
+                 parse_secs=t1 - t0, rejected=rejected)
 
     # ── 4. SOAP SUBJECTIVE ───────────────────────────────────────────────────
     print("\n📥 Importing SOAP Subjective…")
-    df = pd.read_csv(CSV_DIR / "subjective.csv", on_bad_lines='skip', engine='python')
-    inserted = 0
+    t0 = time.perf_counter()
+    df = pd.read_csv(CSV_DIR / "subjective.csv", on_bad_lines='skip', engine='python',
+                     dtype=text_dtypes("subjective.csv"))
+    inserted, rejected, t1 = 0, Counter(), time.perf_counter()
     for _, row in df.iterrows():
         try:
             cur.execute("""
@@ -314,14 +1638,19 @@ def run():
                 clean(row.get('timestamp'))
             ))
             inserted += cur.rowcount
-        except: pass
+        except Exception as e:
+            rejected[type(e).__name__] += 1
     conn.commit()
     print(f"   ✓ {inserted:,} subjective records imported")
+    record_table(report, 'soap_subjective', len(df), inserted, time.perf_counter() - t0,
+                 parse_secs=t1 - t0, rejected=rejected)
 
     # ── 5. SOAP OBJECTIVE ────────────────────────────────────────────────────
     print("\n📥 Importing SOAP Objective (vitals)…")
-    df = pd.read_csv(CSV_DIR / "objective.csv", on_bad_lines='skip', engine='python')
-    inserted = 0
+    t0 = time.perf_counter()
+    df = pd.read_csv(CSV_DIR / "objective.csv", on_bad_lines='skip', engine='python',
+                     dtype=text_dtypes("objective.csv"))
+    inserted, rejected, t1 = 0, Counter(), time.perf_counter()
     for _, row in df.iterrows():
         try:
             cur.execute("""
@@ -345,14 +1674,19 @@ def run():
                 clean(row.get('timestamp'))
             ))
             inserted += cur.rowcount
-        except: pass
+        except Exception as e:
+            rejected[type(e).__name__] += 1
     conn.commit()
     print(f"   ✓ {inserted:,} objective/vitals records imported")
+    record_table(report, 'soap_objective', len(df), inserted, time.perf_counter() - t0,
+                 parse_secs=t1 - t0, rejected=rejected)
 
     # ── 6. SOAP ASSESSMENT ───────────────────────────────────────────────────
     print("\n📥 Importing SOAP Assessment…")
-    df = pd.read_csv(CSV_DIR / "assessment.csv", on_bad_lines='skip', engine='python')
-    inserted = 0
+    t0 = time.perf_counter()
+    df = pd.read_csv(CSV_DIR / "assessment.csv", on_bad_lines='skip', engine='python',
+                     dtype=text_dtypes("assessment.csv"))
+    inserted, rejected, t1 = 0, Counter(), time.perf_counter()
     for _, row in df.iterrows():
         try:
             cur.execute("""
@@ -365,14 +1699,19 @@ def run():
                 clean(row.get('timestamp'))
             ))
             inserted += cur.rowcount
-        except: pass
+        except Exception as e:
+            rejected[type(e).__name__] += 1
     conn.commit()
     print(f"   ✓ {inserted:,} assessment records imported")
+    record_table(report, 'soap_assessment', len(df), inserted, time.perf_counter() - t0,
+                 parse_secs=t1 - t0, rejected=rejected)
 
     # ── 7. SOAP PLAN ─────────────────────────────────────────────────────────
     print("\n📥 Importing SOAP Plan…")
-    df = pd.read_csv(CSV_DIR / "plan.csv", on_bad_lines='skip', engine='python')
-    inserted = 0
+    t0 = time.perf_counter()
+    df = pd.read_csv(CSV_DIR / "plan.csv", on_bad_lines='skip', engine='python',
+                     dtype=text_dtypes("plan.csv"))
+    inserted, rejected, t1 = 0, Counter(), time.perf_counter()
     for _, row in df.iterrows():
         try:
             cur.execute("""
@@ -385,14 +1724,19 @@ def run():
                 clean(row.get('timestamp'))
             ))
             inserted += cur.rowcount
-        except: pass
+        except Exception as e:
+            rejected[type(e).__name__] += 1
     conn.commit()
     print(f"   ✓ {inserted:,} plan records imported")
+    record_table(report, 'soap_plan', len(df), inserted, time.perf_counter() - t0,
+                 parse_secs=t1 - t0, rejected=rejected)
 
     # ── 8. RECORDS (visit links) ──────────────────────────────────────────────
     print("\n📥 Importing Visit Records…")
-    df = pd.read_csv(CSV_DIR / "records.csv", on_bad_lines='skip', engine='python')
-    inserted = 0
+    t0 = time.perf_counter()
+    df = pd.read_csv(CSV_DIR / "records.csv", on_bad_lines='skip', engine='python',
+                     dtype=text_dtypes("records.csv"))
+    inserted, rejected, t1 = 0, Counter(), time.perf_counter()
     for _, row in df.iterrows():
         try:
             cur.execute("""
@@ -412,17 +1756,22 @@ def run():
                 clean(row.get('timestamp'))
             ))
             inserted += cur.rowcount
-        except: pass
+        except Exception as e:
+            rejected[type(e).__name__] += 1
     conn.commit()
     print(f"   ✓ {inserted:,} visit records imported")
+    record_table(report, 'records', len(df), inserted, time.perf_counter() - t0,
+                 parse_secs=t1 - t0, rejected=rejected)
 
     # ── 9. PRESCRIPTIONS ─────────────────────────────────────────────────────
     print("\n📥 Importing Prescriptions…")
-    df = pd.read_csv(CSV_DIR / "prescription.csv", on_bad_lines='skip', engine='python')
+    t0 = time.perf_counter()
+    df = pd.read_csv(CSV_DIR / "prescription.csv", on_bad_lines='skip', engine='python',
+                     dtype=text_dtypes("prescription.csv"))
     # Fix duplicate column name 'prescription_id'
     df.columns = [f"{c}_{i}" if list(df.columns).count(c) > 1 and i > 0 else c
                   for i, c in enumerate(df.columns)]
-    inserted = 0
+    inserted, rejected, t1 = 0, Counter(), time.perf_counter()
     for _, row in df.iterrows():
         try:
             pres_col = 'prescription_id' if 'prescription_id' in row else df.columns[9]
@@ -446,14 +1795,19 @@ def run():
                 clean(row.get('timestamp'))
             ))
             inserted += cur.rowcount
-        except: pass
+        except Exception as e:
+            rejected[type(e).__name__] += 1
     conn.commit()
     print(f"   ✓ {inserted:,} prescription items imported")
+    record_table(report, 'prescriptions', len(df), inserted, time.perf_counter() - t0,
+                 parse_secs=t1 - t0, rejected=rejected)
 
     # ── 10. VACCINATIONS ─────────────────────────────────────────────────────
     print("\n📥 Importing Vaccinations…")
-    df = pd.read_csv(CSV_DIR / "vaccinations.csv", on_bad_lines='skip', engine='python')
-    inserted = 0
+    t0 = time.perf_counter()
+    df = pd.read_csv(CSV_DIR / "vaccinations.csv", on_bad_lines='skip', engine='python',
+                     dtype=text_dtypes("vaccinations.csv"))
+    inserted, rejected, t1 = 0, Counter(), time.perf_counter()
     for _, row in df.iterrows():
         try:
             cur.execute("""
@@ -473,32 +1827,31 @@ def run():
                 clean(row.get('timestamp'))
             ))
             inserted += cur.rowcount
-        except: pass
+        except Exception as e:
+            rejected[type(e).__name__] += 1
     conn.commit()
     print(f"   ✓ {inserted:,} vaccination records imported")
+    record_table(report, 'vaccinations', len(df), inserted, time.perf_counter() - t0,
+                 parse_secs=t1 - t0, rejected=rejected)
 
     # ── 11. INVOICES ─────────────────────────────────────────────────────────
     print("\n📥 Importing Invoices…")
-    df = pd.read_csv(CSV_DIR / "Invoices.csv", on_bad_lines='skip', engine='python')
+    t0 = time.perf_counter()
+    df = pd.read_csv(CSV_DIR / "Invoices.csv", on_bad_lines='skip', engine='python',
+                     dtype=text_dtypes("Invoices.csv"))
 
     # Build patient lookup: patient_id -> name, type, pet_parent_id
     pat_lookup = {}
-    for _, row in pd.read_csv(CSV_DIR / "patients.csv", on_bad_lines='skip', engine='python').iterrows():
+    for _, row in pd.read_csv(CSV_DIR / "patients.csv", on_bad_lines='skip', engine='python',
+                              dtype=text_dtypes("patients.csv")).iterrows():
         pat_lookup[int(row['patient_id'])] = {
             'name': clean(row.get('name')) or '',
             'type': clean(row.get('species')) or '',
             'pet_parent_id': int(row['pet_parent_id']) if pd.notna(row.get('pet_parent_id')) else None
         }
 
-    # Normalize payment method
-    method_map = {
-        'cash': 'Cash', 'debit card': 'Card', 'credit card': 'Card',
-        'googlepay': 'UPI', 'paytm': 'UPI', 'upi': 'UPI',
-        'neft': 'Bank Transfer', 'imps': 'Bank Transfer', 'rtgs': 'Bank Transfer',
-        'cheque': 'Cheque', 'credits': 'Credits'
-    }
-
-    inserted = 0
+    inserted, rejected, t1 = 0, Counter(), time.perf_counter()
+    skipped = 0
     for _, row in df.iterrows():
         try:
             pid = int(row['patient_id']) if pd.notna(row.get('patient_id')) else None
@@ -507,7 +1860,7 @@ def run():
             parent = parents_map.get(ppid)
 
             pt = clean(row.get('payment_type')) or ''
-            method = method_map.get(pt.lower(), pt) if pt else None
+            method = METHOD_MAP.get(pt.lower(), pt) if pt else None
 
             total = float(row['total']) if pd.notna(row.get('total')) else 0
             disc  = float(row['final_discount']) if pd.notna(row.get('final_discount')) else 0
@@ -516,7 +1869,9 @@ def run():
             balance  = 0 if status == 'Paid' else total
 
             ref = clean(row.get('ref'))
-            if not ref: continue
+            if not ref:
+                skipped += 1
+                continue
 
             cur.execute("""
                 INSERT OR IGNORE INTO invoices(
@@ -555,35 +1910,1802 @@ def run():
                 """, (ref, 'Consultation / Treatment', 1, total + disc, disc, total))
             inserted += cur.rowcount
         except Exception as e:
-            pass
+            rejected[type(e).__name__] += 1
 
     conn.commit()
     print(f"   ✓ {inserted:,} invoices imported")
+    record_table(report, 'invoices', len(df), inserted, time.perf_counter() - t0,
+                 parse_secs=t1 - t0, rejected=rejected, skipped=skipped)
+
+# ─── BULK IMPORT (vectorised) ─────────────────────────────────────────────────
+# Same rules as import_rows(), applied to whole columns at once. Rows that the
+# row path would drop in its `except` (bad int casts, missing required
+# columns) are masked out before the insert, so both paths end up with the
+# same database row-for-row.
+
+def read_csv(path, **kw):
+    """CSV reader for the vectorised paths (C engine, one dtype pass per file)."""
+    return pd.read_csv(path, on_bad_lines='skip', low_memory=False, **kw)
+
+def text_dtypes(csv_name):
+    """read_csv() dtype for the source columns stored as TEXT: kept as written,
+    so a phone column isn't inferred as float and stored as '9402870645.0'.
+    Every load mode reads these columns this way (stream and ELT read all
+    columns as text), so they all store the same values."""
+    table = next(t for c, t, *_ in BULK_TABLES if c == csv_name)
+    return {src: str for dst, kind, src in ELT_TABLES[table] if kind == 'text'}
+
+def clean_col(df, name):
+    """Vectorised clean(): NULL strings / NaN -> None, everything else stripped str."""
+    if name not in df.columns:
+        return pd.Series(None, index=df.index, dtype=object)
+    s = df[name]
+    txt = s.astype(str).str.strip()
+    keep = s.notna() & ~txt.str.lower().isin(NULL_STRINGS)
+    return txt.astype(object).where(keep, None)
+
+def int_col(df, name, required=False):
+    """Vectorised int() cast. Returns (values, bad) where `bad` marks the rows
+    the row path would reject: non-numeric text, or NaN when `required`."""
+    if name not in df.columns:
+        return (pd.Series(None, index=df.index, dtype=object),
+                pd.Series(required, index=df.index))
+    s = df[name]
+    num = pd.to_numeric(s, errors='coerce')
+    ok = num.notna() & num.abs().lt(2**63)
+    bad = ~ok if required else (s.notna() & ~ok)
+    vals = np.trunc(num.where(ok)).astype('Int64').astype(object)
+    return vals.where(ok, None), bad
+
+def float_col(df, name):
+    """float(x) if present else 0 — returns (values, bad)."""
+    if name not in df.columns:
+        return pd.Series(0.0, index=df.index), pd.Series(False, index=df.index)
+    s = df[name]
+    num = pd.to_numeric(s, errors='coerce')
+    return num.fillna(0.0).astype(float), s.notna() & num.isna()
+
+def _keep(out, bad):
+    """Drop rejected rows from a prepared frame."""
+    return out[~bad] if bad.any() else out
+
+def parent_lookup(df):
+    """pet_parent_id -> cleaned name / mobile_no / email_id (last row wins, like a dict)."""
+    key = pd.to_numeric(df['pet_parent_id'], errors='coerce')
+    lk = pd.DataFrame({'name': clean_col(df, 'name').values,
+                       'mobile_no': clean_col(df, 'mobile_no').values,
+                       'email_id': clean_col(df, 'email_id').values}, index=key.values)
+    lk = lk[lk.index.notna()]
+    return lk[~lk.index.duplicated(keep='last')]
 
-    # ── 12. UPDATE COUNTERS ───────────────────────────────────────────────────
-    max_pat = cur.execute("SELECT MAX(patient_id) FROM patients").fetchone()[0] or 10000
-    cur.execute("UPDATE counters SET value=? WHERE key='patient'", (max_pat + 1,))
+def patient_lookup(df):
+    """patient_id -> name / species for invoice denormalisation (last row wins)."""
+    key = pd.to_numeric(df['patient_id'], errors='coerce')
+    lk = pd.DataFrame({'name': clean_col(df, 'name').fillna('').values,
+                       'type': clean_col(df, 'species').fillna('').values}, index=key.values)
+    lk = lk[lk.index.notna()]
+    return lk[~lk.index.duplicated(keep='last')]
 
-    max_inv_num = cur.execute("""
+def _lookup(lk, df, key_col, field):
+    """Vectorised dict.get(): lookup field for each row's key, None when absent."""
+    if key_col not in df.columns or lk is None:
+        return pd.Series(None, index=df.index, dtype=object)
+    key = pd.to_numeric(df[key_col], errors='coerce')
+    vals = lk[field].reindex(key.values)
+    return pd.Series(vals.values, index=df.index, dtype=object).where(vals.notna().values, None)
+
+def fix_prescription_columns(df):
+    """Fix duplicate column name 'prescription_id'."""
+    df.columns = [f"{c}_{i}" if list(df.columns).count(c) > 1 and i > 0 else c
+                  for i, c in enumerate(df.columns)]
+    return df
+
+def prep_pet_parents(df, lk):
+    if not {'pet_parent_id', 'name', 'mobile_no', 'email_id', 'timestamp'} <= set(df.columns):
+        return None
+    pid, bad = int_col(df, 'pet_parent_id', required=True)
+    out = pd.DataFrame({
+        'pet_parent_id': pid,
+        'name':          clean_col(df, 'name').fillna('Unknown'),
+        'mobile_no':     clean_col(df, 'mobile_no'),
+        'email_id':      clean_col(df, 'email_id'),
+        'created_at':    clean_col(df, 'timestamp'),
+    })
+    return _keep(out, bad)
+
+def prep_patients(df, lk):
+    if 'name' not in df.columns:
+        return None
+    pid, bad = int_col(df, 'patient_id', required=True)
+    ppid, bad_pp = int_col(df, 'pet_parent_id')
+    species = clean_col(df, 'species')
+    species = species.where(species != '0', 'Other')
+    parents = lk.get('parents')
+    out = pd.DataFrame({
+        'id':            'PaCPC-' + pid.where(~bad, 0).astype(str).str.zfill(5),
+        'patient_id':    pid,
+        'name':          clean_col(df, 'name').fillna('Unknown'),
+        'sex':           clean_col(df, 'sex'),
+        'type':          species,
+        'breed':         clean_col(df, 'breed'),
+        'age':           clean_col(df, 'age_dob'),
+        'colour':        clean_col(df, 'color'),
+        'microchip_no':  clean_col(df, 'microchip_no'),
+        'identify_mark': clean_col(df, 'identify_mark'),
+        'owner_name':    _lookup(parents, df, 'pet_parent_id', 'name'),
+        'phone':         _lookup(parents, df, 'pet_parent_id', 'mobile_no'),
+        'email':         _lookup(parents, df, 'pet_parent_id', 'email_id'),
+        'pet_parent_id': ppid,
+        'status':        clean_col(df, 'status'),
+        'created_at':    clean_col(df, 'timestamp'),
+    })
+    return _keep(out, bad | bad_pp)
+
+def _prep_soap(key, cols):
+    """Build a prep function for the simple <key>, patient_id, <text cols…> tables."""
+    def prep(df, lk):
+        kid, bad_k = int_col(df, key, required=True)
+        pid, bad_p = int_col(df, 'patient_id', required=True)
+        out = pd.DataFrame({key: kid, 'patient_id': pid})
+        for dst, src in cols:
+            out[dst] = clean_col(df, src)
+        return _keep(out, bad_k | bad_p)
+    return prep
+
+prep_subjective = _prep_soap('subject_id', [
+    ('addnotes', 'addnotes'), ('appetite', 'appetite'), ('attitude', 'attid'),
+    ('drinking', 'drinking'), ('notice', 'notice'), ('pooping', 'poopng'),
+    ('urinating', 'urnatng'), ('chief_complaint', 'cheifcom'),
+    ('duration', 'duration'), ('created_at', 'timestamp')])
+
+prep_objective = _prep_soap('objective_id', [
+    ('temp', 'temp'), ('pulse', 'pulse'), ('resprate', 'resprate'), ('weight', 'weight'),
+    ('mucmemb', 'mucmemb'), ('lymnodes', 'lymnodes'), ('hydration', 'hydration'),
+    ('crt', 'crt'), ('bcs', 'bcs'), ('visual_exam', 'visual_exam'), ('created_at', 'timestamp')])
+
+prep_assessment = _prep_soap('assess_id', [('diagnosis', 'diagnosis'), ('created_at', 'timestamp')])
+
+prep_plan = _prep_soap('plan_id', [('plan', 'plan'), ('created_at', 'timestamp')])
+
+def prep_records(df, lk):
+    rid, bad = int_col(df, 'record_id', required=True)
+    out = pd.DataFrame({'record_id': rid})
+    out['patient_id'], b = int_col(df, 'patient_id', required=True); bad |= b
+    for c in ('subject_id', 'objective_id', 'assess_id', 'plan_id', 'prescription_id', 'user_id'):
+        out[c], b = int_col(df, c); bad |= b
+    out['created_at'] = clean_col(df, 'timestamp')
+    return _keep(out, bad)
+
+def prep_prescriptions(df, lk):
+    df = fix_prescription_columns(df)
+    if len(df.columns) < 10:
+        return None
+    out = pd.DataFrame(index=df.index)
+    out['presmeds_id'], bad = int_col(df, 'presmeds_id', required=True)
+    out['patient_id'], b = int_col(df, 'patient_id', required=True); bad |= b
+    out['prescription_id'], b = int_col(df, df.columns[9]); bad |= b
+    for dst, src in (('med_name', 'med_name'), ('prefix', 'prefix'), ('quantity', 'quan'),
+                     ('quantity_type', 'quan_type'), ('duration', 'dur'),
+                     ('duration_type', 'dur_type'), ('frequency', 'freq'),
+                     ('instruction', 'instruction'), ('created_at', 'timestamp')):
+        out[dst] = clean_col(df, src)
+    return _keep(out, bad)
+
+def prep_vaccinations(df, lk):
+    out = pd.DataFrame(index=df.index)
+    out['pchistory_id'], bad = int_col(df, 'pchistory_id', required=True)
+    for c in ('preventive_id', 'patient_id'):
+        out[c], b = int_col(df, c, required=True); bad |= b
+    for dst, src in (('date', 'date'), ('age', 'age'), ('veterinarian', 'veterinarian'),
+                     ('type_care', 'type_care'), ('treatment', 'treatment'),
+                     ('created_at', 'timestamp')):
+        out[dst] = clean_col(df, src)
+    return _keep(out, bad)
+
+def prep_invoices(df, lk):
+    ref = clean_col(df, 'ref')
+    pid, bad = int_col(df, 'patient_id')
+    ppid, b = int_col(df, 'pet_parent_id'); bad |= b
+    total, b = float_col(df, 'total'); bad |= b
+    disc, b = float_col(df, 'final_discount'); bad |= b
+    has_ref = ref.notna()
+    skipped = int((~has_ref & ~bad).sum())     # the row path casts these before the ref check
+    df, ref, pid, ppid, total, disc, bad = (x[has_ref] for x in (df, ref, pid, ppid, total, disc, bad))
+    iid, b = int_col(df, 'invoice_id', required=True); bad |= b
+    plan_id, b = int_col(df, 'plan_id'); bad |= b
+    prev_id, b = int_col(df, 'preventive_id'); bad |= b
+
+    pt = clean_col(df, 'payment_type')
+    method = pt.str.lower().map(METHOD_MAP).fillna(pt)
+    status = clean_col(df, 'status').fillna('Draft')
+    paid = status == 'Paid'
+    pats, parents = lk.get('patients'), lk.get('parents')
+    name = _lookup(pats, df, 'patient_id', 'name').fillna('')
+    ptype = _lookup(pats, df, 'patient_id', 'type').fillna('')
+    out = pd.DataFrame({
+        'ref':           ref,
+        'invoice_id':    iid,
+        'date':          clean_col(df, 'date'),
+        'patient_id':    pid,
+        'patient_name':  name,
+        'patient_type':  ptype,
+        'owner_name':    _lookup(parents, df, 'pet_parent_id', 'name'),
+        'phone':         _lookup(parents, df, 'pet_parent_id', 'mobile_no'),
+        'pet_parent_id': ppid,
+        'payment_type':  pt,
+        'method':        method.astype(object).where(pt.notna(), None),
+        'discount':      disc,
+        'total':         total,
+        'paid_amount':   total.where(paid, 0.0),
+        'balance':       total.where(~paid, 0.0),
+        'status':        status,
+        'plan_id':       plan_id,
+        'preventive_id': prev_id,
+        'subtotal':      total + disc,
+        'created_at':    clean_col(df, 'timestamp'),
+    })
+    out = _keep(out, bad)
+    out.attrs['skipped'] = skipped
+    return out
+
+# (csv file, table, key column, prep, label) in dependency order
+BULK_TABLES = [
+    ('pet_parents.csv',  'pet_parents',     'pet_parent_id', prep_pet_parents,   'pet parents'),
+    ('patients.csv',     'patients',        'patient_id',    prep_patients,      'patients'),
+    ('subjective.csv',   'soap_subjective', 'subject_id',    prep_subjective,    'subjective records'),
+    ('objective.csv',    'soap_objective',  'objective_id',  prep_objective,     'objective/vitals records'),
+    ('assessment.csv',   'soap_assessment', 'assess_id',     prep_assessment,    'assessment records'),
+    ('plan.csv',         'soap_plan',       'plan_id',       prep_plan,          'plan records'),
+    ('records.csv',      'records',         'record_id',     prep_records,       'visit records'),
+    ('prescription.csv', 'prescriptions',   'presmeds_id',   prep_prescriptions, 'prescription items'),
+    ('vaccinations.csv', 'vaccinations',    'pchistory_id',  prep_vaccinations,  'vaccination records'),
+    ('Invoices.csv',     'invoices',        'invoice_id',    prep_invoices,      'invoices'),
+]
+
+# lookups the later tables denormalise from: name -> (csv file, columns, builder)
+LOOKUPS = {
+    'parents':  ('pet_parents.csv', ('pet_parent_id', 'name', 'mobile_no', 'email_id'), parent_lookup),
+    'patients': ('patients.csv',    ('patient_id', 'name', 'species'),                  patient_lookup),
+}
+LOOKUP_NEEDS = {'patients': ('parents',), 'invoices': ('parents', 'patients')}
+
+def ensure_lookups(lookups, table, **kw):
+    """Build any lookup `table` needs that wasn't built from an in-memory frame
+    (its source file was skipped, or is being streamed), reading only the
+    lookup's columns. Each lookup is built once per run."""
+    for name in LOOKUP_NEEDS.get(table, ()):
+        if name not in lookups:
+            csv_name, cols, build = LOOKUPS[name]
+            lookups[name] = build(read_csv(CSV_DIR / csv_name, usecols=lambda c: c in cols,
+                                           **{'dtype': text_dtypes(csv_name), **kw}))
+
+def frame_rows(frame):
+    """(columns, row iterator) of plain Python values, ready for executemany()."""
+    cols = list(frame.columns)
+    return cols, zip(*(frame[c].tolist() for c in cols))
+
+def insert_rows(conn, table, cols, rows, verb='INSERT OR IGNORE'):
+    """executemany() one batch of rows; returns rows actually written (rowcount,
+    so rows the revenue / FTS triggers write are not counted)."""
+    return conn.executemany(
+        f"{verb} INTO {table}({', '.join(cols)}) VALUES({','.join('?' * len(cols))})", rows).rowcount
+
+def insert_frame(conn, table, frame, verb='INSERT OR IGNORE'):
+    """executemany() a prepared frame; returns rows actually written."""
+    return insert_rows(conn, table, *frame_rows(frame), verb=verb)
+
+def add_default_items(conn, after_rowid):
+    """Default line item for every invoice inserted after `after_rowid`."""
+    conn.execute("""
+        INSERT INTO invoice_items(invoice_ref, name, quantity, unit_price, discount, total)
+        SELECT ref, 'Consultation / Treatment', 1, subtotal, discount, total
+        FROM invoices WHERE rowid > ? ORDER BY rowid
+    """, (after_rowid,))
+
+def max_rowid(conn, table):
+    return conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+
+# ─── INCREMENTAL STATE ───────────────────────────────────────────────────────
+
+def file_fingerprint(path, block=1 << 20):
+    """blake2b of the file contents — one sequential read, far cheaper than parsing."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(block), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def load_state(conn, csv_name):
+    """(fingerprint, high_water) recorded for a source file, or None."""
+    return conn.execute("SELECT fingerprint, high_water FROM import_state WHERE file=?",
+                        (csv_name,)).fetchone()
+
+def save_state(conn, csv_name, fingerprint, key_col, high_water, rows):
+    conn.execute("""
+        INSERT INTO import_state(file, fingerprint, key_col, high_water, rows, imported_at)
+        VALUES(?,?,?,?,?,datetime('now','localtime'))
+        ON CONFLICT(file) DO UPDATE SET
+            fingerprint=excluded.fingerprint, key_col=excluded.key_col,
+            high_water=excluded.high_water, rows=excluded.rows,
+            imported_at=excluded.imported_at
+    """, (csv_name, fingerprint, key_col, high_water, rows))
+
+# ─── CHECKPOINTS ─────────────────────────────────────────────────────────────
+# The bulk modes commit every COMMIT_ROWS rows together with the file's
+# import_progress row, so a crash or Ctrl-C loses at most one batch. A re-run
+# skips finished files and the committed rows of the unfinished one; the
+# derived stages (dates, timeline, summaries, …) take their rowid marks from
+# the interrupted run so the rows it committed are still treated as new.
+# On tables keyed by INTEGER PRIMARY KEY the rowid is the source key, so a
+# key missing from an earlier export lands at or below the mark: TEMP
+# triggers log those rowids in inserted_rows, whichever loader wrote them.
+
+def file_stamp(path):
+    """size:mtime — enough to tell whether a checkpoint still belongs to a file."""
+    st = path.stat()
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+def begin_checkpoints(conn, marks):
+    """Start (or pick up) checkpoints for this run. Returns the rowid marks the
+    derived stages should use and whether an interrupted run is being resumed."""
+    rows = conn.execute("SELECT file, start_rowid FROM import_progress").fetchall()
+    if rows:
+        start = {csv_name: rowid for csv_name, rowid in rows if rowid is not None}
+        return {table: min(marks[table], start.get(csv_name, marks[table]))
+                for csv_name, table, *_ in BULK_TABLES}, True
+    conn.executemany("""
+        INSERT INTO import_progress(file, stamp, start_rowid, updated_at)
+        VALUES(?,?,?,datetime('now','localtime'))
+    """, [(csv_name, file_stamp(CSV_DIR / csv_name) if (CSV_DIR / csv_name).exists() else None,
+           marks[table]) for csv_name, table, *_ in BULK_TABLES])
+    conn.commit()
+    return marks, False
+
+def track_inserts(conn, marks):
+    """(Re)create the TEMP triggers that log rows inserted at or below `marks`
+    into inserted_rows for this connection."""
+    for csv_name, table, *_ in BULK_TABLES:
+        conn.execute(f"DROP TRIGGER IF EXISTS temp.trg_inserted_{table}")
+        conn.execute(f"""
+            CREATE TEMP TRIGGER trg_inserted_{table} AFTER INSERT ON main.{table}
+            WHEN NEW.rowid <= {int(marks[table])}
+            BEGIN INSERT OR IGNORE INTO inserted_rows VALUES ('{table}', NEW.rowid); END""")
+
+def inserted(table):
+    """SQL list of the rowids this run inserted at or below its mark in `table`."""
+    return f"(SELECT rid FROM inserted_rows WHERE tbl = '{table}')"
+
+def load_progress(conn, csv_name, stamp):
+    """(rows_done, last_key, done) committed for `csv_name`. A checkpoint left by
+    a different version of the file is reset so that file starts over."""
+    row = conn.execute("SELECT stamp, rows_done, last_key, done FROM import_progress WHERE file=?",
+                       (csv_name,)).fetchone()
+    if row and row[0] == stamp:
+        return row[1:]
+    conn.execute("""
+        INSERT INTO import_progress(file, stamp, start_rowid, updated_at)
+        VALUES(?,?,NULL,datetime('now','localtime'))
+        ON CONFLICT(file) DO UPDATE SET stamp=excluded.stamp, rows_done=0, last_key=NULL,
+            batches=0, done=0, updated_at=excluded.updated_at
+    """, (csv_name, stamp))
+    return 0, None, 0
+
+def save_progress(conn, csv_name, rows_done, last_key, done=False):
+    """Advance a file's checkpoint; call inside the batch's own transaction."""
+    conn.execute("""
+        UPDATE import_progress SET rows_done=?, last_key=?, batches=batches+1, done=?,
+            updated_at=datetime('now','localtime')
+        WHERE file=?
+    """, (rows_done, last_key, int(done), csv_name))
+
+def _top(*keys):
+    """Highest of the keys that are known (None when none are)."""
+    return max((k for k in keys if k is not None), default=None)
+
+def clear_checkpoints(conn):
+    conn.execute("DELETE FROM import_progress")
+    conn.execute("DELETE FROM upserted_rows")
+    conn.execute("DELETE FROM inserted_rows")
+    conn.commit()
+
+# ─── UPSERT ──────────────────────────────────────────────────────────────────
+# INSERT OR IGNORE never applies a changed source row (a Draft invoice that is
+# now Paid, a patient's new status). --upsert keeps a 64-bit hash of every
+# imported row's cleaned columns in row_hashes: a re-import hashes each batch
+# in pandas, drops the rows whose hash is unchanged before they reach SQLite
+# and writes the rest with INSERT … ON CONFLICT DO UPDATE. Updated rowids are
+# kept in upserted_rows so the derived stages refresh them along with the
+# run's new rows; revenue aggregates and FTS follow through their triggers.
+# Patients and invoices copy owner / patient columns from the other exports,
+# so when pet_parents.csv or patients.csv changes their files are re-hashed
+# as well and the rows whose copies went stale are rewritten.
+
+# identity columns an upsert never rewrites, besides the BULK_TABLES key
+UPSERT_FIXED = {'patients': ('id',), 'invoices': ('ref',)}
+
+def hash_rows(frame):
+    """Signed 64-bit hash per row of `frame` (fits an SQLite INTEGER)."""
+    return pd.util.hash_pandas_object(frame, index=False).values.view('int64')
+
+def load_hashes(conn, table):
+    """Stored row hashes for `table` as a Series indexed by key."""
+    df = pd.read_sql_query("SELECT key, hash FROM row_hashes WHERE tbl=?", conn, params=(table,),
+                           dtype='int64')
+    return df.set_index('key')['hash']
+
+def upserted(table):
+    """SQL list of the rowids an upsert run rewrote in `table`."""
+    return f"(SELECT rid FROM upserted_rows WHERE tbl = '{table}')"
+
+def upsert_rows(conn, table, key_col, cols, rows):
+    """Write one batch of new / changed rows whose last column is the row hash;
+    returns (inserted, updated). A row counts as updated when its key was
+    already in `table` before the batch, wherever its rowid falls."""
+    rows = list(rows)
+    data, k = cols[:-1], cols.index(key_col)
+    fixed = (key_col,) + UPSERT_FIXED.get(table, ())
+    keys = [r[k] for r in rows]
+    existing = [key for (key,) in conn.execute(
+        f"SELECT {key_col} FROM {table} WHERE {key_col} IN (SELECT value FROM json_each(?))",
+        (json.dumps(keys),))]
+    last = max_rowid(conn, table)
+    written = conn.executemany(f"""
+        INSERT INTO {table}({', '.join(data)}) VALUES({','.join('?' * len(data))})
+        ON CONFLICT({key_col}) DO UPDATE SET
+            {', '.join(f'{c}=excluded.{c}' for c in data if c not in fixed)}
+        ON CONFLICT DO NOTHING
+    """, (r[:-1] for r in rows)).rowcount
+    conn.executemany(f"""
+        INSERT OR IGNORE INTO upserted_rows SELECT '{table}', rowid FROM {table} WHERE {key_col} = ?
+    """, ((key,) for key in existing))
+    conn.executemany("INSERT OR REPLACE INTO row_hashes(tbl, key, hash) VALUES(?,?,?)",
+                     ((table, key, r[-1]) for key, r in zip(keys, rows)))
+    if table == 'invoices':
+        add_default_items(conn, last)               # invoices are keyed by ref: new rowids are above
+        conn.executemany("""
+            UPDATE invoice_items SET unit_price = i.subtotal, discount = i.discount, total = i.total
+            FROM invoices i
+            WHERE i.invoice_id = ? AND invoice_items.invoice_ref = i.ref
+              AND invoice_items.name = 'Consultation / Treatment'
+        """, ((key,) for key in existing))
+    return written - len(existing), len(existing)
+
+def parse_file(csv_name, table, key_col, prep, lookups, mark=None, chunksize=None, stats=None,
+               skip=0, batch_rows=None, known=None, source=None):
+    """Read and transform one CSV, yielding (columns, rows, done) batches ready to
+    insert, where `done` is how many of the file's data rows the batch completes.
+
+    Only rows whose key is above `mark` are transformed, and the first `skip`
+    data rows (committed by an interrupted run) are dropped after parsing.
+    `stats` is filled in as the file is consumed: rows read, rows kept, the
+    highest key seen, and whether required columns were missing.
+
+    With `chunksize`, the CSV is streamed in chunks of that many rows so only
+    one chunk plus the parent/patient lookups is ever in memory. Chunks are
+    read as text (dtype=str): per-chunk dtype inference would otherwise turn
+    the same column into '98765' in one chunk and '98765.0' in the next.
+    With `batch_rows`, each transformed chunk is yielded in slices of at most
+    that many rows. With `known` (stored row hashes, see UPSERT), rows whose
+    hash is unchanged are dropped and the hash is appended as a last column.
+    `source` (a buffer, see WATCH MODE) is read instead of CSV_DIR / csv_name."""
+    stats = {} if stats is None else stats
+    stats.update(read=0, kept=0, top=mark, missing=False, rejected=Counter(), skipped=0,
+                 unchanged=0, parse_secs=0.0, transform_secs=0.0)
+    formats = {}                                 # date formats detected in this file
+    seen = set()                                 # keys already yielded (upsert only)
+    path = CSV_DIR / csv_name if source is None else source
+    t0 = time.perf_counter()
+    if chunksize:
+        ensure_lookups(lookups, table, dtype=str)
+        frames = read_csv(path, chunksize=chunksize, dtype=str)
+    else:
+        df = read_csv(path, dtype=text_dtypes(csv_name))
+        for name, (src, cols, build) in LOOKUPS.items():
+            if src == csv_name:
+                lookups[name] = build(df)
+        ensure_lookups(lookups, table)
+        frames = [df]
+        del df
+    frames = iter(frames)
+    stats['parse_secs'] += time.perf_counter() - t0
+
+    while True:
+        t0 = time.perf_counter()
+        df = next(frames, None)
+        t1 = time.perf_counter()
+        stats['parse_secs'] += t1 - t0
+        if df is None:
+            return
+        end = df.index[-1] + 1 if len(df) else skip
+        if end <= skip:
+            continue
+        df = df.iloc[max(skip - df.index[0], 0):]
+        stats['read'] += len(df)
+        if key_col in df.columns:
+            keys = pd.to_numeric(df[key_col], errors='coerce')
+            if keys.notna().any():
+                top = stats['top']
+                stats['top'] = keys.max() if top is None else max(top, keys.max())
+            if mark is not None:
+                df = df[keys > mark]
+        stats['kept'] += len(df)
+        frame = prep(df, lookups)
+        if frame is None:
+            stats['missing'] = True
+            stats['rejected']['KeyError'] += len(df)     # row path: row['<col>'] fails
+            return
+        skipped = frame.attrs.get('skipped', 0)
+        stats['skipped'] += skipped
+        # masked rows are the ones the row path's int()/float() casts reject
+        stats['rejected']['ValueError'] += len(df) - skipped - len(frame)
+        if known is not None:
+            # like INSERT OR IGNORE, the first row for a key wins; later ones are duplicates
+            keys = frame[key_col]
+            frame = frame[~keys.duplicated() & ~keys.isin(seen)]
+            seen.update(frame[key_col].tolist())
+            hashes = hash_rows(frame)
+            pos = known.index.get_indexer(frame[key_col].values)
+            same = ((pos >= 0) & (known.values[pos] == hashes) if len(known)
+                    else np.zeros(len(frame), bool))
+            stats['unchanged'] += int(same.sum())
+            frame, hashes = frame[~same], hashes[~same]
+        frame = add_vitals_columns(add_date_columns(frame, table, formats), table)
+        if known is not None:
+            frame['row_hash'] = hashes
+        step = batch_rows or len(frame) or 1
+        for i in range(0, max(len(frame), 1), step):
+            part = frame.iloc[i:i + step]
+            # the last slice also covers trailing rejects / filtered rows
+            done = end if i + step >= len(frame) else int(part.index[-1]) + 1
+            cols, rows = frame_rows(part)
+            stats['transform_secs'] += time.perf_counter() - t1
+            yield cols, rows, done
+            t1 = time.perf_counter()
+
+PARSE_QUEUE_BATCHES = 2     # parsed batches a --parallel worker may hold ahead of the writer
+
+def _init_worker(csv_dir, queues=None, stop=None):
+    global CSV_DIR, PARSE_QUEUES, PARSE_STOP
+    CSV_DIR = Path(csv_dir)
+    PARSE_QUEUES, PARSE_STOP = queues, stop
+
+def _put(queue, item):
+    """queue.put() that gives up (False) once the writer has stopped."""
+    while not PARSE_STOP.is_set():
+        try:
+            queue.put(item, timeout=0.5)
+            return True
+        except Full:
+            pass
+    return False
+
+def parse_worker(index, slot, mark, chunksize, skip, batch_rows, known):
+    """Pool task: parse + clean one BULK_TABLES entry in a worker process and
+    put its row batches, each with the stats so far, on PARSE_QUEUES[slot];
+    the parent process does all writes. The queue is bounded, so a worker
+    that gets ahead of the writer waits instead of piling up batches. A
+    (None, stats) item always ends the file."""
+    csv_name, table, key_col, prep, label = BULK_TABLES[index]
+    queue = PARSE_QUEUES[slot]
+    queue.cancel_join_thread()          # an aborted run may leave batches unread
+    t0 = time.perf_counter()
+    stats = {}
+    # a copy: the queue pickles items later, while parse_file() goes on counting
+    sofar = lambda: {**stats, 'rejected': Counter(stats.get('rejected', ()))}
+    try:
+        for cols, rows, done in parse_file(csv_name, table, key_col, prep, {}, mark,
+                                           chunksize, stats, skip, batch_rows, known):
+            if not _put(queue, ((cols, list(rows), done), sofar())):
+                return
+    finally:
+        stats['secs'] = time.perf_counter() - t0
+        _put(queue, (None, sofar()))
+
+def queued_batches(queue, future, stats):
+    """Batches parse_worker() puts on `queue`, keeping `stats` in step with the
+    worker's; the worker's exception, if any, is raised at the end."""
+    while True:
+        try:
+            batch, worker_stats = queue.get(timeout=1.0)
+        except Empty:
+            if future.done() and future.exception():
+                future.result()         # the worker died without its end marker
+            continue
+        stats.update(worker_stats)
+        if batch is None:
+            future.result()
+            return
+        yield batch
+
+def import_bulk(conn, report, incremental=False, chunksize=None, workers=None,
+                commit_rows=COMMIT_ROWS, upsert=False):
+    """Sections 2–11, one vectorised transform + executemany per table.
+
+    With `incremental`, files whose fingerprint matches import_state are skipped
+    outright, and changed files only transform/insert rows whose key is above
+    the file's high-water mark. With `chunksize`, files are streamed (see
+    parse_file()).
+
+    With `workers` > 1, files are parsed and cleaned concurrently in a pool of
+    that many processes while this process stays the only SQLite writer,
+    draining each file's bounded queue of batches in BULK_TABLES (dependency)
+    order (see parse_worker()).
+
+    Every batch of at most `commit_rows` rows is committed with its file's
+    checkpoint (see CHECKPOINTS): finished files are skipped on a re-run and
+    an unfinished one resumes after its last committed batch.
+
+    With `upsert`, unchanged files are skipped as for `incremental`, but every
+    row of a changed file is hashed and the new or changed ones are written
+    with ON CONFLICT DO UPDATE (see UPSERT). A file that copies columns from
+    a changed one (LOOKUP_NEEDS) is hashed too, even when it is unchanged."""
+    plan, changed = [], set()
+    for spec in BULK_TABLES:
+        csv_name = spec[0]
+        fp = mark = known = None
+        rows_done, last_key, done = load_progress(conn, csv_name, file_stamp(CSV_DIR / csv_name))
+        if done:
+            print(f"\n⏭  {csv_name} already committed by the interrupted run — skipped")
+            continue
+        if incremental or upsert:
+            fp = file_fingerprint(CSV_DIR / csv_name)
+            state = load_state(conn, csv_name)
+            # an upsert re-hashes files that denormalise a changed file's rows
+            # (owner name / phone, patient name / species), as those are stale
+            stale = [LOOKUPS[name][0] for name in LOOKUP_NEEDS.get(spec[1], ())
+                     if LOOKUPS[name][0] in changed] if upsert else []
+            if state and state[0] == fp and not stale:
+                print(f"\n⏭  {csv_name} unchanged — skipped")
+                continue
+            if state and state[0] == fp:
+                print(f"\n↻  {csv_name} unchanged, re-checked against the new {', '.join(stale)}")
+            else:
+                changed.add(csv_name)
+            mark = state[1] if state and not upsert else None
+        if upsert:
+            known = load_hashes(conn, spec[1])
+        plan.append((spec, fp, mark, rows_done, last_key, known))
+    conn.commit()
+
+    pool = futures = None
+    if workers and workers > 1 and plan:
+        # one bounded queue per file; tasks start in plan order, so the file the
+        # writer waits on is always being parsed
+        queues = [multiprocessing.Queue(PARSE_QUEUE_BATCHES) for _ in plan]
+        stop = multiprocessing.Event()
+        pool = ProcessPoolExecutor(min(workers, len(plan)), initializer=_init_worker,
+                                   initargs=(str(CSV_DIR), queues, stop))
+        futures = [pool.submit(parse_worker, BULK_TABLES.index(spec), n, mark, chunksize,
+                               rows_done, commit_rows, known)
+                   for n, (spec, fp, mark, rows_done, last_key, known) in enumerate(plan)]
+    kind = 'parallel' if pool else 'stream' if chunksize else 'bulk'
+
+    lookups = {}
+    try:
+        for n, (spec, fp, mark, rows_done, last_key, known) in enumerate(plan):
+            csv_name, table, key_col, prep, label = spec
+            print(f"\n📥 Importing {table} ({kind})…")
+            if rows_done:
+                print(f"   ↻ resuming after row {rows_done:,} (committed by the interrupted run)")
+                report.setdefault('resumed', {})[csv_name] = rows_done
+            t0 = time.perf_counter()
+            stats = {}
+            if pool:
+                batches = queued_batches(queues[n], futures[n], stats)
+            else:
+                batches = parse_file(csv_name, table, key_col, prep, lookups, mark, chunksize,
+                                     stats, rows_done, commit_rows, known)
+
+            inserted, updated, insert_secs = 0, 0, 0.0
+            for cols, rows, done in batches:
+                t1 = time.perf_counter()
+                if upsert:
+                    ins, upd = upsert_rows(conn, table, key_col, cols, rows)
+                    inserted, updated = inserted + ins, updated + upd
+                else:
+                    last = max_rowid(conn, table)
+                    inserted += insert_rows(conn, table, cols, rows)
+                    if table == 'invoices':
+                        add_default_items(conn, last)
+                top = _top(stats['top'], last_key)
+                save_progress(conn, csv_name, done, int(top) if top is not None else None)
+                conn.commit()
+                insert_secs += time.perf_counter() - t1
+            if stats['missing']:
+                print(f"   ⚠ {csv_name}: required columns missing, nothing imported")
+            if mark is not None:
+                print(f"   ↳ {stats['kept']:,} rows beyond {key_col} {mark:,}")
+            top = _top(stats['top'], last_key)
+            if incremental or upsert:
+                save_state(conn, csv_name, fp, key_col, int(top) if top is not None else None,
+                           stats['kept'])
+            save_progress(conn, csv_name, rows_done + stats['read'],
+                          int(top) if top is not None else None, done=True)
+            conn.commit()
+            secs = time.perf_counter() - t0
+            read = stats['read']
+            record_table(report, table, read, inserted, secs,
+                         parse_secs=stats['parse_secs'], transform_secs=stats['transform_secs'],
+                         insert_secs=insert_secs, rejected=stats['rejected'],
+                         skipped=stats['skipped'], considered=stats['kept'],
+                         updated=updated if upsert else None, unchanged=stats['unchanged'])
+            if upsert:
+                print(f"   ↳ {updated:,} changed rows updated, {stats['unchanged']:,} unchanged")
+            if pool:
+                print(f"   ✓ {inserted:,} {label} imported  ({read:,} rows parsed in "
+                      f"{stats['secs']:.2f}s, written in {insert_secs:.2f}s, "
+                      f"{read / max(secs, 1e-9):,.0f} rows/s)")
+            else:
+                print(f"   ✓ {inserted:,} {label} imported  "
+                      f"({read:,} rows in {secs:.2f}s, {read / max(secs, 1e-9):,.0f} rows/s)")
+    finally:
+        if pool:
+            stop.set()                            # workers blocked on a full queue give up
+            pool.shutdown(cancel_futures=True)
+
+# ─── ELT IMPORT (staging tables + set-based SQL) ─────────────────────────────
+# --elt copies every CSV verbatim into a TEMP raw_<file> table (all TEXT) and
+# then fills the real tables with one INSERT OR IGNORE … SELECT each. The
+# clean()/int()/lookup rules of the other paths are spelled out in SQL, so
+# no per-row Python runs during the transform. TEXT columns keep the raw
+# field as written, which is what the other modes store too (text_dtypes()),
+# so an --elt load gives the same tables as any other mode.
+
+def _sql_list(values):
+    return '(' + ','.join("'" + v.replace("'", "''") + "'" for v in sorted(values)) + ')'
+
+# read_csv()'s missing-value tokens, matched as the field is written (case and
+# surrounding blanks included), then clean()'s NULL strings, matched stripped
+# and lower-cased: 'NA' and '-nan' are NULL, 'Na' and ' NA' are text
+SQL_NA_TOKENS = _sql_list(STR_NA_VALUES)
+SQL_NULLS = _sql_list(NULL_STRINGS)
+
+def q(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def _sql_trim(col):
+    return f"trim(COALESCE({q(col)}, ''), ' \t\r\n')"
+
+def _sql_isnum(t):
+    return f"({t} GLOB '*[0-9]*' AND {t} NOT GLOB '*[^0-9.eE+-]*')"
+
+def sql_text(cols, col):
+    """clean() as an SQL expression."""
+    if col not in cols:
+        return 'NULL'
+    t = _sql_trim(col)
+    return (f"(CASE WHEN {q(col)} IN {SQL_NA_TOKENS} OR lower({t}) IN {SQL_NULLS} "
+            f"THEN NULL ELSE {t} END)")
+
+def sql_int(cols, col, required=False):
+    """int() cast as (value expression, reject predicate)."""
+    if col not in cols:
+        return 'NULL', ('1' if required else '0')
+    t = _sql_trim(col)
+    num = _sql_isnum(t)
+    reject = f"NOT {num}" if required else f"({sql_text(cols, col)} IS NOT NULL AND NOT {num})"
+    return f"(CASE WHEN {num} THEN CAST(CAST({t} AS REAL) AS INTEGER) END)", reject
+
+def sql_float(cols, col):
+    """float(x) if present else 0, as (value expression, reject predicate)."""
+    if col not in cols:
+        return '0.0', '0'
+    t = _sql_trim(col)
+    num = _sql_isnum(t)
+    return (f"(CASE WHEN {num} THEN CAST({t} AS REAL) ELSE 0.0 END)",
+            f"({sql_text(cols, col)} IS NOT NULL AND NOT {num})")
+
+# Per table: (dst column, kind, source column). kind is 'text', 'int',
+# 'int!' (required) or 'float'; the source of prescription_id is the
+# de-duplicated 10th header, resolved in elt_select().
+ELT_TABLES = {
+    'pet_parents': [('pet_parent_id', 'int!', 'pet_parent_id'), ('name', 'text', 'name'),
+                    ('mobile_no', 'text', 'mobile_no'), ('email_id', 'text', 'email_id'),
+                    ('created_at', 'text', 'timestamp')],
+    'patients': [('patient_id', 'int!', 'patient_id'), ('name', 'text', 'name'),
+                 ('sex', 'text', 'sex'), ('type', 'text', 'species'), ('breed', 'text', 'breed'),
+                 ('age', 'text', 'age_dob'), ('colour', 'text', 'color'),
+                 ('microchip_no', 'text', 'microchip_no'), ('identify_mark', 'text', 'identify_mark'),
+                 ('pet_parent_id', 'int', 'pet_parent_id'), ('status', 'text', 'status'),
+                 ('created_at', 'text', 'timestamp')],
+    'soap_subjective': [('subject_id', 'int!', 'subject_id'), ('patient_id', 'int!', 'patient_id'),
+                        ('addnotes', 'text', 'addnotes'), ('appetite', 'text', 'appetite'),
+                        ('attitude', 'text', 'attid'), ('drinking', 'text', 'drinking'),
+                        ('notice', 'text', 'notice'), ('pooping', 'text', 'poopng'),
+                        ('urinating', 'text', 'urnatng'), ('chief_complaint', 'text', 'cheifcom'),
+                        ('duration', 'text', 'duration'), ('created_at', 'text', 'timestamp')],
+    'soap_objective': [('objective_id', 'int!', 'objective_id'), ('patient_id', 'int!', 'patient_id')]
+                      + [(c, 'text', c) for c in ('temp', 'pulse', 'resprate', 'weight', 'mucmemb',
+                                                   'lymnodes', 'hydration', 'crt', 'bcs', 'visual_exam')]
+                      + [('created_at', 'text', 'timestamp')],
+    'soap_assessment': [('assess_id', 'int!', 'assess_id'), ('patient_id', 'int!', 'patient_id'),
+                        ('diagnosis', 'text', 'diagnosis'), ('created_at', 'text', 'timestamp')],
+    'soap_plan': [('plan_id', 'int!', 'plan_id'), ('patient_id', 'int!', 'patient_id'),
+                  ('plan', 'text', 'plan'), ('created_at', 'text', 'timestamp')],
+    'records': [('record_id', 'int!', 'record_id'), ('patient_id', 'int!', 'patient_id')]
+               + [(c, 'int', c) for c in ('subject_id', 'objective_id', 'assess_id', 'plan_id',
+                                           'prescription_id', 'user_id')]
+               + [('created_at', 'text', 'timestamp')],
+    'prescriptions': [('presmeds_id', 'int!', 'presmeds_id'), ('patient_id', 'int!', 'patient_id'),
+                      ('prescription_id', 'int', None), ('med_name', 'text', 'med_name'),
+                      ('prefix', 'text', 'prefix'), ('quantity', 'text', 'quan'),
+                      ('quantity_type', 'text', 'quan_type'), ('duration', 'text', 'dur'),
+                      ('duration_type', 'text', 'dur_type'), ('frequency', 'text', 'freq'),
+                      ('instruction', 'text', 'instruction'), ('created_at', 'text', 'timestamp')],
+    'vaccinations': [('pchistory_id', 'int!', 'pchistory_id'), ('preventive_id', 'int!', 'preventive_id'),
+                     ('patient_id', 'int!', 'patient_id'), ('date', 'text', 'date'),
+                     ('age', 'text', 'age'), ('veterinarian', 'text', 'veterinarian'),
+                     ('type_care', 'text', 'type_care'), ('treatment', 'text', 'treatment'),
+                     ('created_at', 'text', 'timestamp')],
+    'invoices': [('ref', 'text', 'ref'), ('invoice_id', 'int!', 'invoice_id'), ('date', 'text', 'date'),
+                 ('patient_id', 'int', 'patient_id'), ('pet_parent_id', 'int', 'pet_parent_id'),
+                 ('payment_type', 'text', 'payment_type'), ('total', 'float', 'total'),
+                 ('discount', 'float', 'final_discount'), ('status', 'text', 'status'),
+                 ('plan_id', 'int', 'plan_id'), ('preventive_id', 'int', 'preventive_id'),
+                 ('created_at', 'text', 'timestamp')],
+}
+
+# source columns whose absence makes the row path reject every row
+ELT_REQUIRED = {
+    'pet_parents': ('name', 'mobile_no', 'email_id', 'timestamp'),
+    'patients': ('name',),
+}
+
+def raw_table(csv_name):
+    return 'raw_' + Path(csv_name).stem.lower()
+
+def load_raw(conn, csv_name):
+    """Copy one CSV verbatim (every field as TEXT) into TEMP raw_<file>; returns its columns.
+
+    Rows go straight from csv.reader into executemany(). Like on_bad_lines='skip',
+    rows with too many fields are dropped; short rows are padded with NULLs."""
+    raw = raw_table(csv_name)
+    header = read_csv(CSV_DIR / csv_name, nrows=0)
+    if csv_name == 'prescription.csv':
+        fix_prescription_columns(header)
+    cols = list(header.columns)
+    n = len(cols)
+    conn.execute(f"DROP TABLE IF EXISTS temp.{raw}")
+    conn.execute(f"CREATE TEMP TABLE {raw} ({', '.join(q(c) + ' TEXT' for c in cols)})")
+    with open(CSV_DIR / csv_name, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        rows = (r if len(r) == n else r + [None] * (n - len(r))
+                for r in reader if r and len(r) <= n)
+        insert_rows(conn, raw, [q(c) for c in cols], rows, verb='INSERT')
+    return cols
+
+def elt_select(table, cols):
+    """Inner SELECT over raw_<file>: cleaned columns, the raw rowid and an `ok`
+    flag that is false for rows the row path would reject. None when required
+    source columns are missing."""
+    if not set(ELT_REQUIRED.get(table, ())) <= set(cols):
+        return None
+    exprs, rejects = ['rowid AS rid'], []
+    for dst, kind, src in ELT_TABLES[table]:
+        if src is None:                      # prescriptions' duplicated prescription_id
+            if len(cols) < 10:
+                return None
+            src = cols[9]
+        if kind == 'text':
+            val = sql_text(cols, src)
+        else:
+            val, rej = sql_float(cols, src) if kind == 'float' else sql_int(cols, src, kind == 'int!')
+            rejects.append(rej)
+        exprs.append(f"{val} AS {dst}")
+    exprs.append(f"NOT ({' OR '.join(rejects) or '0'}) AS ok")
+    return f"SELECT {', '.join(exprs)}"
+
+def elt_lookups(conn, parent_cols, patient_cols):
+    """TEMP lookup tables mirroring parent_lookup() / patient_lookup()."""
+    pid, _ = sql_int(parent_cols, 'pet_parent_id')
+    conn.executescript(f"""
+        DROP TABLE IF EXISTS temp.lk_parents;
+        CREATE TEMP TABLE lk_parents (id INTEGER PRIMARY KEY, name TEXT, mobile_no TEXT, email_id TEXT);
+        INSERT OR REPLACE INTO lk_parents
+            SELECT {pid}, {sql_text(parent_cols, 'name')}, {sql_text(parent_cols, 'mobile_no')},
+                   {sql_text(parent_cols, 'email_id')}
+            FROM raw_pet_parents WHERE {pid} IS NOT NULL ORDER BY rowid;
+    """)
+    pid, _ = sql_int(patient_cols, 'patient_id')
+    conn.executescript(f"""
+        DROP TABLE IF EXISTS temp.lk_patients;
+        CREATE TEMP TABLE lk_patients (id INTEGER PRIMARY KEY, name TEXT, type TEXT);
+        INSERT OR REPLACE INTO lk_patients
+            SELECT {pid}, COALESCE({sql_text(patient_cols, 'name')}, ''),
+                   COALESCE({sql_text(patient_cols, 'species')}, '')
+            FROM raw_patients WHERE {pid} IS NOT NULL ORDER BY rowid;
+        DROP TABLE IF EXISTS temp.method_map;
+        CREATE TEMP TABLE method_map (k TEXT PRIMARY KEY, v TEXT);
+    """)
+    conn.executemany("INSERT INTO method_map VALUES(?,?)", METHOD_MAP.items())
+
+def elt_transform(conn, table, cols):
+    """INSERT OR IGNORE … SELECT from raw_<file> into `table`; returns rows written."""
+    inner = elt_select(table, cols)
+    if inner is None:
+        return None
+    raw = raw_table(next(c for c, t, *_ in BULK_TABLES if t == table))
+    dst = [d for d, *_ in ELT_TABLES[table]]
+    if table == 'pet_parents':
+        sql = f"""
+            INSERT OR IGNORE INTO pet_parents(pet_parent_id, name, mobile_no, email_id, created_at)
+            SELECT pet_parent_id, COALESCE(name, 'Unknown'), mobile_no, email_id, created_at
+            FROM ({inner} FROM {raw}) WHERE ok ORDER BY rid"""
+    elif table == 'patients':
+        sql = f"""
+            INSERT OR IGNORE INTO patients(
+                id, patient_id, name, sex, type, breed, age, colour,
+                microchip_no, identify_mark, owner_name, phone, email,
+                pet_parent_id, status, created_at)
+            SELECT 'PaCPC-' || printf('%05d', r.patient_id), r.patient_id,
+                   COALESCE(r.name, 'Unknown'), r.sex,
+                   CASE WHEN r.type = '0' THEN 'Other' ELSE r.type END,
+                   r.breed, r.age, r.colour, r.microchip_no, r.identify_mark,
+                   p.name, p.mobile_no, p.email_id, r.pet_parent_id, r.status, r.created_at
+            FROM ({inner} FROM {raw}) r
+            LEFT JOIN lk_parents p ON p.id = r.pet_parent_id
+            WHERE r.ok ORDER BY r.rid"""
+    elif table == 'invoices':
+        sql = f"""
+            INSERT OR IGNORE INTO invoices(
+                ref, invoice_id, date, patient_id, patient_name, patient_type,
+                owner_name, phone, pet_parent_id, payment_type, method,
+                discount, total, paid_amount, balance, status,
+                plan_id, preventive_id, subtotal, created_at)
+            SELECT i.ref, i.invoice_id, i.date, i.patient_id,
+                   COALESCE(lp.name, ''), COALESCE(lp.type, ''),
+                   pp.name, pp.mobile_no, i.pet_parent_id, i.payment_type,
+                   CASE WHEN i.payment_type IS NULL THEN NULL ELSE COALESCE(mm.v, i.payment_type) END,
+                   i.discount, i.total,
+                   CASE WHEN i.status = 'Paid' THEN i.total ELSE 0 END,
+                   CASE WHEN i.status = 'Paid' THEN 0 ELSE i.total END,
+                   i.status, i.plan_id, i.preventive_id, i.total + i.discount, i.created_at
+            FROM (SELECT rid, ok, ref, invoice_id, date, patient_id, pet_parent_id, payment_type,
+                         total, discount, COALESCE(status, 'Draft') AS status,
+                         plan_id, preventive_id, created_at
+                  FROM ({inner} FROM {raw})) i
+            LEFT JOIN lk_patients lp ON lp.id = i.patient_id
+            LEFT JOIN lk_parents pp ON pp.id = i.pet_parent_id
+            LEFT JOIN method_map mm ON mm.k = lower(i.payment_type)
+            WHERE i.ok AND i.ref IS NOT NULL ORDER BY i.rid"""
+    else:
+        sql = f"""
+            INSERT OR IGNORE INTO {table}({', '.join(dst)})
+            SELECT {', '.join(dst)} FROM ({inner} FROM {raw}) WHERE ok ORDER BY rid"""
+    before = conn.total_changes
+    conn.execute(sql)
+    return conn.total_changes - before
+
+def import_elt(conn, report):
+    """Sections 2–11 as extract/load into raw_* staging tables, then set-based SQL."""
+    print("\n📥 Staging raw CSVs…")
+    raw_cols, stage_secs = {}, {}
+    t0 = time.perf_counter()
+    for csv_name, table, *_ in BULK_TABLES:
+        t1 = time.perf_counter()
+        raw_cols[table] = load_raw(conn, csv_name)
+        stage_secs[table] = time.perf_counter() - t1
+    conn.commit()
+    print(f"   ✓ {len(BULK_TABLES)} files staged in {time.perf_counter() - t0:.2f}s")
+    elt_lookups(conn, raw_cols['pet_parents'], raw_cols['patients'])
+
+    for csv_name, table, key_col, prep, label in BULK_TABLES:
+        t0 = time.perf_counter()
+        last = max_rowid(conn, table)
+        inserted = elt_transform(conn, table, raw_cols[table])
+        if inserted is None:
+            print(f"   ⚠ {csv_name}: required columns missing, nothing imported")
+            continue
+        if table == 'invoices':
+            add_default_items(conn, last)
+        conn.commit()
+        secs = time.perf_counter() - t0
+        rows = conn.execute(f"SELECT COUNT(*) FROM temp.{raw_table(csv_name)}").fetchone()[0]
+        # one INSERT … SELECT both cleans and writes, and can't say which rows
+        # it rejected vs ignored without a second pass over raw_*
+        record_table(report, table, rows, inserted, secs + stage_secs[table],
+                     parse_secs=stage_secs[table], transform_secs=secs)
+        print(f"   ✓ {inserted:,} {label} transformed in {secs:.2f}s")
+
+    for csv_name, *_ in BULK_TABLES:
+        conn.execute(f"DROP TABLE IF EXISTS temp.{raw_table(csv_name)}")
+
+# ─── MULTI-BRANCH ────────────────────────────────────────────────────────────
+# Each branch export is imported concurrently into its own shard database
+# (clinic.<branch>.db, with the mode flags of the run), then the shards are
+# merged into DB_PATH with ATTACH + INSERT … SELECT. Branch ids overlap, so a
+# branch's rows are tagged with a `branch` column and every id is shifted by
+# (number - 1) * BRANCH_STRIDE, where `number` is fixed the first time the
+# branch is merged (see the branches table). Invoice refs take the number
+# as their IN:NN- prefix. Re-merging a branch upserts its rows on their
+# remapped keys, so a row keeps its rowid (and its derived rows) across
+# re-merges and only changed rows are rewritten; rows gone from the shard
+# are deleted. invoice_items has no natural key and nothing derived from
+# its rowids, so a branch's items are simply replaced. The derived tables
+# are rebuilt from the merged rows by the usual later stages.
+
+BRANCH_STRIDE = 100_000_000     # id range reserved per branch
+
+# integer id columns shifted per branch (records.user_id is a staff id and is kept)
+BRANCH_IDS = {'pet_parent_id', 'patient_id', 'subject_id', 'objective_id', 'assess_id',
+              'plan_id', 'prescription_id', 'presmeds_id', 'pchistory_id', 'preventive_id',
+              'record_id', 'invoice_id'}
+
+BRANCH_TABLES = [table for csv_name, table, *_ in BULK_TABLES] + ['invoice_items']
+BRANCH_KEYS = {table: key_col for csv_name, table, key_col, *_ in BULK_TABLES}
+
+def shard_path(db_path, branch):
+    return db_path.with_name(f"{db_path.stem}.{branch}{db_path.suffix}")
+
+def import_shard(branch, csv_dir, shard, kwargs):
+    """Pool task: one branch's run() into its shard, output kept in <shard>.log."""
+    with open(shard.with_suffix('.log'), 'w') as log, redirect_stdout(log):
+        report = run(csv_dir=csv_dir, db_path=shard, **kwargs)
+    return branch, report
+
+def import_shards(branches, kwargs):
+    """Import every branch concurrently; returns [(branch, csv_dir, shard)]."""
+    shards = [(branch, Path(csv_dir), shard_path(DB_PATH, branch))
+              for branch, csv_dir in branches.items()]
+    print(f"🏥 Importing {len(shards)} branches concurrently…")
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(len(shards)) as pool:
+        futures = [pool.submit(import_shard, branch, str(csv_dir), shard, kwargs)
+                   for branch, csv_dir, shard in shards]
+        for future in as_completed(futures):
+            branch, report = future.result()
+            rows = sum(t['rows'] for t in report['tables'].values())
+            print(f"   ✓ {branch}: {rows:,} rows in {report['wall_secs']:.2f}s "
+                  f"→ {shard_path(DB_PATH, branch).name}")
+    print(f"   ✓ all branches imported in {time.perf_counter() - t0:.2f}s\n")
+    return shards
+
+def branch_number(conn, branch, csv_dir, shard):
+    """The branch's fixed number, assigning the next free one on first merge."""
+    conn.execute("""
+        INSERT INTO branches(name, number, csv_dir, shard)
+        SELECT ?, COALESCE(MAX(number), 0) + 1, ?, ? FROM branches WHERE true
+        ON CONFLICT(name) DO UPDATE SET csv_dir=excluded.csv_dir, shard=excluded.shard
+    """, (branch, str(csv_dir), str(shard)))
+    return conn.execute("SELECT number FROM branches WHERE name=?", (branch,)).fetchone()[0]
+
+def branch_select(table, cols, number):
+    """SELECT list copying `cols` of shard.`table` with ids / refs remapped."""
+    off = (number - 1) * BRANCH_STRIDE
+    code = f"'IN:{number:02d}-'"
+    def expr(c):
+        if c in BRANCH_IDS:
+            return f"{c} + {off}"
+        if (table, c) == ('patients', 'id'):
+            return (f"CASE WHEN id GLOB 'PaCPC-*' THEN 'PaCPC-' || printf('%05d', patient_id + {off}) "
+                    f"ELSE 'B{number:02d}:' || id END")
+        if (table, c) in (('invoices', 'ref'), ('invoice_items', 'invoice_ref')):
+            return (f"CASE WHEN {c} GLOB 'IN:[0-9][0-9]-*' THEN {code} || substr({c}, 7) "
+                    f"ELSE 'B{number:02d}:' || {c} END")
+        return c
+    return ', '.join(expr(c) for c in cols)
+
+def merge_branches(conn, report, shards):
+    """Sections 2–11 for a multi-branch run: upsert each shard's rows into the
+    consolidated tables, dropping rows of that branch the shard no longer has."""
+    ensure_columns(conn, [(table, 'branch', 'TEXT') for table in BRANCH_TABLES])
+    totals = {table: [0, 0, 0.0] for csv_name, table, *_ in BULK_TABLES}   # read, inserted, secs
+    for branch, csv_dir, shard in shards:
+        print(f"\n🔀 Merging branch {branch}…")
+        number = branch_number(conn, branch, csv_dir, shard)
+        conn.execute("ATTACH DATABASE ? AS shard", (str(shard),))
+        try:
+            for table in BRANCH_TABLES:
+                t0 = time.perf_counter()
+                shard_cols = {r[1] for r in conn.execute(f"PRAGMA shard.table_info({table})")}
+                cols = [r[1] for r in conn.execute(f"PRAGMA main.table_info({table})")
+                        if r[1] in shard_cols and r[1] != 'branch'
+                        and (table, r[1]) != ('invoice_items', 'id')]
+                key = BRANCH_KEYS.get(table)
+                if key:
+                    conn.execute(f"""
+                        DELETE FROM main.{table} WHERE branch = ? AND {key} NOT IN
+                            (SELECT {branch_select(table, [key], number)} FROM shard.{table}
+                             WHERE {key} IS NOT NULL)
+                    """, (branch,))
+                    # rows of another branch (or unbranched) win, as INSERT OR IGNORE did
+                    upsert = ("ON CONFLICT DO UPDATE SET "
+                              + ', '.join(f"{c}=excluded.{c}" for c in cols)
+                              + f" WHERE branch IS excluded.branch AND ({', '.join(cols)}) "
+                              f"IS NOT ({', '.join(f'excluded.{c}' for c in cols)})")
+                else:
+                    conn.execute(f"DELETE FROM main.{table} WHERE branch = ?", (branch,))
+                    upsert = "ON CONFLICT DO NOTHING"
+                conn.execute(f"""
+                    INSERT INTO main.{table}({', '.join(cols)}, branch)
+                    SELECT {branch_select(table, cols, number)}, ? FROM shard.{table}
+                    WHERE true ORDER BY rowid {upsert}
+                """, (branch,))
+                # unchanged rows are skipped, so count what the branch now holds
+                inserted = conn.execute(f"SELECT COUNT(*) FROM main.{table} WHERE branch = ?",
+                                        (branch,)).fetchone()[0]
+                if table in totals:
+                    read = conn.execute(f"SELECT COUNT(*) FROM shard.{table}").fetchone()[0]
+                    t = totals[table]
+                    t[0], t[1], t[2] = t[0] + read, t[1] + inserted, t[2] + time.perf_counter() - t0
+                    print(f"   ✓ {table:<18} {inserted:>9,} of {read:,} rows")
+            conn.execute("UPDATE branches SET merged_at = datetime('now','localtime') WHERE name=?",
+                         (branch,))
+            conn.commit()
+        finally:
+            conn.execute("DETACH DATABASE shard")
+    for table, (read, inserted, secs) in totals.items():
+        record_table(report, table, read, inserted, secs, insert_secs=secs)
+    report['branches'] = {branch: str(shard) for branch, csv_dir, shard in shards}
+
+# ─── FAST LOAD + ATOMIC SWAP ─────────────────────────────────────────────────
+# --swap builds into a scratch copy of clinic.db with durability switched off,
+# checks it, then os.replace()s it over DB_PATH in one atomic rename. The
+# server keeps reading the old file throughout and never sees a partial load.
+# The connection that took the copy stays open. Before the rename it takes
+# the write lock and compares PRAGMA data_version. If anything committed to
+# the live file since the copy, the swap is abandoned rather than losing that
+# write. Under the same lock the old file's -wal / -shm are unlinked, so none
+# of their frames can be replayed onto the new file. Connections open on the
+# old file (the server's) keep reading it and any writes they make are lost:
+# they must be closed and reopened after a swap — restart the server. On
+# Windows a file can't be renamed over while anything has it open, so the
+# live connection lets go just before the rename and the server must be
+# stopped for the swap.
+
+FAST_PRAGMAS = (
+    "PRAGMA synchronous = OFF",
+    "PRAGMA journal_mode = MEMORY",
+    "PRAGMA cache_size = -262144",         # 256 MB
+    "PRAGMA mmap_size = 1073741824",       # 1 GB
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA locking_mode = EXCLUSIVE",
+)
+
+def scratch_path(db_path):
+    return db_path.with_name(db_path.name + '.loading')
+
+def open_scratch(db_path):
+    """Scratch copy of `db_path` tuned for a one-shot load. The copy goes through
+    the backup API, so it is a consistent snapshot even while the server writes.
+    Returns (conn, scratch, copied): `copied` is (live connection, its
+    data_version right after the copy) for swap_in(), None with no db_path yet."""
+    scratch = scratch_path(db_path)
+    for stale in (scratch, scratch.with_name(scratch.name + '-journal')):
+        if stale.exists():
+            stale.unlink()
+    conn = sqlite3.connect(scratch)
+    copied = None
+    if db_path.exists():
+        live = sqlite3.connect(db_path, isolation_level=None)
+        live.backup(conn)
+        copied = live, live.execute("PRAGMA data_version").fetchone()[0]
+    for pragma in FAST_PRAGMAS:
+        conn.execute(pragma)
+    return conn, scratch, copied
+
+def verify_scratch(conn, db_path, archived=None):
+    """quick_check the scratch file and make sure no table lost rows vs. the live
+    one, other than the `archived` ({table: rows}) ones."""
+    archived = archived or {}
+    result = conn.execute("PRAGMA main.quick_check").fetchone()[0]
+    if result != 'ok':
+        raise RuntimeError(f"scratch database failed quick_check: {result}")
+    if not db_path.exists():
+        return
+    live = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        for table in SUMMARY_TABLES:
+            try:
+                before = live.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            except sqlite3.OperationalError:
+                continue                       # table not in the live db yet
+            after = conn.execute(f"SELECT COUNT(*) FROM main.{table}").fetchone()[0]
+            if after + archived.get(table, 0) < before:
+                raise RuntimeError(f"scratch {table} has {after:,} rows, live has {before:,}")
+    finally:
+        live.close()
+
+def swap_in(conn, scratch, db_path, copied):
+    """Atomically replace `db_path` with the finished scratch database, unless
+    the live file changed since open_scratch() copied it (RuntimeError; the
+    scratch file is left in place).
+
+    The check and the rename happen under the live file's write lock, and the
+    old -wal / -shm are unlinked before it is released. Connections opened
+    before the swap keep reading the old file until they reopen.
+
+    Windows can't rename over a file that has open handles, so there the live
+    connection (and with it the -wal / -shm) is closed after the check and
+    before the rename; a write landing in that gap is lost, and any other
+    process holding clinic.db open (the server) makes the swap fail."""
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.close()
+    if copied is None:
+        if db_path.exists():
+            raise RuntimeError(f"{db_path.name} was created during the load; "
+                               f"not swapping — re-run the import")
+        os.replace(scratch, db_path)
+        return
+    live, version = copied
+    try:
+        live.execute("BEGIN IMMEDIATE")            # no more writers until we're done
+        if live.execute("PRAGMA data_version").fetchone()[0] != version:
+            raise RuntimeError(f"{db_path.name} changed during the load; "
+                               f"not swapping — re-run the import")
+        if os.name == 'nt':
+            live.close()                           # rolls back; last handle on the old file
+        try:
+            os.replace(scratch, db_path)
+        except PermissionError as e:
+            raise RuntimeError(f"{db_path.name} is open in another process; stop the server "
+                               f"and re-run the import to swap") from e
+        for side in ('-wal', '-shm'):
+            stale = db_path.with_name(db_path.name + side)
+            if stale.exists():
+                stale.unlink()
+    finally:
+        live.close()                               # rolls back, releasing the lock
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024   # bytes vs KB
+
+# ─── OPTIMIZE + SNAPSHOT ─────────────────────────────────────────────────────
+# After the load: fresh planner statistics (ANALYZE on full loads and on a
+# database never analysed, PRAGMA optimize on delta runs, which only
+# re-analyses tables whose row counts moved; the index stage leaves
+# statistics to this one), a foreign_key_check with enforcement back on —
+# foreign keys are off while importing, so this is where orphans in the
+# exports show up — and, with --snapshot, a defragmented copy written by
+# VACUUM INTO. The snapshot is a plain rollback-journal file with no WAL to
+# copy alongside, so it doubles as the backup. 8 KiB pages cost ~1% in size
+# over 4 KiB on the clinic data but cut scan time ~15%; --snapshot-page-size
+# overrides.
+
+SNAPSHOT_PAGE_SIZE = 8192
+PAGE_SIZES = [512 << i for i in range(8)]          # 512 … 65536
+
+def snapshot_path(db_path):
+    return db_path.with_name(f"{db_path.stem}.snapshot{db_path.suffix}")
+
+def foreign_key_violations(conn):
+    """{'child -> parent': rows} from foreign_key_check on the main schema.
+    Rows whose parent now lives in the attached archive are not orphans."""
+    archived = history(conn, 'records') != 'records'
+    fk_cols, bad = {}, Counter()
+    for table, rid, parent, fkid in conn.execute("PRAGMA main.foreign_key_check").fetchall():
+        if archived and parent in HISTORY_TABLES:
+            if (table, fkid) not in fk_cols:
+                fk_cols[table, fkid] = next(
+                    (frm, to) for id_, seq, tbl, frm, to, *_ in
+                    conn.execute(f"PRAGMA main.foreign_key_list({table})") if id_ == fkid)
+            frm, to = fk_cols[table, fkid]
+            if conn.execute(f"SELECT EXISTS (SELECT 1 FROM archive.{parent} WHERE {to} = "
+                            f"(SELECT {frm} FROM main.{table} WHERE rowid = ?))", (rid,)).fetchone()[0]:
+                continue
+        bad[f"{table} -> {parent}"] += 1
+    return dict(bad)
+
+def optimize_db(conn, full=False):
+    """Refresh planner statistics (a full ANALYZE with `full` or when there
+    are none yet), then re-enable foreign keys and check them.
+    Returns ({step: secs}, foreign_key_violations())."""
+    secs = {}
+    t0 = time.perf_counter()
+    full = full or not conn.execute(
+        "SELECT 1 FROM main.sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    conn.execute("ANALYZE main" if full else "PRAGMA main.optimize")
+    conn.commit()
+    secs['analyze' if full else 'optimize'] = round(time.perf_counter() - t0, 4)
+    t0 = time.perf_counter()
+    conn.execute("PRAGMA foreign_keys = ON")
+    bad = foreign_key_violations(conn)
+    secs['foreign_key_check'] = round(time.perf_counter() - t0, 4)
+    return secs, bad
+
+def write_snapshot(conn, path, page_size=SNAPSHOT_PAGE_SIZE):
+    """VACUUM the main schema INTO `path` with `page_size` pages, via a temp
+    file so an existing snapshot is only replaced by a complete one."""
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.unlink(missing_ok=True)
+    conn.commit()
+    conn.execute(f"PRAGMA main.page_size = {int(page_size)}")   # only VACUUM (INTO) applies it
+    conn.execute("VACUUM main INTO ?", (str(tmp),))
+    os.replace(tmp, path)
+
+# ─── WATCH MODE ──────────────────────────────────────────────────────────────
+# --watch keeps the importer running for exports dropped into CSV_DIR during
+# the day. After one --incremental catch-up run it holds a single WAL
+# connection and the parent / patient lookups in memory, and polls the export
+# files every WATCH_POLL seconds. A file is only read once its size and mtime
+# have held still for WATCH_SETTLE seconds, and only up to its last complete
+# line, so a half-written export is never parsed. When the WATCH_TAIL bytes
+# before the offset the last import stopped at are unchanged (an append, or
+# a re-export that only added rows) the file is read from that offset, with
+# the header line put back in front, so a new invoice costs a read of the
+# new lines rather than of the whole file; a truncated or rewritten file is
+# re-read above its key high-water mark, as --incremental does. Rows go in
+# WATCH_COMMIT_ROWS-row transactions, so the server's own writes never queue
+# behind a long one, and after each pass the derived tables are brought up
+# to date from rowid marks (FTS and revenue aggregates follow through their
+# triggers).
+
+WATCH_POLL = 1.0            # seconds between scans of CSV_DIR
+WATCH_SETTLE = 2.0          # seconds a file's size / mtime must hold before it is read
+WATCH_COMMIT_ROWS = 1_000   # rows per write transaction
+WATCH_TAIL = 4096           # bytes before the offset that must be unchanged for an append
+
+def read_new_lines(path, offset=None, tail=b''):
+    """(header, complete lines after byte `offset`, new offset, new tail) of a
+    CSV; the whole file after its header without `offset`. None when the
+    `tail` bytes just before `offset` changed (the file was rewritten)."""
+    with open(path, 'rb') as f:
+        header = f.readline()
+        if offset is None:
+            offset, before = f.tell(), header
+        else:
+            f.seek(offset - len(tail))
+            if f.read(len(tail)) != tail:
+                return None
+            before = tail
+        body = f.read()
+    body = body[:body.rfind(b'\n') + 1]          # a half-written last line waits
+    return header, body, offset + len(body), (before + body)[-WATCH_TAIL:]
+
+def watch_file(conn, path):
+    """Watch state for an export the catch-up run has imported: byte offset
+    of its last complete line and a running hash of the bytes before it.
+    A file that changed after the catch-up read it gets no offset, so the
+    first pass re-reads it by key."""
+    stamp = file_stamp(path)
+    data = path.read_bytes()
+    state = load_state(conn, path.name)
+    if not state or state[0] != hashlib.blake2b(data, digest_size=16).hexdigest():
+        return {'offset': None, 'stamp': None, 'tail': b'', 'hasher': None}
+    end = data.rfind(b'\n') + 1
+    return {'offset': end, 'stamp': stamp, 'tail': data[max(end - WATCH_TAIL, 0):end],
+            'hasher': hashlib.blake2b(data[:end], digest_size=16)}
+
+def merge_lookup(old, new):
+    """Resident lookup updated with a file's new rows (last row still wins)."""
+    both = pd.concat([old, new]) if old is not None else new
+    return both[~both.index.duplicated(keep='last')]
+
+def import_appended(conn, spec, state, lookups, commit_rows=WATCH_COMMIT_ROWS):
+    """Import the lines appended to one export since `state` (its watch_file()
+    entry, updated in place); returns rows inserted."""
+    csv_name, table, key_col, prep, label = spec
+    path = CSV_DIR / csv_name
+    t0 = time.perf_counter()
+    stamp = file_stamp(path)
+    new = state['offset'] is not None and read_new_lines(path, state['offset'], state['tail'])
+    by_key = not new
+    if new:
+        hasher, mark = state['hasher'], None
+    else:                                        # first look, or rewritten: by key, as --incremental
+        new = read_new_lines(path)
+        hasher, mark = hashlib.blake2b(digest_size=16), (load_state(conn, csv_name) or (None, None))[1]
+        hasher.update(new[0])
+    header, body, end, tail = new
+    hasher.update(body)
+    inserted, stats = 0, {}
+    if body:
+        lk = dict(lookups)
+        for cols, rows, done in parse_file(csv_name, table, key_col, prep, lk, mark, stats=stats,
+                                           batch_rows=commit_rows, source=io.BytesIO(header + body)):
+            last = max_rowid(conn, table)
+            inserted += insert_rows(conn, table, cols, rows)
+            if table == 'invoices':
+                add_default_items(conn, last)
+            conn.commit()
+        for name, (src, *_) in LOOKUPS.items():
+            if src == csv_name and name in lk:
+                lookups[name] = merge_lookup(lookups.get(name), lk[name])
+        stored = load_state(conn, csv_name)
+        top = _top(stats['top'], stored and stored[1])
+        save_state(conn, csv_name, hasher.hexdigest(), key_col,
+                   int(top) if top is not None else None, stats['kept'])
+        conn.commit()
+    state.update(offset=end, stamp=stamp, tail=tail, hasher=hasher)
+    lag = time.time() - path.stat().st_mtime
+    print(f"📥 {csv_name}: {inserted:,} {label} imported ({stats.get('read', 0):,} rows read"
+          f"{', re-read by key' if by_key else ''}) in "
+          f"{time.perf_counter() - t0:.2f}s, {lag:.1f}s after the last write")
+    return inserted
+
+def refresh_derived(conn, marks):
+    """Per-row derived tables and counters for rows above `marks` (or logged
+    in inserted_rows)."""
+    build_vitals_series(conn, marks['soap_objective'])
+    build_search_keys(conn)
+    build_timeline(conn, marks)
+    build_patient_summary(conn, marks)
+    update_counters(conn)
+
+def watch(csv_dir=None, db_path=None, archive_db=None, poll=WATCH_POLL, settle=WATCH_SETTLE,
+          commit_rows=WATCH_COMMIT_ROWS):
+    """Catch up with an --incremental run, then import new rows of each export
+    as it settles, until Ctrl-C."""
+    run(incremental=True, csv_dir=csv_dir, db_path=db_path, archive_db=archive_db)
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA foreign_keys = OFF")
+    archive = Path(archive_db) if archive_db else archive_path(DB_PATH)
+    if archive.exists():
+        attach_archive(conn, archive)              # summaries keep the archived history
+    lookups = {}
+    ensure_lookups(lookups, 'invoices')
+    files = {spec[0]: watch_file(conn, CSV_DIR / spec[0])
+             for spec in BULK_TABLES if (CSV_DIR / spec[0]).exists()}
+    pending = {}                                   # csv name -> (stamp, first seen at)
+    print(f"👀 Watching {CSV_DIR} every {poll:g}s (files settle after {settle:g}s) — Ctrl-C to stop")
+    try:
+        while True:
+            now = time.monotonic()
+            ready = []
+            for spec in BULK_TABLES:
+                path = CSV_DIR / spec[0]
+                if not path.exists():
+                    continue
+                stamp = file_stamp(path)
+                state = files.setdefault(spec[0], {'offset': None, 'stamp': None,
+                                                   'tail': b'', 'hasher': None})
+                if stamp == state['stamp']:
+                    pending.pop(spec[0], None)
+                elif pending.get(spec[0], (None,))[0] != stamp:
+                    pending[spec[0]] = (stamp, now)
+                elif now - pending[spec[0]][1] >= settle:
+                    ready.append(spec)
+            if ready:
+                marks = {table: max_rowid(conn, table) for csv_name, table, *_ in BULK_TABLES}
+                track_inserts(conn, marks)
+                if sum(import_appended(conn, spec, files[spec[0]], lookups, commit_rows)
+                       for spec in ready):
+                    t0 = time.perf_counter()
+                    refresh_derived(conn, marks)
+                    conn.execute("DELETE FROM inserted_rows")
+                    conn.commit()
+                    print(f"   ↳ timeline, summaries, search keys and counters updated in "
+                          f"{time.perf_counter() - t0:.2f}s")
+                for spec in ready:
+                    pending.pop(spec[0], None)
+            time.sleep(poll)
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching\n")
+    finally:
+        conn.close()
+
+# ─── MAIN ─────────────────────────────────────────────────────────────────────
+
+SUMMARY_TABLES = ['pet_parents','patients','soap_subjective','soap_objective',
+                  'soap_assessment','soap_plan','records','prescriptions',
+                  'vaccinations','invoices','invoice_items']
+
+def update_counters(conn):
+    """Point the app's next patient / invoice numbers past the imported ones."""
+    max_pat = conn.execute("SELECT MAX(patient_id) FROM patients").fetchone()[0] or 10000
+    conn.execute("UPDATE counters SET value=? WHERE key='patient'", (max_pat + 1,))
+
+    max_inv_num = conn.execute(f"""
         SELECT MAX(CAST(REPLACE(SUBSTR(ref, INSTR(ref,'-')+5), '-', '') AS INTEGER))
-        FROM invoices WHERE ref LIKE 'IN:%'
+        FROM {history(conn, 'invoices')} WHERE ref LIKE 'IN:%'
     """).fetchone()[0] or 0
-    cur.execute("UPDATE counters SET value=? WHERE key='invoice'", (max_inv_num + 1,))
+    conn.execute("UPDATE counters SET value=? WHERE key='invoice'", (max_inv_num + 1,))
 
     conn.commit()
 
-    # ── 13. SUMMARY ──────────────────────────────────────────────────────────
+def run(bulk=False, incremental=False, stream=False, chunksize=CHUNK_ROWS, workers=None,
+        swap=False, elt=False, csv_dir=None, db_path=None, commit_rows=COMMIT_ROWS, upsert=False,
+        branches=None, revenue_reports=None, archive_before=None, archive_db=None,
+        snapshot=None, snapshot_page_size=SNAPSHOT_PAGE_SIZE):
+    """Import every CSV under CSV_DIR into DB_PATH (either may be overridden per
+    call), or with `branches` ({name: csv dir}) import each branch into its own
+    shard concurrently and merge them into DB_PATH (see MULTI-BRANCH).
+    Revenue reports in CSV_DIR, or at `revenue_reports` (files, directories or
+    globs), are reconciled against invoices (see REVENUE RECONCILIATION).
+    With `archive_before` (ISO date), or once `archive_db` exists, older rows
+    move into the archive database (see ARCHIVE). `snapshot` (a path, or True
+    for clinic.snapshot.db) writes a compacted copy once the load is done.
+    Returns a report dict — mode, wall time, peak RSS, per-stage timings and
+    per-table rows / inserted / duplicates / rejects — which is also written
+    as JSON next to the database (see record_table())."""
+    global CSV_DIR, DB_PATH
+    CSV_DIR = Path(csv_dir) if csv_dir else CSV_DIR
+    DB_PATH = Path(db_path) if db_path else DB_PATH
+    if snapshot:
+        snapshot = snapshot_path(DB_PATH) if snapshot is True else Path(snapshot)
+    started = time.perf_counter()
+    print(f"\n🐾 Paws & Claws — CSV Import Tool")
+    print(f"   Database : {DB_PATH}")
+    if branches:
+        for branch, csv_dir in branches.items():
+            print(f"   Branch   : {branch} ← {csv_dir}")
+    else:
+        print(f"   CSV Dir  : {CSV_DIR}")
+    bulk = bulk or incremental or stream or bool(workers) or upsert   # even if clamped to 1
+    workers = min(workers, os.cpu_count() or 1) if workers else workers   # more only contend
+    parallel = bool(workers and workers > 1)
+    mode = ' + '.join(m for m, on in (('parallel', parallel), ('stream', stream),
+                                      ('incremental', incremental), ('upsert', upsert)) if on) \
+        or ('elt' if elt else 'bulk' if bulk else 'row-by-row')
+    print(f"   Mode     : {mode}{' per branch + merge' if branches else ''}"
+          f"{' → scratch db + atomic swap' if swap else ''}\n")
+    report = {'mode': mode + (' + branches' if branches else '') + (' + swap' if swap else ''),
+              'stages': [], 'tables': {}}
+    if branches:
+        shards = import_shards(branches, dict(
+            bulk=bulk, incremental=incremental, stream=stream, chunksize=chunksize,
+            workers=workers, elt=elt, commit_rows=commit_rows, upsert=upsert))
+
+    if swap:
+        conn, scratch, copied = open_scratch(DB_PATH)
+        print(f"✓ Loading into scratch copy {scratch.name}")
+    else:
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA foreign_keys = OFF")   # disable during bulk import
+    cur = conn.cursor()
+
+    # ── 1. EXTEND / CREATE TABLES ────────────────────────────────────────────
+    with stage(report, 1, 'schema'):
+        upgrade_timeline(conn)
+        cur.executescript(SCHEMA_SQL)
+        conn.commit()
+        added = ensure_columns(
+            conn, [(t, dst, 'TEXT' if kind == 'date' else 'INTEGER') for t, src, dst, kind in DATE_COLUMNS]
+            + [('soap_objective', dst, sqltype) for src, dst, sqltype, rng in VITALS])
+    print("✓ Schema created / verified")
+    # rows above these rowids are this run's; new companion columns start from 0
+    marks = {table: max_rowid(conn, table) for csv_name, table, *_ in BULK_TABLES}
+    marks, resumed = begin_checkpoints(conn, marks)
+    track_inserts(conn, marks)
+    if resumed:
+        print("↻ Resuming an interrupted import from its last committed batches")
+    since = {t: 0 if (t, 'created_epoch') in added else marks[t]
+             for t, src, dst, kind in DATE_COLUMNS if kind == 'epoch'}
+    since_vitals = 0 if ('soap_objective', 'temp_c') in added else since['soap_objective']
+
+    # ── 2–11. TABLES ─────────────────────────────────────────────────────────
+    # incremental / upsert deltas are small: keep indexes and triggers live for them
+    full = bool(branches) or elt or (bulk and not (incremental or upsert))
+    if full:
+        drop_indexes(conn)
+        drop_triggers(conn, REVENUE_TRIGGERS + FTS_TRIGGERS + SEARCH_KEY_TRIGGERS)
+    if branches:
+        merge_branches(conn, report, shards)
+    elif elt:
+        import_elt(conn, report)
+    elif bulk:
+        import_bulk(conn, report, incremental=incremental, chunksize=chunksize if stream else None,
+                    workers=workers, commit_rows=commit_rows, upsert=upsert)
+    else:
+        import_rows(conn, report)
+
+    # ── 12. NORMALISE DATES ──────────────────────────────────────────────────
+    with stage(report, 12, 'normalise dates'):
+        report['dates'] = normalise_dates(conn, since)
+    for col, d in report['dates'].items():
+        print(f"✓ {col}: {d['filled']:,} backfilled"
+              + (f", {d['unparsed']:,} unparseable" if d['unparsed'] else ''))
+
+    # ── 13. TYPED VITALS ─────────────────────────────────────────────────────
+    with stage(report, 13, 'typed vitals'):
+        report['vitals'] = normalise_vitals(conn, since_vitals)
+        series = build_vitals_series(conn, since_vitals)
+    junk = sum(v['junk'] for v in report['vitals'].values())
+    print(f"✓ Vitals: {series:,} rows added to vitals_series"
+          + (f", {junk:,} junk values ignored" if junk else ''))
+
+    # ── 14. INDEXES ──────────────────────────────────────────────────────────
+    print()
+    with stage(report, 14, 'indexes'):
+        # statistics come with step 23; derived-table indexes follow step 19 on full loads
+        build_indexes(conn, analyze=False, derived=False if full else None)
+
+    # ── 15. ARCHIVE ──────────────────────────────────────────────────────────
+    archive = Path(archive_db) if archive_db else archive_path(DB_PATH)
+    replaced = {}
+    if archive_before or archive.exists():
+        with stage(report, 15, 'archive'):
+            t0 = time.perf_counter()
+            attach_archive(conn, archive)
+            report['archived'], replaced = archive_old_rows(conn, archive_before, commit_rows,
+                                                            marks, upsert)
+        moved = report['archived']
+        if moved:
+            print(f"✓ {sum(moved.values()):,} rows older than the cutoff moved to {archive.name} "
+                  f"in {time.perf_counter() - t0:.2f}s ("
+                  + ', '.join(f"{t} {n:,}" for t, n in moved.items()) + ")")
+
+    # ── 16. FULL-TEXT SEARCH ─────────────────────────────────────────────────
+    with stage(report, 16, 'full-text search'):
+        t0 = time.perf_counter()
+        rebuilt = build_fts(conn, full=full)
+    if rebuilt:
+        print(f"✓ Full-text indexes rebuilt ({', '.join(rebuilt)}) in {time.perf_counter() - t0:.2f}s")
+
+    # ── 17. SEARCH KEYS ──────────────────────────────────────────────────────
+    with stage(report, 17, 'search keys'):
+        t0 = time.perf_counter()
+        keys = build_search_keys(conn, full=full)
+    if keys:
+        print(f"✓ {keys:,} search keys added in {time.perf_counter() - t0:.2f}s")
+
+    # ── 18. VISIT TIMELINE ───────────────────────────────────────────────────
+    with stage(report, 18, 'visit timeline'):
+        t0 = time.perf_counter()
+        visits = build_timeline(conn, marks, full=full)
+    if visits:
+        print(f"✓ {visits:,} visit timeline rows written in {time.perf_counter() - t0:.2f}s")
+
+    # ── 19. PATIENT SUMMARY ──────────────────────────────────────────────────
+    with stage(report, 19, 'patient summary'):
+        t0 = time.perf_counter()
+        summarised = build_patient_summary(conn, marks, full=full)
+    if summarised:
+        print(f"✓ {summarised:,} patient summaries written in {time.perf_counter() - t0:.2f}s")
+    if full:
+        with stage(report, 19, 'derived indexes'):
+            build_indexes(conn, analyze=False, derived=True)
+
+    # ── 20. REVENUE AGGREGATES ───────────────────────────────────────────────
+    with stage(report, 20, 'revenue aggregates'):
+        build_revenue(conn, full=full or 'invoices' in replaced)   # re-archived invoices count twice
+
+    # ── 21. RECONCILE REVENUE REPORTS ────────────────────────────────────────
+    with stage(report, 21, 'revenue reconciliation'):
+        files = find_reports(revenue_reports or [CSV_DIR])
+        rec = reconcile_revenue(conn, files) if files else None
+    if rec:
+        report['reconciliation'] = rec
+        print(f"✓ {rec['rows']:,} revenue report rows from {rec['files']} file(s) reconciled in "
+              f"{rec['secs']:.2f}s: {rec['missing_invoice']:,} refs not in invoices, "
+              f"{rec['missing_from_report']:,} invoices not in the reports, {rec['total']:,} total / "
+              f"{rec['balance']:,} balance / {rec['status']:,} status mismatches "
+              f"(see revenue_reconciliation)")
+
+    # ── 22. UPDATE COUNTERS ───────────────────────────────────────────────────
+    with stage(report, 22, 'counters'):
+        update_counters(conn)
+    clear_checkpoints(conn)                    # everything above is durable: nothing to resume
+
+    # ── 23. OPTIMIZE + SNAPSHOT ──────────────────────────────────────────────
+    with stage(report, 23, 'optimize'):
+        report['optimize'], report['foreign_key_violations'] = optimize_db(conn, full=full)
+        if snapshot:
+            t0 = time.perf_counter()
+            write_snapshot(conn, snapshot, snapshot_page_size)
+            report['optimize']['snapshot'] = round(time.perf_counter() - t0, 4)
+    print("✓ " + ', '.join(f"{step.replace('_', ' ')} {secs:.2f}s"
+                           for step, secs in report['optimize'].items()))
+    for fk, n in report['foreign_key_violations'].items():
+        print(f"   ⚠ {fk}: {n:,} rows reference a missing parent")
+    if snapshot:
+        loaded = Path(conn.execute("PRAGMA database_list").fetchone()[2])   # scratch under --swap
+        live = sum(p.stat().st_size for p in (loaded, loaded.with_name(loaded.name + '-wal'))
+                   if p.exists())
+        print(f"✓ Snapshot {snapshot.name}: {snapshot.stat().st_size / (1 << 20):,.1f} MB "
+              f"({snapshot_page_size // 1024} KiB pages) vs {live / (1 << 20):,.1f} MB live")
+
+    # ── 24. SUMMARY ──────────────────────────────────────────────────────────
     print("\n" + "─"*50)
     print("📊 IMPORT SUMMARY")
     print("─"*50)
-    for table in ['pet_parents','patients','soap_subjective','soap_objective',
-                  'soap_assessment','soap_plan','records','prescriptions',
-                  'vaccinations','invoices','invoice_items']:
-        count = cur.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
-        print(f"   {table:<22} {count:>8,} rows")
+    with stage(report, 24, 'summary'):
+        for table in SUMMARY_TABLES:
+            count = cur.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            print(f"   {table:<22} {count:>8,} rows")
+        rss = peak_rss_mb()
+        if rss is not None:
+            print(f"   {'peak RSS':<22} {rss:>8,.0f} MB")
+        print_rejects(report)
 
-    conn.close()
-    print("\n✅ All data imported successfully into clinic.db\n")
+    # ── 25. VERIFY + SWAP ────────────────────────────────────────────────────
+    with stage(report, 25, 'verify + swap' if swap else 'close'):
+        if swap:
+            verify_scratch(conn, DB_PATH, report.get('archived'))
+            swap_in(conn, scratch, DB_PATH, copied)
+            print(f"\n✓ Scratch database verified and swapped into place as {DB_PATH.name}")
+        else:
+            conn.close()
+    report['wall_secs'] = round(time.perf_counter() - started, 4)
+    report['peak_rss_mb'] = round(rss, 1) if rss is not None else None
+    path = write_report(report, DB_PATH)
+    print(f"\n📝 Run report written to {path.name}")
+    print(f"\n✅ All data imported successfully into {DB_PATH.name}\n")
+    return report
 
 if __name__ == '__main__':
-    run()
+    ap = argparse.ArgumentParser(description="Import clinic CSV exports into clinic.db")
+    ap.add_argument('--bulk', action='store_true',
+                    help="vectorised column cleaning + batched executemany per table")
+    ap.add_argument('--incremental', action='store_true',
+                    help="bulk mode that skips unchanged files and only loads rows "
+                         "beyond each file's high-water mark")
+    ap.add_argument('--upsert', action='store_true',
+                    help="bulk mode that also applies changed source rows (ON CONFLICT DO UPDATE), "
+                         "using stored row hashes to skip unchanged ones")
+    ap.add_argument('--stream', action='store_true',
+                    help="bulk mode that reads each CSV in fixed-size chunks (bounded memory)")
+    ap.add_argument('--chunksize', type=int, default=CHUNK_ROWS,
+                    help=f"rows per chunk for --stream (default {CHUNK_ROWS:,})")
+    ap.add_argument('--commit-rows', type=int, default=None, metavar='N',
+                    help=f"bulk modes: rows per checkpointed commit (default {COMMIT_ROWS:,}, "
+                         f"{WATCH_COMMIT_ROWS:,} for --watch); larger batches load faster, "
+                         "smaller ones lose less on a crash")
+    ap.add_argument('--parallel', type=int, nargs='?', const=os.cpu_count(), default=None,
+                    metavar='WORKERS',
+                    help="bulk mode that parses files in a pool of worker processes "
+                         "(default and maximum: one per CPU) feeding a single SQLite writer")
+    ap.add_argument('--watch', action='store_true',
+                    help="after an --incremental catch-up, keep running and import new rows "
+                         "of each export in CSV_DIR a few seconds after it is written")
+    ap.add_argument('--swap', action='store_true',
+                    help="load into a scratch copy with durability off, verify it, then "
+                         "atomically replace clinic.db (aborts if clinic.db was written to "
+                         "meanwhile; restart the server afterwards)")
+    ap.add_argument('--elt', action='store_true',
+                    help="stage CSVs verbatim into raw_* tables and transform them with "
+                         "INSERT … SELECT inside SQLite")
+    ap.add_argument('--branch', action='append', default=[], metavar='NAME=DIR',
+                    help="a branch's export directory (repeat per branch): each is imported "
+                         "concurrently into clinic.NAME.db, then all are merged into --db")
+    ap.add_argument('--revenue-reports', nargs='+', default=None, metavar='PATH',
+                    help=f"{REPORT_GLOB} files, directories or globs to reconcile against "
+                         "invoices (default: any in the CSV directory)")
+    ap.add_argument('--archive-before', default=None, metavar='YYYY-MM-DD',
+                    help="move visits, prescriptions, vaccinations and settled invoices older "
+                         "than this date into the archive database (kept for later runs)")
+    ap.add_argument('--archive-db', default=None,
+                    help="archive database (default clinic.archive.db next to --db)")
+    ap.add_argument('--snapshot', nargs='?', const=True, default=None, metavar='FILE',
+                    help="after the load, VACUUM INTO a compacted copy (default clinic.snapshot.db)")
+    ap.add_argument('--snapshot-page-size', type=int, default=SNAPSHOT_PAGE_SIZE, choices=PAGE_SIZES,
+                    metavar='BYTES', help=f"page size of the snapshot (default {SNAPSHOT_PAGE_SIZE})")
+    ap.add_argument('--csv-dir', default=None, help=f"CSV export directory (default {CSV_DIR})")
+    ap.add_argument('--db', default=None, help=f"SQLite database to import into (default {DB_PATH})")
+    ap.add_argument('--profile', nargs='?', const='import_data.pstats', default=None, metavar='FILE',
+                    help="run under cProfile and dump stats to FILE (default import_data.pstats)")
+    args = ap.parse_args()
+    if args.elt and (args.incremental or args.stream or args.parallel or args.upsert):
+        ap.error("--elt is a full set-based load; it can't be combined with "
+                 "--incremental, --stream, --parallel or --upsert")
+    if any('=' not in b for b in args.branch):
+        ap.error("--branch takes NAME=DIR, e.g. --branch anna_nagar=exports/anna_nagar")
+    if args.branch and args.csv_dir:
+        ap.error("--csv-dir and --branch are alternatives")
+    if args.archive_before:
+        try:
+            args.archive_before = date.fromisoformat(args.archive_before).isoformat()
+        except ValueError:
+            ap.error("--archive-before takes an ISO date, e.g. 2023-04-01")
+    if args.incremental and args.upsert:
+        ap.error("--upsert re-reads every row of a changed file; drop --incremental")
+    if args.watch and (args.upsert or args.stream or args.parallel or args.swap or args.elt
+                       or args.branch or args.archive_before or args.snapshot):
+        ap.error("--watch catches up with --incremental and then only appends; it takes "
+                 "--csv-dir, --db, --archive-db and --commit-rows")
+    kwargs = dict(bulk=args.bulk, incremental=args.incremental, stream=args.stream,
+                  chunksize=args.chunksize, workers=args.parallel, swap=args.swap, elt=args.elt,
+                  csv_dir=args.csv_dir, db_path=args.db, commit_rows=args.commit_rows or COMMIT_ROWS,
+                  upsert=args.upsert, branches=dict(b.split('=', 1) for b in args.branch) or None,
+                  revenue_reports=args.revenue_reports, archive_before=args.archive_before,
+                  archive_db=args.archive_db, snapshot=args.snapshot,
+                  snapshot_page_size=args.snapshot_page_size)
+    try:
+        if args.watch:
+            watch(args.csv_dir, args.db, args.archive_db,
+                  commit_rows=args.commit_rows or WATCH_COMMIT_ROWS)
+        elif args.profile:
+            profiled(args.profile, run, **kwargs)
+        else:
+            run(**kwargs)
+    except KeyboardInterrupt:
+        print("\n\n⏸  Interrupted — committed batches are kept; run the same command again "
+              "to resume.\n")
+        sys.exit(130)